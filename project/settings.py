@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,10 +44,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "storage.middleware.QueryInstrumentationMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "storage.middleware.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -63,6 +66,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "storage.context_processors.live_events",
             ],
         },
     },
@@ -78,6 +82,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # A file (instead of the shared in-memory database) lets concurrent
+        # tests use one connection per thread with regular SQLite locking.
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
@@ -129,6 +136,131 @@ MEDIA_URL = "media/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+
+# Storage app
+# Pagination used by the item and transaction listings: "offset" renders
+# numbered pages, "keyset" uses '-item_id' / '-id' cursors (no COUNT/OFFSET).
+
+STORAGE_PAGINATION = "offset"
+
+# Full-text item search. Leave the backend empty to pick SQLite FTS5 on SQLite
+# and the portable database backend elsewhere, or give a dotted path to a
+# storage.search.BaseSearchBackend subclass.
+
+STORAGE_SEARCH_BACKEND = None
+STORAGE_SEARCH_MAX_RESULTS = 1000
+
+# Maximum number of item IDs accepted by one bulk loan/devolution request.
+
+STORAGE_BULK_MAX_ITEMS = 100
+
+# Rows fetched per database round trip (and sent per chunk) by the streamed
+# CSV/NDJSON exports.
+
+STORAGE_EXPORT_CHUNK_SIZE = 2000
+
+# Versioned page cache of the index, item and profile views (storage.cache).
+# Use a shared backend (Redis, Memcached, database) when running several
+# processes, so version bumps reach every worker.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "storage",
+    }
+}
+
+STORAGE_CACHE_TIMEOUT = 300
+
+# SQL instrumentation (storage.middleware.QueryInstrumentationMiddleware).
+# Fraction of the requests measured (0 disables it, 1 measures every request);
+# measured requests get a Server-Timing header and a 'storage.sql' log line,
+# logged as a warning when they repeat identical SQL this many times.
+
+STORAGE_SQL_SAMPLE_RATE = 0
+STORAGE_SQL_REPEATED_THRESHOLD = 5
+
+# On-demand profiling (storage.profiling): directory of the saved profiles,
+# number of profiles kept and validity of the staff tokens, in seconds.
+
+STORAGE_PROFILE_DIR = BASE_DIR / "profiles"
+STORAGE_PROFILE_KEEP = 50
+STORAGE_PROFILE_TOKEN_MAX_AGE = 3600
+
+# Transaction archive (storage.archive): 'manage.py archive_transactions' moves
+# the loan cycles returned more than this many days ago to TransactionArchive.
+# The listings cache the archive's counts and greatest keys for this many
+# seconds (archiving refreshes them right away).
+
+STORAGE_ARCHIVE_AFTER_DAYS = 365
+STORAGE_ARCHIVE_CACHE_TIMEOUT = 3600
+
+# Loan period, in days, of the loans made by the loan services (storage.overdue).
+# 'manage.py scan_overdue' records the loans past their due date.
+
+STORAGE_LOAN_DAYS = 14
+
+# Background jobs (storage.jobs, run by 'manage.py run_workers'): directory of
+# the job files, seconds without heartbeat before a running job is considered
+# lost and first retry delay, in seconds (doubled at each attempt). The values
+# below are the defaults of storage.jobs (JOB_TIMEOUT, RETRY_DELAY).
+
+STORAGE_JOB_DIR = BASE_DIR / "jobs"
+STORAGE_JOB_TIMEOUT = 300
+STORAGE_JOB_RETRY_DELAY = 30
+
+# Availability feed (storage.events, 'events/items/', served through ASGI):
+# seconds between two polls of the changed items while browsers are connected
+# (loans made by this process are pushed right away) and between two
+# keep-alive comments on an idle connection.
+
+STORAGE_EVENTS_POLL_INTERVAL = 2
+STORAGE_EVENTS_KEEPALIVE = 15
+
+# Session profiles. With the default "db" profile every logged request reads
+# the django_session and auth_user rows. "cached_db" serves the sessions from
+# the cache (written through to the database) and "signed_cookies" keeps them
+# in a signed cookie; both store the flash messages in a cookie and cache the
+# authenticated user between requests (storage.auth.CachedModelBackend, kept
+# STORAGE_USER_CACHE_TIMEOUT seconds). Pick one with the
+# STORAGE_SESSION_PROFILE environment variable. With several server processes
+# "cached_db" and the user cache need a shared CACHES backend (Memcached,
+# Redis) instead of the local memory one; switching profiles logs every user
+# out. See 'manage.py bench_sessions' for the queries each profile saves.
+
+STORAGE_SESSION_PROFILES = {
+    "db": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+        "MESSAGE_STORAGE": "django.contrib.messages.storage.fallback.FallbackStorage",
+        "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+    },
+    "cached_db": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+        "MESSAGE_STORAGE": "django.contrib.messages.storage.cookie.CookieStorage",
+        "AUTHENTICATION_BACKENDS": ["storage.auth.CachedModelBackend"],
+    },
+    "signed_cookies": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.signed_cookies",
+        "MESSAGE_STORAGE": "django.contrib.messages.storage.cookie.CookieStorage",
+        "AUTHENTICATION_BACKENDS": ["storage.auth.CachedModelBackend"],
+    },
+}
+STORAGE_SESSION_PROFILE = os.environ.get("STORAGE_SESSION_PROFILE", "db")
+
+SESSION_ENGINE = STORAGE_SESSION_PROFILES[STORAGE_SESSION_PROFILE]["SESSION_ENGINE"]
+MESSAGE_STORAGE = STORAGE_SESSION_PROFILES[STORAGE_SESSION_PROFILE]["MESSAGE_STORAGE"]
+AUTHENTICATION_BACKENDS = STORAGE_SESSION_PROFILES[STORAGE_SESSION_PROFILE][
+    "AUTHENTICATION_BACKENDS"
+]
+STORAGE_USER_CACHE_TIMEOUT = 60
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"storage": {"handlers": ["console"], "level": "INFO"}},
+}
+
 try:
     from project.local_settings import *
 except ImportError:
@@ -35,3 +35,26 @@ class ItemAdmin(admin.ModelAdmin):
     ordering = ("-item_id",)
     search_fields = ("item_id", "object")
     list_per_page = 20
+
+
+@admin.register(models.ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    """
+    Admin configuration for the ApiToken model.
+
+    Tokens are created with the 'create_api_token' management command, which
+    shows the raw key once; the admin lists and revokes (deletes) them.
+
+    Attributes:
+    -----------
+    list_display : tuple
+        Fields to display in the change list view of the admin interface.
+    readonly_fields : tuple
+        Fields that cannot be edited (the stored digest of the key).
+    """
+
+    list_display = ("name", "user", "created_date")
+    readonly_fields = ("key",)
+
+    def has_add_permission(self, request):
+        return False
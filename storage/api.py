@@ -0,0 +1,290 @@
+import hashlib
+import secrets
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.dateparse import parse_datetime
+
+from storage.models import ApiToken
+
+"""
+Helpers of the versioned JSON API of the 'storage' application (api/v1/).
+
+Machine clients authenticate with an ApiToken sent in the 'Authorization:
+Token <key>' header. The token is checked with a single indexed query and the
+session is never read, so API calls skip the session table entirely.
+
+Every endpoint accepts a sparse fieldset ('fields=a,b') validated against the
+public fields of the resource and answers with an ETag computed from the body,
+returning 304 Not Modified when it matches 'If-None-Match'.
+"""
+
+ITEM_FIELDS = (
+    "item_id",
+    "object",
+    "description",
+    "quantity",
+    "storage_location",
+    "is_available",
+    "created_date",
+    "updated_at",
+    "owner_id",
+    "current_loan_id",
+)
+
+TRANSACTION_FIELDS = (
+    "id",
+    "item_id",
+    "from_user_id",
+    "to_user_id",
+    "was_available",
+    "quantity",
+    "type",
+    "loan_date",
+    "returned_date",
+    "due_date",
+)
+
+INTERVAL_FIELDS = (
+    "loan_id",
+    "item_id",
+    "holder_id",
+    "lender_id",
+    "quantity",
+    "start",
+    "end",
+)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+# Largest id the database can store (signed 64-bit integer)
+MAX_ID = 2**63 - 1
+
+
+class ApiError(Exception):
+    """Raised by the API helpers to answer a request with a JSON error."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def hash_token(key):
+    """Returns the digest stored in ApiToken.key for a raw token."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def create_token(user, name):
+    """
+    Creates an API token for a user.
+
+    Parameters
+    ----------
+    user : User
+        The user the client will act as.
+    name : str
+        Label identifying the client.
+
+    Returns
+    -------
+    tuple
+        The ApiToken created and its raw key. The raw key is not stored and
+        cannot be recovered later.
+    """
+    key = secrets.token_urlsafe(32)
+    token = ApiToken.objects.create(key=hash_token(key), name=name, user=user)
+    return token, key
+
+
+def authenticate_token(request):
+    """
+    Returns the active user of the request's 'Authorization: Token' header.
+
+    Returns None when the header is missing or the token is unknown.
+    """
+    scheme, _, key = request.headers.get("Authorization", "").partition(" ")
+
+    if scheme.lower() != "token" or not key.strip():
+        return None
+
+    token = (
+        ApiToken.objects.select_related("user")
+        .filter(key=hash_token(key.strip()), user__is_active=True)
+        .first()
+    )
+
+    return token.user if token else None
+
+
+def error_response(message, status):
+    """Builds the JSON body of an API error."""
+    response = JsonResponse({"detail": message}, status=status)
+
+    if status == 401:
+        response["WWW-Authenticate"] = "Token"
+
+    return response
+
+
+def api_view(view_func):
+    """
+    Decorator for the JSON API views.
+
+    Accepts only GET (and HEAD), authenticates the token and stores its user
+    in 'request.user', turns ApiError into JSON error responses and adds the
+    ETag / 304 handling to successful responses.
+
+    Parameters
+    ----------
+    view_func : callable
+        The view, returning a JSON serializable dict.
+
+    Returns
+    -------
+    callable
+        The wrapped view.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return error_response("Method not allowed.", 405)
+
+        user = authenticate_token(request)
+
+        if user is None:
+            return error_response("Invalid or missing API token.", 401)
+
+        request.user = user
+
+        try:
+            data = view_func(request, *args, **kwargs)
+        except ApiError as error:
+            return error_response(str(error), error.status)
+
+        response = set_response_etag(JsonResponse(data))
+        return get_conditional_response(
+            request, etag=response["ETag"], response=response
+        )
+
+    return wrapper
+
+
+def parse_fields(request, allowed, key):
+    """
+    Reads the sparse fieldset of a request.
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The request. Reads the comma separated 'fields' parameter.
+    allowed : tuple
+        The public fields of the resource.
+    key : str
+        The primary key field, always returned so clients can page and link.
+
+    Returns
+    -------
+    list
+        The fields to select, the key first.
+
+    Raises
+    ------
+    ApiError
+        If an unknown field is requested.
+    """
+    requested = [name.strip() for name in request.GET.get("fields", "").split(",")]
+    requested = [name for name in requested if name]
+
+    if not requested:
+        return list(allowed)
+
+    unknown = sorted(set(requested) - set(allowed))
+
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}.")
+
+    return [key, *(name for name in dict.fromkeys(requested) if name != key)]
+
+
+def parse_limit(request):
+    """Reads the page size ('limit', 1 to MAX_LIMIT) of a request."""
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError("'limit' must be an integer.")
+
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f"'limit' must be between 1 and {MAX_LIMIT}.")
+
+    return limit
+
+
+def page_url(request, cursor):
+    """Builds the absolute URL of another page of the same listing."""
+    if cursor is None:
+        return None
+
+    query = request.GET.copy()
+    query["cursor"] = cursor
+    return request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+
+def parse_custody(request):
+    """
+    Reads the parameters of a custody lookup (see storage.custody.custody).
+
+    Parameters
+    ----------
+    request : HttpRequest
+        The request. Reads 'item' and 'user' (ids, at least one), 'at' (ISO
+        8601 instant, required) and 'until' (ISO 8601, optional).
+
+    Returns
+    -------
+    dict
+        The keyword arguments of custody(): 'start', 'end', 'item_id' and
+        'user_id'. Naive datetimes are taken in the current time zone.
+
+    Raises
+    ------
+    ApiError
+        If a parameter is missing or malformed.
+    """
+    lookup = {}
+
+    for name, argument in (("item", "item_id"), ("user", "user_id")):
+        value = request.GET.get(name)
+        # isdecimal(): int() rejects some isdigit() characters, such as "²"
+        if value is not None and not (value.isdecimal() and int(value) <= MAX_ID):
+            raise ApiError(f"'{name}' must be an id.")
+        lookup[argument] = int(value) if value is not None else None
+
+    if lookup["item_id"] is None and lookup["user_id"] is None:
+        raise ApiError("Give an 'item' or a 'user'.")
+
+    for name, argument in (("at", "start"), ("until", "end")):
+        value = request.GET.get(name)
+
+        try:
+            moment = parse_datetime(value) if value else None
+        except ValueError:
+            moment = None
+
+        if value and moment is None:
+            raise ApiError(f"'{name}' must be an ISO 8601 date and time.")
+
+        if moment is not None and timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        lookup[argument] = moment
+
+    if lookup["start"] is None:
+        raise ApiError("'at' is required.")
+
+    if lookup["end"] is not None and lookup["end"] <= lookup["start"]:
+        raise ApiError("'until' must be after 'at'.")
+
+    return lookup
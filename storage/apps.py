@@ -19,3 +19,9 @@ class StorageConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "storage"
+
+    def ready(self):
+        """
+        Connects the application's signal receivers once the registry is loaded.
+        """
+        from storage import signals  # noqa: F401
@@ -0,0 +1,193 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from storage.cache import aget_versions, bump, bump_items, get_versions
+from storage.models import Transaction, TransactionArchive
+
+"""
+Hot/cold split of the transaction history.
+
+Transaction (the hot table) keeps the active loans and the recent history;
+closed loan cycles whose 'returned_date' is older than
+STORAGE_ARCHIVE_AFTER_DAYS are moved to TransactionArchive by
+'manage.py archive_transactions', in batches of one INSERT ... SELECT and one
+DELETE per database transaction. A LOAN and the DEVOLUTION closing it carry
+the same 'returned_date', so a cycle always moves as a whole, and an active
+loan (no 'returned_date') never leaves the hot table.
+
+The listings chain the two tables (see storage.pagination.ChainedListing):
+the archive is only read when a page reaches its greatest key. Its counts and
+greatest keys are cached under the ARCHIVE scope version, which changes when
+rows are archived, and for at most STORAGE_ARCHIVE_CACHE_TIMEOUT seconds, so
+the hot pages seldom query it.
+"""
+
+ARCHIVE = "archive"
+
+ARCHIVE_KEY = "storage:archive:{}:{}:{}"
+
+# Seconds the archive's counts and greatest keys stay cached. Archiving bumps
+# them right away; the timeout bounds how long a change made without
+# 'archive_transactions' (admin deletes, manual cleanups) stays unnoticed.
+CACHE_TIMEOUT = 3600
+
+COLUMNS = [field.column for field in Transaction._meta.concrete_fields]
+
+
+def archive_cutoff(days=None):
+    """Returns the 'returned_date' before which the closed cycles are archived."""
+    if days is None:
+        days = getattr(settings, "STORAGE_ARCHIVE_AFTER_DAYS", 365)
+
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    """
+    Returns the hot transactions to archive for a cutoff.
+
+    Transactions still referenced by an Item's 'current_loan' are kept, so
+    the move never breaks that foreign key.
+    """
+    return Transaction.objects.filter(
+        returned_date__lt=cutoff, item_currently_assigned__isnull=True
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Moves one batch of closed transactions to the archive.
+
+    Parameters:
+    -----------
+    cutoff : datetime
+        Transactions returned before it are moved.
+    batch_size : int
+        The maximum number of transactions moved.
+
+    Returns:
+    --------
+    int:
+        The number of transactions moved (0 when nothing is left).
+    """
+    with transaction.atomic():
+        rows = list(
+            archivable(cutoff)
+            .order_by("id")
+            .values_list("id", "item_id", "from_user_id", "to_user_id")[:batch_size]
+        )
+
+        if not rows:
+            return 0
+
+        ids = [row[0] for row in rows]
+        columns = ", ".join(connection.ops.quote_name(column) for column in COLUMNS)
+        placeholders = ", ".join(["%s"] * len(ids))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {TransactionArchive._meta.db_table} ({columns}) "
+                f"SELECT {columns} FROM {Transaction._meta.db_table} "
+                f"WHERE id IN ({placeholders})",
+                ids,
+            )
+            cursor.execute(
+                f"DELETE FROM {Transaction._meta.db_table} WHERE id IN ({placeholders})",
+                ids,
+            )
+
+        bump(ARCHIVE)
+        bump_items(
+            [row[1] for row in rows],
+            [user_id for row in rows for user_id in row[2:]],
+        )
+
+    return len(rows)
+
+
+def _cache_timeout():
+    return getattr(settings, "STORAGE_ARCHIVE_CACHE_TIMEOUT", CACHE_TIMEOUT)
+
+
+def _digest(queryset):
+    return hashlib.md5(str(queryset.query).encode(), usedforsecurity=False).hexdigest()
+
+
+def _cache_key(queryset, name):
+    (version,) = get_versions([ARCHIVE])
+    return ARCHIVE_KEY.format(name, version, _digest(queryset))
+
+
+async def _acache_key(queryset, name):
+    (version,) = await aget_versions([ARCHIVE])
+    return ARCHIVE_KEY.format(name, version, _digest(queryset))
+
+
+def archived_count(queryset):
+    """
+    Returns the count of an archive queryset, cached until the next archiving
+    (or for STORAGE_ARCHIVE_CACHE_TIMEOUT seconds).
+
+    Parameters:
+    -----------
+    queryset : QuerySet
+        A TransactionArchive queryset.
+
+    Returns:
+    --------
+    int:
+        The number of rows.
+    """
+    key = _cache_key(queryset, "count")
+    count = cache.get(key)
+
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout=_cache_timeout())
+
+    return count
+
+
+async def aarchived_count(queryset):
+    """Asynchronous version of archived_count, for the async views."""
+    key = await _acache_key(queryset, "count")
+    count = await cache.aget(key)
+
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, timeout=_cache_timeout())
+
+    return count
+
+
+def archived_max(queryset, key):
+    """
+    Returns the greatest key of an archive queryset (None when empty), cached
+    until the next archiving (or for STORAGE_ARCHIVE_CACHE_TIMEOUT seconds).
+    """
+    cache_key = _cache_key(queryset, f"max-{key}")
+    value = cache.get(cache_key, ())
+
+    if value == ():
+        value = queryset.aggregate(value=Max(key))["value"]
+        cache.set(cache_key, value, timeout=_cache_timeout())
+
+    return value
+
+
+async def aarchived_max(queryset, key):
+    """Asynchronous version of archived_max, for the async views."""
+    cache_key = await _acache_key(queryset, f"max-{key}")
+    value = await cache.aget(cache_key, ())
+
+    if value == ():
+        value = (await queryset.aaggregate(value=Max(key)))["value"]
+        await cache.aset(cache_key, value, timeout=_cache_timeout())
+
+    return value
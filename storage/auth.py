@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+"""
+Authentication backend of the 'storage' application.
+
+With database sessions every authenticated request reads the session row and
+then the user row. CachedModelBackend keeps the users in Django's cache so,
+combined with signed-cookie or cached_db sessions (see the session profiles
+in project/settings.py), a logged request can be served without touching
+either table.
+"""
+
+USER_KEY = "storage:user:{}"
+
+
+def user_cache_key(user_id):
+    """Returns the cache key of a User loaded by CachedModelBackend."""
+    return USER_KEY.format(user_id)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that caches the users it loads for each request.
+
+    The User is stored for STORAGE_USER_CACHE_TIMEOUT seconds and deleted
+    from the cache by a signal receiver (storage.signals) whenever it is saved
+    or deleted, so password changes (which invalidate the session hash),
+    deactivations and the 'last_login' update of a new login are seen on the
+    next request. With several server processes the cache must be shared
+    (Memcached, Redis): a process-local cache would keep serving the old user
+    in the other processes until the timeout.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+
+        if user is None:
+            user = super().get_user(user_id)
+
+            if user is None:
+                return None
+
+            cache.set(key, user, getattr(settings, "STORAGE_USER_CACHE_TIMEOUT", 60))
+
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,320 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from storage import events
+
+"""
+Versioned response cache for the read-heavy views of the 'storage' application.
+
+Every cached page depends on one or more "scopes" (the item listing, a single
+item, a user). Each scope has a version counter stored in Django's cache and
+the version numbers are part of the page's cache key. Writes never delete
+pages: the signal receivers in storage.signals bump the versions of the scopes
+they affect, so only the pages built from those scopes miss on the next read
+and the stale entries simply expire.
+
+Hits and misses are counted per view and exposed through cache_stats(), the
+'cache_stats' management command and the 'X-Cache' response header.
+
+The same pages answer conditional GETs (conditional_page): their ETag and
+Last-Modified come from cheap lookups (scope versions, an item's 'updated_at',
+the highest transaction id), so a browser or client holding the current page
+gets a 304 Not Modified without the view running.
+"""
+
+VERSION_KEY = "storage:version:{}"
+PAGE_KEY = "storage:page:{}:{}"
+STATS_KEY = "storage:stats:{}:{}"
+
+ITEMS = "items"
+
+
+def item_scope(item_id):
+    """Returns the scope of the pages showing a single item."""
+    return f"item:{item_id}"
+
+
+def user_scope(user_id):
+    """Returns the scope of the pages showing a single user."""
+    return f"user:{user_id}"
+
+
+def _increment(key, initial=0):
+    """Atomically increments a counter stored in the cache."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, initial, timeout=None)
+        return cache.incr(key)
+
+
+async def _aincrement(key, initial=0):
+    """Asynchronous version of _increment."""
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, initial, timeout=None)
+        return await cache.aincr(key)
+
+
+def _increment_version(key):
+    """
+    Increments a scope version.
+
+    Missing versions start from a time based value, so a version that was
+    evicted never goes back to a number used by pages still in the cache.
+    """
+    return _increment(key, initial=time.time_ns())
+
+
+def get_versions(scopes):
+    """
+    Returns the current version of each scope.
+
+    Parameters
+    ----------
+    scopes : list
+        The scope names.
+
+    Returns
+    -------
+    list
+        The versions, in the same order as the scopes.
+    """
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+
+    return [versions.get(key) or _increment_version(key) for key in keys]
+
+
+async def aget_versions(scopes):
+    """Asynchronous version of get_versions, for the async views."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = await cache.aget_many(keys)
+
+    return [
+        versions.get(key) or await _aincrement(key, initial=time.time_ns())
+        for key in keys
+    ]
+
+
+def bump(*scopes):
+    """
+    Invalidates every cached page that depends on the given scopes.
+
+    The versions are bumped right away and again when the current database
+    transaction commits, so a concurrent request cannot cache a page rendered
+    from the data as it was before the commit.
+
+    Parameters
+    ----------
+    *scopes : str
+        The scope names (None values are ignored).
+    """
+    keys = [VERSION_KEY.format(scope) for scope in scopes if scope is not None]
+
+    def increment():
+        for key in keys:
+            _increment_version(key)
+
+    increment()
+    transaction.on_commit(increment)
+
+
+def bump_items(item_ids=(), user_ids=()):
+    """
+    Invalidates the listing plus the pages of the given items and users.
+
+    Once the database transaction commits, the availability feed
+    (storage.events) of this process publishes the changes.
+
+    Parameters
+    ----------
+    item_ids : iterable, optional
+        Primary keys of the changed items.
+    user_ids : iterable, optional
+        Primary keys of the users whose pages show the change.
+    """
+    bump(
+        ITEMS,
+        *(item_scope(item_id) for item_id in set(item_ids)),
+        *(user_scope(user_id) for user_id in set(user_ids) if user_id is not None),
+    )
+    transaction.on_commit(events.wake)
+
+
+def record(view_name, outcome):
+    """Counts a cache 'hits' or 'misses' for a view."""
+    _increment(STATS_KEY.format(view_name, outcome))
+
+
+def cache_stats(view_names=("index", "item", "user_profile")):
+    """
+    Returns the hit and miss counters of the cached views.
+
+    Parameters
+    ----------
+    view_names : iterable, optional
+        The names of the views to report.
+
+    Returns
+    -------
+    dict
+        A {view_name: {"hits": int, "misses": int}} dictionary.
+    """
+    stats = {}
+
+    for view_name in view_names:
+        counters = cache.get_many(
+            [STATS_KEY.format(view_name, outcome) for outcome in ("hits", "misses")]
+        )
+        stats[view_name] = {
+            outcome: counters.get(STATS_KEY.format(view_name, outcome), 0)
+            for outcome in ("hits", "misses")
+        }
+
+    return stats
+
+
+def page_cache_key(request, view_name, scopes):
+    """
+    Builds the cache key of a page.
+
+    The key combines the view, the versions of its scopes, the full path
+    (page number, cursor, search) and the user's identity and CSRF secret,
+    because the pages render per-user buttons and CSRF-protected forms.
+    """
+    return PAGE_KEY.format(view_name, page_digest(request, get_versions(scopes)))
+
+
+def page_digest(request, values):
+    """
+    Hashes the values a page depends on with the identity of the request
+    (full path, user and CSRF secret).
+    """
+    get_token(request)
+
+    parts = [
+        request.get_full_path(),
+        str(request.user.pk),
+        request.META.get("CSRF_COOKIE", ""),
+        *(str(value) for value in values),
+    ]
+
+    return hashlib.md5("|".join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def versioned_cache(scopes):
+    """
+    Decorator caching a view's GET responses under versioned keys.
+
+    Requests that are not GET, or that have pending flash messages to show,
+    are passed through. Only successful (200) responses are stored.
+
+    Parameters
+    ----------
+    scopes : callable
+        Receives the view's arguments (request, *args, **kwargs) and returns
+        the list of scopes the page depends on.
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+
+    def decorator(view_func):
+        view_name = view_func.__name__
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or len(messages.get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            key = page_cache_key(request, view_name, scopes(request, *args, **kwargs))
+            cached = cache.get(key)
+
+            if cached is not None:
+                record(view_name, "hits")
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response["X-Cache"] = "HIT"
+                return response
+
+            record(view_name, "misses")
+            response = view_func(request, *args, **kwargs)
+
+            if response.status_code == 200 and not response.streaming:
+                cache.set(
+                    key,
+                    (response.content, response["Content-Type"]),
+                    getattr(settings, "STORAGE_CACHE_TIMEOUT", 300),
+                )
+                response["X-Cache"] = "MISS"
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_page(state):
+    """
+    Decorator answering the conditional GETs of a view (ETag, Last-Modified).
+
+    'state' runs before the view and must be cheap (a cache read, an indexed
+    MAX or primary key lookup): when the request's If-None-Match (or
+    If-Modified-Since) still matches, a 304 Not Modified is returned without
+    running the view's queries or rendering its template. The ETag also
+    covers the user and the CSRF secret, because the pages render per-user
+    buttons and CSRF-protected forms. Responses are marked "private,
+    no-cache", so browsers revalidate them instead of guessing a freshness
+    from Last-Modified. Requests that are not GET or HEAD, or that have
+    pending flash messages to show, are passed through.
+
+    Parameters
+    ----------
+    state : callable
+        Receives the view's arguments (request, *args, **kwargs) and returns
+        a (values, last_modified) tuple: the values that change whenever the
+        page does, and the datetime of its last change (or None).
+
+    Returns
+    -------
+    callable
+        The decorator.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or len(
+                messages.get_messages(request)
+            ):
+                return view_func(request, *args, **kwargs)
+
+            values, last_modified = state(request, *args, **kwargs)
+            etag = f'"{page_digest(request, values)}"'
+
+            response = condition(
+                etag_func=lambda *args, **kwargs: etag,
+                last_modified_func=lambda *args, **kwargs: last_modified,
+            )(view_func)(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,13 @@
+from storage.events import is_live
+
+"""
+Template context processors of the 'storage' application.
+"""
+
+
+def live_events(request):
+    """
+    Adds 'live_events', true when the availability feed (storage.events) can
+    be served, so 'global/base.html' only loads its script under ASGI.
+    """
+    return {"live_events": is_live(request)}
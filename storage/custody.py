@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models import Q
+
+from storage.models import LoanInterval, Transaction, TransactionArchive
+
+"""
+Point-in-time custody over the loan history (LoanInterval).
+
+Every LOAN opens an interval [start, end) of the borrower holding its units;
+the DEVOLUTION closing the loan sets 'end'. The loan services call
+open_intervals() and close_intervals() inside the database transaction of the
+loan, so the intervals commit or roll back with it:
+
+    loan = Transaction.objects.create(...)
+    open_intervals([loan])
+
+Custody questions then read the intervals with custody(): an "as of" lookup
+(who held the item at T) or a range lookup (what a user held during a week),
+both served by the (item or holder, start, end) indexes.
+
+Loans written without the services (seed_data, the admin, raw SQL) are
+repaired with 'manage.py rebuild_loan_intervals', built on rebuild().
+"""
+
+BATCH_SIZE = 1000
+
+# Intervals listed by the custody page
+MAX_RESULTS = 500
+
+
+def interval(loan):
+    """Returns the (unsaved) LoanInterval of a LOAN transaction."""
+    return LoanInterval(
+        loan_id=loan.pk,
+        item_id=loan.item_id,
+        holder_id=loan.to_user_id,
+        lender_id=loan.from_user_id,
+        quantity=loan.quantity,
+        start=loan.loan_date,
+        end=loan.returned_date,
+    )
+
+
+def open_intervals(loans):
+    """
+    Creates the intervals of new LOANs with one bulk_create.
+
+    Parameters:
+    -----------
+    loans : list
+        The LOAN transactions just created.
+    """
+    LoanInterval.objects.bulk_create([interval(loan) for loan in loans])
+
+
+def close_intervals(loan_ids, end):
+    """
+    Closes the intervals of returned LOANs with one UPDATE.
+
+    Parameters:
+    -----------
+    loan_ids : list
+        The ids of the LOANs closed.
+    end : datetime
+        The 'returned_date' written to the LOANs.
+    """
+    LoanInterval.objects.filter(loan_id__in=loan_ids, end__isnull=True).update(
+        end=end
+    )
+
+
+def custody(start, end=None, item_id=None, user_id=None):
+    """
+    Returns the custody intervals of an item or a user at a time or in a range.
+
+    Parameters:
+    -----------
+    start : datetime
+        The instant looked up or, with 'end', the start of the range.
+    end : datetime, optional
+        The (excluded) end of the range. Without it the lookup is "as of"
+        'start': the intervals holding the units at that instant.
+    item_id : int, optional
+        Keeps the intervals of this Item.
+    user_id : int, optional
+        Keeps the intervals held by this User.
+
+    Returns:
+    --------
+    QuerySet:
+        The matching LoanIntervals, with the item, holder and lender joined,
+        in start order.
+    """
+    if end is None:
+        started = Q(start__lte=start)
+    else:
+        started = Q(start__lt=end)
+
+    intervals = LoanInterval.objects.filter(
+        started, Q(end__isnull=True) | Q(end__gt=start)
+    )
+
+    if item_id is not None:
+        intervals = intervals.filter(item_id=item_id)
+
+    if user_id is not None:
+        intervals = intervals.filter(holder_id=user_id)
+
+    return intervals.select_related("item", "holder", "lender").order_by(
+        "start", "loan_id"
+    )
+
+
+def rebuild():
+    """
+    Replaces the intervals with the ones of the LOANs of both transaction
+    tables, in one database transaction.
+
+    Returns:
+    --------
+    int:
+        The number of intervals written.
+    """
+    written = 0
+
+    with transaction.atomic():
+        LoanInterval.objects.all().delete()
+
+        for model in (Transaction, TransactionArchive):
+            loans = (
+                model.objects.filter(type=Transaction.LOAN)
+                .only(
+                    "id",
+                    "item_id",
+                    "from_user_id",
+                    "to_user_id",
+                    "quantity",
+                    "loan_date",
+                    "returned_date",
+                )
+                .order_by("id")
+            )
+            batch = []
+
+            for loan in loans.iterator(chunk_size=BATCH_SIZE):
+                batch.append(interval(loan))
+
+                if len(batch) == BATCH_SIZE:
+                    LoanInterval.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+
+            LoanInterval.objects.bulk_create(batch)
+            written += len(batch)
+
+    return written
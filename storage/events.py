@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+
+from storage.models import Item
+
+"""
+Server-sent events of item availability ('events/items/').
+
+Each event loop (one per ASGI server process) keeps one Broadcaster. The
+browsers connected to it are subscribers, each with a small asyncio.Queue
+awaited by its streaming response, so an idle connection costs a queue and a
+suspended coroutine and no thread or query of its own.
+
+While there are subscribers, a single polling task reads the items whose
+'updated_at' (indexed) moved since the previous poll and fans the changes
+out to every queue: one query per poll whatever the number of connections.
+The poll runs every STORAGE_EVENTS_POLL_INTERVAL seconds, and right away
+when a loan or devolution of the same process commits (bump_items() calls
+wake()). The database is the only channel, so writes made by other
+processes (WSGI workers, 'manage.py run_workers') reach the browsers at the
+next poll without a message broker.
+
+Each event carries the item's 'updated_at' as its id, so a reconnecting
+browser (EventSource sends Last-Event-ID) first gets the changes it missed.
+
+Under WSGI a streaming response holds a worker thread for as long as it is
+open, so the feed is only served through ASGI (is_live()): elsewhere the
+page does not load the script and the endpoint answers 204 No Content,
+which stops EventSource from reconnecting.
+"""
+
+logger = logging.getLogger("storage.events")
+
+# Seconds re-read by every poll, covering the writes committed after their
+# 'updated_at' timestamp was taken
+OVERLAP = 2
+
+# Events buffered per connection; a client that falls this far behind is
+# disconnected and catches up when its browser reconnects
+QUEUE_SIZE = 100
+
+# Changes sent to a reconnecting browser
+MAX_CATCH_UP = 500
+
+# Milliseconds the browser waits before reconnecting
+RETRY = 3000
+
+FIELDS = ("item_id", "is_available", "quantity", "updated_at")
+
+
+def event(row):
+    """Formats an 'availability' event from an Item values() row."""
+    data = json.dumps(
+        {
+            "item_id": row["item_id"],
+            "is_available": row["is_available"],
+            "quantity": row["quantity"],
+        }
+    )
+    return (
+        f"id: {row['updated_at'].timestamp():.6f}\n"
+        f"event: availability\ndata: {data}\n\n"
+    )
+
+
+def changes(since):
+    """Returns the values() rows of the items updated at or after 'since'."""
+    return (
+        Item.objects.filter(updated_at__gte=since)
+        .order_by("updated_at", "item_id")
+        .values(*FIELDS)
+    )
+
+
+class Broadcaster:
+    """
+    Fans the availability changes out to the connections of one event loop.
+
+    subscribe() and unsubscribe() run in the loop; wake() may be called from
+    any thread.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.subscribers = set()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def subscribe(self):
+        """Returns a new subscriber queue, starting the poll if needed."""
+        if self.task is None:
+            self.task = self.loop.create_task(self.poll())
+
+        queue = asyncio.Queue(QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def wake(self):
+        """Makes the polling task read the changes now (thread-safe)."""
+        if self.task is None:
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        except RuntimeError:
+            # the loop was closed
+            pass
+
+    def publish(self, message):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def poll(self):
+        """Reads and publishes the changes while there are subscribers."""
+        interval = getattr(settings, "STORAGE_EVENTS_POLL_INTERVAL", 2)
+        since = timezone.now()
+        seen = set()
+
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), interval)
+            except TimeoutError:
+                pass
+
+            self.wakeup.clear()
+            now = timezone.now()
+
+            try:
+                rows = [
+                    row async for row in changes(since - timedelta(seconds=OVERLAP))
+                ]
+            except Exception:
+                logger.exception("Could not read the item changes.")
+                continue
+
+            since = now
+            keys = [(row["item_id"], row["updated_at"]) for row in rows]
+            message = "".join(
+                event(row) for row, key in zip(rows, keys) if key not in seen
+            )
+            seen = set(keys)
+
+            if message:
+                self.publish(message)
+
+        self.task = None
+
+
+# One Broadcaster per event loop (an ASGI server runs one loop per process)
+broadcasters = weakref.WeakKeyDictionary()
+_broadcasters_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """Returns the Broadcaster of the running event loop."""
+    loop = asyncio.get_running_loop()
+
+    with _broadcasters_lock:
+        if loop not in broadcasters:
+            broadcasters[loop] = Broadcaster(loop)
+
+        return broadcasters[loop]
+
+
+def wake():
+    """Publishes the committed item changes to this process's connections."""
+    with _broadcasters_lock:
+        current = list(broadcasters.values())
+
+    for broadcaster in current:
+        broadcaster.wake()
+
+
+def is_live(request):
+    """
+    Tells whether the request is served through ASGI, where the feed can stay
+    open without holding a worker thread.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def parse_event_id(value):
+    """Returns the datetime of a Last-Event-ID, or None if it is invalid."""
+    try:
+        return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+async def stream(last_event_id=None):
+    """
+    Yields the server-sent events of one connection.
+
+    Parameters:
+    -----------
+    last_event_id : str, optional
+        The Last-Event-ID header of a reconnecting browser.
+
+    Yields:
+    -------
+    str:
+        The events, and a comment every STORAGE_EVENTS_KEEPALIVE seconds that
+        keeps proxies from closing an idle connection.
+    """
+    keepalive = getattr(settings, "STORAGE_EVENTS_KEEPALIVE", 15)
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe()
+
+    try:
+        yield f"retry: {RETRY}\n\n"
+
+        # subscribed first: a change made meanwhile is sent twice, not lost
+        if (since := parse_event_id(last_event_id)) is not None:
+            missed = "".join(
+                [event(row) async for row in changes(since)[:MAX_CATCH_UP]]
+            )
+
+            if missed:
+                yield missed
+
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), keepalive)
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            if message is None:
+                return
+
+            yield message
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,249 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from storage.models import Item, Transaction, TransactionArchive
+from storage.search import search_filter
+
+"""
+Row serialization for the streaming exports of the 'storage' application.
+
+The exports walk the whole table with queryset.iterator(chunk_size=...), turn
+each object into a flat row and encode the rows as CSV or NDJSON (one JSON
+object per line). Rows are produced one chunk at a time, so memory stays
+constant whatever the number of rows and the header is sent before the first
+query runs.
+
+The same rows back the streamed downloads (storage.views.export_views) and
+the background export job (storage.jobs).
+"""
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+ITEM_COLUMNS = (
+    "item_id",
+    "object",
+    "description",
+    "quantity",
+    "storage_location",
+    "is_available",
+    "created_date",
+    "updated_at",
+    "owner_id",
+    "owner_username",
+    "borrower_id",
+    "borrower_username",
+)
+
+TRANSACTION_COLUMNS = (
+    "id",
+    "type",
+    "item_id",
+    "item_object",
+    "from_user_id",
+    "from_username",
+    "to_user_id",
+    "to_username",
+    "quantity",
+    "was_available",
+    "loan_date",
+    "returned_date",
+)
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def item_row(item):
+    """
+    Flattens an Item loaded with 'owner' and 'current_loan__to_user'.
+
+    Returns
+    -------
+    list
+        The values of ITEM_COLUMNS.
+    """
+    borrower = item.current_loan.to_user if item.current_loan else None
+
+    return [
+        item.item_id,
+        item.object,
+        item.description,
+        item.quantity,
+        item.storage_location,
+        item.is_available,
+        item.created_date,
+        item.updated_at,
+        item.owner_id,
+        item.owner.username if item.owner else None,
+        borrower.pk if borrower else None,
+        borrower.username if borrower else None,
+    ]
+
+
+def transaction_row(transaction):
+    """
+    Flattens a Transaction loaded with 'item', 'from_user' and 'to_user'.
+
+    Returns
+    -------
+    list
+        The values of TRANSACTION_COLUMNS.
+    """
+    return [
+        transaction.id,
+        transaction.type,
+        transaction.item_id,
+        transaction.item.object if transaction.item else None,
+        transaction.from_user_id,
+        transaction.from_user.username if transaction.from_user else None,
+        transaction.to_user_id,
+        transaction.to_user.username if transaction.to_user else None,
+        transaction.quantity,
+        transaction.was_available,
+        transaction.loan_date,
+        transaction.returned_date,
+    ]
+
+
+def export_querysets(resource, search_value=""):
+    """
+    Returns the querysets read by an export, in output order.
+
+    Items are read in 'item_id' order, joining the owner and the current
+    borrower ('current_loan__to_user'). Transactions are read in 'id' order
+    with the item and both users joined, the archived ones
+    (TransactionArchive) first. A search term keeps the items matching it
+    (and their transactions), like the search view.
+
+    Parameters
+    ----------
+    resource : str
+        "items" or "transactions".
+    search_value : str, optional
+        The search term.
+
+    Returns
+    -------
+    list
+        The querysets.
+    """
+    if resource == "items":
+        items = Item.objects.select_related(
+            "owner", "current_loan__to_user"
+        ).order_by("item_id")
+
+        if search_value:
+            items = items.filter(search_filter(search_value))
+
+        return [items]
+
+    querysets = []
+    for model in (TransactionArchive, Transaction):
+        queryset = model.objects.for_listing().order_by("id")
+
+        if search_value:
+            queryset = queryset.filter(search_filter(search_value, "item_id"))
+
+        querysets.append(queryset)
+
+    return querysets
+
+
+def export_rows(resource, search_value, chunk_size):
+    """
+    Yields the row values of an export, reading chunk_size objects per query.
+
+    Parameters
+    ----------
+    resource : str
+        "items" or "transactions".
+    search_value : str
+        The search term (empty for every row).
+    chunk_size : int
+        The queryset.iterator() chunk size.
+
+    Yields
+    ------
+    list
+        The values of the resource's columns (EXPORTS).
+    """
+    row = EXPORTS[resource][1]
+
+    for queryset in export_querysets(resource, search_value):
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            yield row(obj)
+
+
+def _batched(lines, size):
+    """
+    Joins the encoded rows into chunks of 'size' rows.
+
+    The first row is sent alone, so the client gets data as soon as the
+    first database chunk is read.
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+
+    if first is not None:
+        yield first
+
+    batch = []
+
+    for line in lines:
+        batch.append(line)
+
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+
+    if batch:
+        yield "".join(batch)
+
+
+def stream_rows(export_format, columns, rows, batch_size):
+    """
+    Encodes rows as CSV or NDJSON, chunk by chunk.
+
+    Parameters
+    ----------
+    export_format : str
+        "csv" or "ndjson".
+    columns : tuple
+        The column names (CSV header and NDJSON keys).
+    rows : iterable
+        The row values, in the order of the columns.
+    batch_size : int
+        Number of rows joined into each chunk sent to the client.
+
+    Yields
+    ------
+    str
+        The CSV header first (immediately), then the encoded rows.
+    """
+    if export_format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        lines = (writer.writerow(row) for row in rows)
+    else:
+        lines = (
+            json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + "\n"
+            for row in rows
+        )
+
+    yield from _batched(lines, batch_size)
+
+
+# Resource -> (columns, row function)
+EXPORTS = {
+    "items": (ITEM_COLUMNS, item_row),
+    "transactions": (TRANSACTION_COLUMNS, transaction_row),
+}
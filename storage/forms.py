@@ -1,11 +1,19 @@
 from django.core.exceptions import ValidationError
 from django import forms
+from django.conf import settings
+from storage.jobs import MAINTENANCE_COMMANDS
 from storage.models import Item
+from storage.search import MAX_ITEM_ID
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.contrib.auth import password_validation
 
 
+STORAGE_LOCATIONS = ("Storage 1", "Storage 2", "Storage 3", "Warehouse")
+MIN_QUANTITY = 1
+MAX_QUANTITY = 10
+
+
 class ItemForm(forms.ModelForm):
     """
     Form for creating and updating the Item model.
@@ -20,10 +28,11 @@ class ItemForm(forms.ModelForm):
         Text area for optional, detailed description of the item (max 150 chars).
     is_available : CharField
         Checkbox field to set the item's availability status.
-    storage_location : CharField
-        Dropdown select field with pre-defined storage location choices.
+    storage_location : ChoiceField
+        Dropdown select field restricted to the STORAGE_LOCATIONS choices.
     quantity : IntegerField
-        Numeric input field with range validation (min 1, max 10).
+        Numeric input field validated in range (MIN_QUANTITY 1, MAX_QUANTITY 10),
+        or from 0 when editing an existing item.
     """
 
     description = forms.CharField(
@@ -40,32 +49,28 @@ class ItemForm(forms.ModelForm):
         label="Availability",
     )
 
-    storage_location = forms.CharField(
-        widget=forms.Select(
-            choices=[
-                (None, ""),
-                ("Storage 1", "Storage 1"),
-                ("Storage 2", "Storage 2"),
-                ("Storage 3", "Storage 3"),
-                ("Warehouse", "Warehouse"),
-            ],
-        ),
+    storage_location = forms.ChoiceField(
+        choices=[(None, ""), *((location, location) for location in STORAGE_LOCATIONS)],
         label="Storage Location",
     )
 
-    quantity = forms.IntegerField(
-        widget=forms.NumberInput(attrs={"min": "1", "max": "10"}),
-    )
+    quantity = forms.IntegerField(min_value=MIN_QUANTITY, max_value=MAX_QUANTITY)
 
     def __init__(self, *args, **kwargs):
         """
         Initializes the ItemForm.
 
         Ensures the form is correctly bound to the Item instance or prepared
-        for creation based on the provided arguments.
+        for creation based on the provided arguments. An existing item may be
+        saved with quantity 0: the quantity left once all units are lent.
         """
         super().__init__(*args, **kwargs)
 
+        if self.instance.pk is not None:
+            self.fields["quantity"] = forms.IntegerField(
+                min_value=0, max_value=MAX_QUANTITY
+            )
+
     class Meta:
         """
         Meta options for the ItemForm.
@@ -82,33 +87,34 @@ class ItemForm(forms.ModelForm):
             "description",
         )
 
-        def clean(self):
-            """
-            Performs custom validation and cleans the form data.
+    def clean(self):
+        """
+        Performs custom validation and cleans the form data.
 
-            This method is responsible for complex validation logic involving
-            field dependencies, specifically checking for consistency between quantity and availability.
+        This method is responsible for complex validation logic involving
+        field dependencies, specifically checking for consistency between quantity and availability.
 
-            Returns
-            -------
-            dict
+        Returns
+        -------
+        dict
             The cleaned and validated data dictionary.
-            """
+        """
 
-            cleaned_data = super().clean()
+        cleaned_data = super().clean()
 
-            quantity = cleaned_data.get("quantity", 0)
-            is_available_checked = cleaned_data.get("is_available")
+        quantity = cleaned_data.get("quantity")
+        # the checkbox is read by a CharField, so it cleans to "True" or "False"
+        is_available_checked = cleaned_data.get("is_available") == "True"
 
-            if quantity == 0 and is_available_checked:
-                self.add_error(
-                    "is_available",
-                    ValidationError(
-                        "Item cannot be available if the quantity is zero.",
-                        code="invalid",
-                    ),
-                )
-            return super().clean()
+        if quantity == 0 and is_available_checked:
+            self.add_error(
+                "is_available",
+                ValidationError(
+                    "Item cannot be available if the quantity is zero.",
+                    code="invalid",
+                ),
+            )
+        return cleaned_data
 
 
 class RegisterForm(UserCreationForm):
@@ -342,3 +348,208 @@ class RegisterUpdateForm(forms.ModelForm):
                 self.add_error("password1", ValidationError(errors))
 
         return password1
+
+
+class BulkTransactionForm(forms.Form):
+    """
+    Form for lending or returning many items in a single request.
+
+    Accepts a free list of item IDs (one per line, or separated by spaces or
+    commas, as produced by barcode scanners) and the action to apply to all
+    of them.
+
+    Fields:
+    -------
+    action : ChoiceField
+        Either "loan" or "return".
+    item_ids : CharField
+        Text area with the IDs of the items.
+    """
+
+    action = forms.ChoiceField(
+        choices=[("loan", "Loan"), ("return", "Return")],
+        initial="loan",
+    )
+
+    item_ids = forms.CharField(
+        widget=forms.Textarea(attrs={"placeholder": "Scan or type the item IDs"}),
+        label="Item IDs",
+    )
+
+    def clean_item_ids(self):
+        """
+        Custom validation method for the 'item_ids' field.
+
+        Splits the text on whitespace and commas, checks every token is a
+        numeric ID and drops repeated IDs while keeping their order.
+
+        Returns
+        -------
+        list
+            The unique item IDs as integers.
+
+        Raises
+        ------
+        ValidationError
+            If a token is not a number, or more IDs than
+            STORAGE_BULK_MAX_ITEMS are given.
+        """
+        tokens = self.cleaned_data.get("item_ids", "").replace(",", " ").split()
+
+        # isdecimal(): int() rejects some isdigit() characters, such as "²"
+        invalid = [
+            token
+            for token in tokens
+            if not (token.isdecimal() and int(token) <= MAX_ITEM_ID)
+        ]
+        if invalid:
+            raise ValidationError(
+                f"Invalid item IDs: {', '.join(invalid)}", code="invalid"
+            )
+
+        item_ids = list(dict.fromkeys(int(token) for token in tokens))
+
+        limit = getattr(settings, "STORAGE_BULK_MAX_ITEMS", 100)
+        if len(item_ids) > limit:
+            raise ValidationError(
+                f"At most {limit} items can be processed at once.", code="invalid"
+            )
+
+        return item_ids
+
+
+class CustodyForm(forms.Form):
+    """
+    Form of the custody lookups over the loan intervals (storage.custody).
+
+    Asks who held an item, or what a user held, either at one instant ("as
+    of" only) or during a range ("as of" and "until").
+
+    Fields:
+    -------
+    item : IntegerField
+        ID of the item looked up (optional if a user is given).
+    user : CharField
+        Username of the holder looked up (optional if an item is given).
+    at : DateTimeField
+        The instant looked up, or the start of the range.
+    until : DateTimeField
+        The (excluded) end of the range (optional).
+    """
+
+    item = forms.IntegerField(
+        label="Item ID", required=False, min_value=1, max_value=2**63 - 1
+    )
+    user = forms.CharField(label="Username", required=False, max_length=150)
+    at = forms.DateTimeField(
+        label="As of",
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}),
+    )
+    until = forms.DateTimeField(
+        label="Until",
+        required=False,
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local"}),
+    )
+
+    def clean_user(self):
+        """
+        Custom validation method for the 'user' field.
+
+        Returns
+        -------
+        User or None
+            The User with the given username, or None if it was left empty.
+
+        Raises
+        ------
+        ValidationError
+            If no user has that username.
+        """
+        username = self.cleaned_data.get("user", "").strip()
+
+        if not username:
+            return None
+
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            raise ValidationError("User not found.", code="invalid")
+
+        return user
+
+    def clean(self):
+        """
+        Checks that an item or a user is given and that the range is valid.
+
+        Raises
+        ------
+        ValidationError
+            If neither an item nor a user is given, or 'until' is not after
+            'at'.
+        """
+        cleaned_data = super().clean()
+
+        if not cleaned_data.get("item") and not cleaned_data.get("user"):
+            if "user" not in self.errors:
+                raise ValidationError(
+                    "Inform an item ID or a username.", code="invalid"
+                )
+
+        at, until = cleaned_data.get("at"), cleaned_data.get("until")
+        if at and until and until <= at:
+            self.add_error("until", "Must be after 'As of'.")
+
+        return cleaned_data
+
+
+class ExportJobForm(forms.Form):
+    """
+    Form queuing an export as a background job (storage.jobs).
+
+    Fields:
+    -------
+    resource : ChoiceField
+        "items" or "transactions".
+    export_format : ChoiceField
+        "csv" or "ndjson".
+    search_value : CharField
+        Optional search term filtering the items, like the search view.
+    """
+
+    resource = forms.ChoiceField(
+        choices=[("items", "Items"), ("transactions", "Transactions")]
+    )
+    export_format = forms.ChoiceField(
+        label="Format", choices=[("csv", "CSV"), ("ndjson", "NDJSON")]
+    )
+    search_value = forms.CharField(label="Search", required=False, max_length=100)
+
+
+class MaintenanceJobForm(forms.Form):
+    """
+    Form queuing a maintenance or reconciliation command as a background job.
+
+    Fields:
+    -------
+    command : ChoiceField
+        One of storage.jobs.MAINTENANCE_COMMANDS.
+    """
+
+    command = forms.ChoiceField(
+        choices=[(command, command) for command in MAINTENANCE_COMMANDS]
+    )
+
+
+class ImportJobForm(forms.Form):
+    """
+    Form queuing an import of items from a CSV file as a background job.
+
+    Fields:
+    -------
+    file : FileField
+        The CSV file (columns of 'manage.py import_items').
+    owner : CharField
+        Username owning the rows without an 'owner' value (optional).
+    """
+
+    file = forms.FileField(label="CSV file")
+    owner = forms.CharField(label="Default owner", required=False, max_length=150)
@@ -0,0 +1,435 @@
+import io
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F
+from django.utils import timezone
+
+from storage.export import EXPORTS, FORMATS, export_querysets, export_rows, stream_rows
+from storage.models import Job
+
+"""
+Database-backed background jobs.
+
+A request queues a slow operation with enqueue() and returns right away; the
+'manage.py run_workers' command polls the Job table and runs the queued jobs
+in a thread (or process) pool, on the same box, without an outside broker:
+
+    job = enqueue("export", user=request.user, resource="items")
+
+Jobs are plain functions registered by name with @register. They receive a
+JobContext, whose progress() stores the completion shown by the job status
+page, followed by the job's params as keyword arguments, and return a JSON
+value stored in Job.result.
+
+A worker claims a job with a conditional UPDATE (only a queued job becomes
+running), so several workers never run the same job. A job that raises is
+queued again after STORAGE_JOB_RETRY_DELAY seconds, doubled at every
+attempt, until it runs out of attempts. The worker refreshes the heartbeat
+of its job every HEARTBEAT_INTERVAL seconds; a running job whose heartbeat is
+older than STORAGE_JOB_TIMEOUT seconds lost its worker (a crash, a restart)
+and is handled as a failed attempt.
+"""
+
+JOBS = {}
+
+# Commands the "command" job may run (reconciliation and maintenance)
+MAINTENANCE_COMMANDS = (
+    "archive_transactions",
+    "rebuild_inventory_summary",
+    "rebuild_loan_intervals",
+    "rebuild_search_index",
+    "rebuild_user_stats",
+    "scan_overdue",
+)
+
+# Seconds between two progress writes of a job (besides the percent changing)
+PROGRESS_INTERVAL = 1
+
+# Seconds between two heartbeats of a running job
+HEARTBEAT_INTERVAL = 30
+
+# Defaults of STORAGE_JOB_TIMEOUT (seconds without heartbeat before a running
+# job counts as a failed attempt) and STORAGE_JOB_RETRY_DELAY (first retry
+# delay, doubled at each attempt), mirrored by project/settings.py
+JOB_TIMEOUT = 300
+RETRY_DELAY = 30
+
+
+def register(name):
+    """Decorator registering a job function under a name."""
+
+    def decorator(function):
+        JOBS[name] = function
+        return function
+
+    return decorator
+
+
+def job_dir():
+    """Returns the directory of the files read and written by the jobs."""
+    return Path(getattr(settings, "STORAGE_JOB_DIR", settings.BASE_DIR / "jobs"))
+
+
+def enqueue(name, user=None, max_attempts=3, **params):
+    """
+    Queues a job.
+
+    Parameters:
+    -----------
+    name : str
+        The registered job function.
+    user : User, optional
+        The user queuing the job.
+    max_attempts : int, optional
+        The runs allowed before the job fails for good.
+    **params
+        The keyword arguments of the job function (JSON values).
+
+    Returns:
+    --------
+    Job:
+        The queued Job.
+
+    Raises:
+    -------
+    ValueError
+        If no job is registered under the name.
+    """
+    if name not in JOBS:
+        raise ValueError(f"Unknown job {name!r}.")
+
+    return Job.objects.create(
+        name=name, params=params, user=user, max_attempts=max_attempts
+    )
+
+
+class JobContext:
+    """
+    Handle given to a running job function.
+
+    Attributes:
+    -----------
+    job : Job
+        The Job being run.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._percent = None
+        self._written = 0
+
+    def progress(self, done, total=None, message=""):
+        """
+        Reports the progress of the job.
+
+        Writes at most once per PROGRESS_INTERVAL seconds unless the percent
+        changed.
+
+        Parameters:
+        -----------
+        done : int
+            The units of work done (the percent itself without 'total').
+        total : int, optional
+            The units of work of the whole job.
+        message : str, optional
+            A short description of the current step.
+        """
+        percent = min(100, done * 100 // total) if total else min(100, done)
+        now = time.monotonic()
+
+        if percent == self._percent and now - self._written < PROGRESS_INTERVAL:
+            return
+
+        self._percent, self._written = percent, now
+        Job.objects.filter(pk=self.job.pk).update(
+            progress=percent, message=message[:200], heartbeat=timezone.now()
+        )
+
+
+def claim(limit):
+    """
+    Claims up to 'limit' queued jobs that are due, oldest first.
+
+    Returns:
+    --------
+    list:
+        The claimed Jobs, now running.
+    """
+    now = timezone.now()
+    candidates = (
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("pk", flat=True)[:limit]
+    )
+    claimed = [
+        pk
+        for pk in candidates
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            progress=0,
+            message="",
+            started_date=now,
+            heartbeat=now,
+        )
+    ]
+
+    return list(Job.objects.filter(pk__in=claimed).order_by("pk"))
+
+
+def fail(job, error):
+    """Queues a failed run again with backoff, or fails the job for good."""
+    now = timezone.now()
+    job.refresh_from_db(fields=["attempts", "max_attempts"])
+
+    if job.attempts < job.max_attempts:
+        delay = getattr(settings, "STORAGE_JOB_RETRY_DELAY", RETRY_DELAY)
+        changes = {
+            "status": Job.QUEUED,
+            "run_after": now + timedelta(seconds=delay * 2 ** (job.attempts - 1)),
+        }
+    else:
+        changes = {"status": Job.FAILED, "finished_date": now}
+
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+        error=error, heartbeat=now, **changes
+    )
+
+
+def requeue_stale():
+    """
+    Handles the running jobs whose worker died as failed attempts.
+
+    Returns:
+    --------
+    int:
+        The number of jobs found.
+    """
+    timeout = getattr(settings, "STORAGE_JOB_TIMEOUT", JOB_TIMEOUT)
+    stale = Job.objects.filter(
+        status=Job.RUNNING, heartbeat__lt=timezone.now() - timedelta(seconds=timeout)
+    )
+
+    jobs = list(stale)
+    for job in jobs:
+        fail(job, f"No heartbeat for {timeout} seconds: the worker was lost.")
+
+    return len(jobs)
+
+
+def run_job(job):
+    """
+    Runs a claimed job and stores its result or its failure.
+
+    Parameters:
+    -----------
+    job : Job
+        A Job claimed by claim().
+    """
+    function = JOBS.get(job.name)
+
+    try:
+        if function is None:
+            raise LookupError(f"Unknown job {job.name!r}.")
+
+        result = function(JobContext(job), **job.params)
+    except Exception:
+        fail(job, traceback.format_exc())
+        return
+
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+        status=Job.DONE,
+        progress=100,
+        result=result,
+        error="",
+        finished_date=now,
+        heartbeat=now,
+    )
+
+
+def _heartbeat(job_id, stop):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        Job.objects.filter(pk=job_id, status=Job.RUNNING).update(
+            heartbeat=timezone.now()
+        )
+
+    connection.close()
+
+
+def _work(job_id):
+    """
+    Runs a job in a pool worker, beating its heartbeat meanwhile. Each thread
+    uses (and closes) its own database connection.
+    """
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True).start()
+
+    try:
+        run_job(Job.objects.get(pk=job_id))
+    finally:
+        stop.set()
+        connection.close()
+
+
+def _init_process():
+    django.setup()
+
+
+def run_workers(workers, processes=False, burst=False, poll_interval=1.0, log=None):
+    """
+    Runs the queued jobs in a pool until interrupted.
+
+    Parameters:
+    -----------
+    workers : int
+        The jobs run at the same time.
+    processes : bool, optional
+        Runs the jobs in processes instead of threads (for CPU bound jobs).
+    burst : bool, optional
+        Returns once no job is running or due, instead of polling forever
+        (jobs waiting for a retry are left for the next run).
+    poll_interval : float, optional
+        Seconds between two polls of an idle queue.
+    log : callable, optional
+        Receives a line per claimed and finished job.
+
+    Returns:
+    --------
+    int:
+        The number of jobs run.
+    """
+    log = log or (lambda line: None)
+
+    if processes:
+        # the children must open their own connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(workers, initializer=_init_process)
+    else:
+        pool = ThreadPoolExecutor(workers, thread_name_prefix="storage-job")
+
+    running = {}
+    ran = 0
+
+    with pool:
+        while True:
+            for future in [future for future in running if future.done()]:
+                job_id = running.pop(future)
+
+                try:
+                    future.result()
+                except Exception as error:
+                    log(f"Job #{job_id} crashed its worker: {error!r}")
+                else:
+                    log(f"Job #{job_id} finished.")
+
+            if stale := requeue_stale():
+                log(f"{stale} jobs lost their worker.")
+
+            jobs = claim(workers - len(running)) if len(running) < workers else []
+
+            for job in jobs:
+                log(f"Job #{job.pk} ({job.name}) started, attempt {job.attempts}.")
+                running[pool.submit(_work, job.pk)] = job.pk
+                ran += 1
+
+            if burst and not running and not jobs:
+                return ran
+
+            if not jobs:
+                time.sleep(poll_interval)
+
+
+@register("export")
+def export_job(context, resource, export_format="csv", search_value=""):
+    """
+    Writes an export (see storage.export) to a file of the job directory.
+
+    Returns:
+    --------
+    dict:
+        The name of the file written ('file') and its number of rows ('rows').
+    """
+    if resource not in EXPORTS or export_format not in FORMATS:
+        raise ValueError("Unknown export.")
+
+    columns = EXPORTS[resource][0]
+    chunk_size = getattr(settings, "STORAGE_EXPORT_CHUNK_SIZE", 2000)
+    total = sum(
+        queryset.count() for queryset in export_querysets(resource, search_value)
+    )
+
+    directory = job_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"job-{context.job.pk}-{resource}.{export_format}"
+    written = 0
+
+    def rows():
+        nonlocal written
+
+        for row in export_rows(resource, search_value, chunk_size):
+            yield row
+            written += 1
+
+            if written % chunk_size == 0:
+                context.progress(written, total, f"{written} of {total} rows")
+
+    with open(directory / name, "w", newline="", encoding="utf-8") as file:
+        for chunk in stream_rows(export_format, columns, rows(), chunk_size):
+            file.write(chunk)
+
+    return {"file": name, "rows": written}
+
+
+@register("import_items")
+def import_job(context, path, owner=None):
+    """
+    Runs 'import_items' on a CSV file of the job directory.
+
+    Returns:
+    --------
+    dict:
+        The command's report ('output') and the rows it skipped ('errors').
+    """
+    output, errors = io.StringIO(), io.StringIO()
+    context.progress(0, message="Importing")
+
+    call_command(
+        "import_items",
+        str(job_dir() / Path(path).name),
+        owner=owner,
+        stdout=output,
+        stderr=errors,
+    )
+
+    return {"output": output.getvalue(), "errors": errors.getvalue()}
+
+
+@register("command")
+def command_job(context, command, **options):
+    """
+    Runs one of the MAINTENANCE_COMMANDS.
+
+    Returns:
+    --------
+    dict:
+        The command's report ('output').
+    """
+    if command not in MAINTENANCE_COMMANDS:
+        raise ValueError(f"{command!r} cannot run as a job.")
+
+    output = io.StringIO()
+    context.progress(0, message=f"Running {command}")
+
+    call_command(command, stdout=output, stderr=output, **options)
+
+    return {"output": output.getvalue()}
@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from storage.archive import archive_batch, archive_cutoff, archivable
+
+
+class Command(BaseCommand):
+    """
+    Management command that moves the old closed loan cycles to the archive.
+
+    Transactions returned more than --days days ago (STORAGE_ARCHIVE_AFTER_DAYS
+    by default) are moved from Transaction to TransactionArchive in batches of
+    --batch-size rows, one database transaction per batch (see
+    storage.archive), so the hot table stays small and the loans keep running
+    while it works. Active loans are never moved. With --dry-run nothing is
+    written: the command only counts the transactions to move.
+
+    Usage:
+    ------
+    python manage.py archive_transactions
+    python manage.py archive_transactions --days 180 --batch-size 5000
+    """
+
+    help = "Moves closed loan cycles older than the given age to the archive table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Archive the cycles returned more than DAYS days ago "
+            "(default: STORAGE_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Transactions moved per database transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the transactions to archive.",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] is not None and options["days"] < 0:
+            raise CommandError("--days cannot be negative.")
+
+        if options["batch_size"] < 1:
+            raise CommandError("Use a batch size of at least 1.")
+
+        cutoff = archive_cutoff(options["days"])
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{archivable(cutoff).count()} transactions returned before "
+                f"{cutoff:%Y-%m-%d %H:%M} would be archived."
+            )
+            return
+
+        start = time.perf_counter()
+        moved = 0
+
+        while batch := archive_batch(cutoff, options["batch_size"]):
+            moved += batch
+
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Archived {moved} transactions...")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {moved} transactions returned before "
+                f"{cutoff:%Y-%m-%d %H:%M} in {elapsed:.1f}s "
+                f"({moved / elapsed if elapsed else 0:.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,189 @@
+import asyncio
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from storage.models import Item
+
+
+class Command(BaseCommand):
+    """
+    Management command that compares the throughput of the synchronous views
+    served through the WSGI handler with their async versions served through
+    the ASGI handler, under concurrent clients.
+
+    Each view is requested '--requests' times by '--concurrency' clients:
+    threads running django.test.Client (WSGIHandler, one thread per client)
+    against coroutines running django.test.AsyncClient (ASGIHandler, one
+    event loop). Requests run in-process against the configured database, so
+    the numbers measure Django and the ORM, not a web server. The versioned
+    page cache is disabled during the run, otherwise the WSGI views would
+    only measure cache hits.
+
+    Note that on SQLite the async ORM still runs every query on a single
+    database thread, so the async views mostly save threads rather than
+    time; a server database shows the difference better.
+
+    Usage:
+    ------
+    python manage.py bench_async --requests 400 --concurrency 20 --user admin
+    """
+
+    help = "Compares WSGI (sync views) and ASGI (async views) throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests sent to each view, per entry point (default: 200).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=10,
+            help="Number of concurrent clients (default: 10).",
+        )
+        parser.add_argument(
+            "--user",
+            help="Username of the logged user (default: the first user).",
+        )
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        concurrency = options["concurrency"]
+
+        if total < 2 or concurrency < 1:
+            raise CommandError("Use at least 2 requests and 1 client.")
+
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+        else:
+            user = User.objects.order_by("pk").first()
+
+        if user is None:
+            raise CommandError("No user found. Create one or seed the database first.")
+
+        item_id = Item.objects.values_list("pk", flat=True).first()
+        counts = [
+            total // concurrency + (1 if index < total % concurrency else 0)
+            for index in range(concurrency)
+        ]
+
+        targets = [
+            ("index", (), {}),
+            ("search", (), {"q": "a"}),
+            ("transactions", (), {}),
+            ("user_profile", (user.pk,), {}),
+        ]
+        if item_id is not None:
+            targets.insert(2, ("item", (item_id,), {}))
+
+        self.stdout.write(
+            f"{'view':<14}{'entry':<7}{'requests':>9}{'req/s':>10}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}"
+        )
+
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            STORAGE_CACHE_TIMEOUT=0,
+        ):
+            for name, args, query in targets:
+                sync_url = reverse(f"items:{name}", args=args)
+                async_url = reverse(f"items:{name}_async", args=args)
+
+                wsgi_clients = self.logged_clients(Client, user, counts)
+                self.report(
+                    name, "wsgi", *self.run_wsgi(wsgi_clients, sync_url, query, counts)
+                )
+
+                asgi_clients = self.logged_clients(AsyncClient, user, counts)
+                self.report(
+                    name,
+                    "asgi",
+                    *asyncio.run(self.run_asgi(asgi_clients, async_url, query, counts)),
+                )
+
+    def logged_clients(self, client_class, user, counts):
+        """Builds one logged-in client per worker, before the timer starts."""
+        clients = []
+
+        for _ in counts:
+            client = client_class()
+            client.force_login(user)
+            clients.append(client)
+
+        return clients
+
+    def run_wsgi(self, clients, url, query, counts):
+        """
+        Sends the requests from one thread per client; returns (elapsed,
+        latencies, errors).
+        """
+        latencies = []
+        errors = []
+
+        def worker(client, count):
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    response = client.get(url, query)
+                    latencies.append(time.perf_counter() - start)
+
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(client, count))
+            for client, count in zip(clients, counts)
+        ]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return time.perf_counter() - start, latencies, errors
+
+    async def run_asgi(self, clients, url, query, counts):
+        """
+        Sends the requests from one coroutine per client; returns (elapsed,
+        latencies, errors).
+        """
+        latencies = []
+        errors = []
+
+        async def worker(client, count):
+            for _ in range(count):
+                start = time.perf_counter()
+                response = await client.get(url, query)
+                latencies.append(time.perf_counter() - start)
+
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(worker(client, count) for client, count in zip(clients, counts))
+        )
+
+        return time.perf_counter() - start, latencies, errors
+
+    def report(self, name, entry, elapsed, latencies, errors):
+        percentiles = statistics.quantiles(latencies, n=100)
+        p50, p95 = percentiles[49] * 1000, percentiles[94] * 1000
+
+        self.stdout.write(
+            f"{name:<14}{entry:<7}{len(latencies):>9}{len(latencies) / elapsed:>10.1f}"
+            f"{p50:>9.1f}{p95:>9.1f}{len(errors):>8}"
+        )
@@ -0,0 +1,160 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from storage.management.commands.bench_views import Command as BenchViewsCommand
+from storage.models import Item
+
+
+class Command(BaseCommand):
+    """
+    Management command that compares the database round trips of the session
+    profiles (STORAGE_SESSION_PROFILES in project/settings.py).
+
+    For every profile a logged-in test client runs the same sequence per
+    round: the item listing, an item page, a loan and a devolution (each
+    following its redirect, which shows a flash message) and the user's
+    profile. Every request's queries are captured and split into those on
+    the session table, those loading the logged user and the rest, so the
+    round trips removed by each profile show up directly.
+
+    The data lives in the 'bench_views' benchmark database of the given size
+    (created and seeded if needed). The versioned page cache is disabled, as
+    in 'bench_views'.
+
+    Usage:
+    ------
+    python manage.py bench_sessions --rounds 20 --size 10000
+    """
+
+    help = "Compares the per-request queries of the session profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profiles",
+            default=",".join(settings.STORAGE_SESSION_PROFILES),
+            help="Comma separated profiles (default: all).",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=20,
+            help="Request sequences per profile (default: 20).",
+        )
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=10000,
+            help="Items of the benchmark database (default: 10000).",
+        )
+        parser.add_argument(
+            "--fresh",
+            action="store_true",
+            help="Recreate and reseed the benchmark database.",
+        )
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"].split(",")
+        unknown = set(profiles) - set(settings.STORAGE_SESSION_PROFILES)
+
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}.")
+
+        if options["rounds"] < 1:
+            raise CommandError("Use at least 1 round.")
+
+        bench = BenchViewsCommand(stdout=self.stdout, stderr=self.stderr)
+        results = []
+
+        with bench.benchmark_database(options["size"], options["fresh"]):
+            bench.seed(options["size"], None)
+            user, _ = User.objects.get_or_create(username="bench_sessions")
+            items = list(
+                Item.objects.filter(is_available=True)
+                .exclude(owner=user)
+                .values_list("pk", flat=True)[: options["rounds"]]
+            )
+
+            for profile in profiles:
+                with override_settings(
+                    **settings.STORAGE_SESSION_PROFILES[profile],
+                    STORAGE_CACHE_TIMEOUT=0,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                ):
+                    cache.clear()
+                    results.append((profile, self.run_rounds(user, items)))
+
+        self.stdout.write(
+            f"\n{'profile':<16}{'queries/req':>12}{'session':>10}"
+            f"{'user':>8}{'other':>8}{'p50 step ms':>13}"
+        )
+        for profile, measures in results:
+            self.stdout.write(
+                f"{profile:<16}{measures['queries']:>12.2f}"
+                f"{measures['session']:>10.2f}{measures['user']:>8.2f}"
+                f"{measures['other']:>8.2f}{measures['p50_ms']:>13.1f}"
+            )
+
+    def run_rounds(self, user, items):
+        """
+        Runs the request sequence once per item.
+
+        Returns the average queries per HTTP request (redirects included) and
+        the median latency of a step (a request and its redirects).
+        """
+        client = Client()
+        client.force_login(user)
+
+        profile_url = reverse("items:user_profile", args=(user.pk,))
+        counts = {"queries": 0, "session": 0, "user": 0, "other": 0}
+        latencies = []
+        requests = 0
+
+        def request(method, url, data=None):
+            nonlocal requests
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = getattr(client, method)(url, data, follow=True)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            # the followed redirects are requests too
+            requests += 1 + len(response.redirect_chain)
+
+            for query in queries:
+                counts["queries"] += 1
+                counts[self.classify(query["sql"], user)] += 1
+
+        for item_id in items:
+            transaction_url = reverse("items:transaction", args=(item_id,))
+
+            request("get", reverse("items:index"))
+            request("get", reverse("items:item", args=(item_id,)))
+            request("post", transaction_url, {"action": "loan", "quantity": 1})
+            request("post", transaction_url, {"action": "return"})
+            request("get", profile_url)
+
+        return {
+            **{key: value / requests for key, value in counts.items()},
+            "p50_ms": statistics.median(latencies),
+        }
+
+    def classify(self, sql, user):
+        """Tells whether a query is on the session table, loads the user or else."""
+        if '"django_session"' in sql:
+            return "session"
+
+        if sql.startswith('SELECT "auth_user"') and sql.endswith(
+            f'"auth_user"."id" = {user.pk} LIMIT 21'
+        ):
+            return "user"
+
+        return "other"
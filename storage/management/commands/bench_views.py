@@ -0,0 +1,322 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from math import ceil
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from storage.models import Item, Transaction
+
+ITEMS_PER_USER = 20
+WARMUP = 3
+
+
+class Command(BaseCommand):
+    """
+    Management command that benchmarks the storage views at several data sizes.
+
+    For every size a dedicated database is created next to the test database
+    ('bench_<size>', kept between runs) and seeded with 'seed_data' up to that
+    number of items. Each view is then requested through the test client
+    (the full middleware and template stack, no network): 'index', 'search',
+    'item', 'transactions', 'user_profile', and 'ItemTransaction' as a loan
+    and a devolution. The versioned page cache is disabled unless --cache is
+    given, so every request reaches the database.
+
+    Per view and size the p50/p95/mean latency, the number of queries and the
+    peak memory allocated while serving one request (tracemalloc, measured on
+    a separate request so it does not slow the timed ones) are written to a
+    JSON file named after the current commit. --compare prints the change
+    against a previous file and flags regressions.
+
+    Usage:
+    ------
+    python manage.py bench_views --sizes 10000,100000,1000000 --requests 50
+    python manage.py bench_views --sizes 10000 --compare benchmarks/<commit>.json
+    """
+
+    help = "Benchmarks the storage views at several data sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="10000,100000,1000000",
+            help="Comma separated item counts (default: 10000,100000,1000000).",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=50,
+            help="Timed requests per view and size (default: 50).",
+        )
+        parser.add_argument(
+            "--output",
+            help="Results file (default: benchmarks/<commit>.json).",
+        )
+        parser.add_argument(
+            "--compare",
+            help="Previous results file to compare with.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=20,
+            help="Latency increase (%%) flagged as a regression (default: 20).",
+        )
+        parser.add_argument(
+            "--fresh",
+            action="store_true",
+            help="Recreate and reseed the benchmark databases.",
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Keep the versioned page cache enabled.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes used by seed_data (default: its own default).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options["sizes"].split(",")})
+        except ValueError:
+            raise CommandError("--sizes must be a list of integers.")
+
+        if options["requests"] < 2 or not sizes or sizes[0] < 1:
+            raise CommandError("Use at least 2 requests and positive sizes.")
+
+        previous = None
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                previous = json.load(file)
+
+        commit = self.current_commit()
+        results = []
+
+        overrides = {"ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "testserver"]}
+        if not options["cache"]:
+            overrides["STORAGE_CACHE_TIMEOUT"] = 0
+
+        for size in sizes:
+            with self.benchmark_database(size, options["fresh"]):
+                self.seed(size, options["workers"])
+                cache.clear()
+
+                with override_settings(**overrides):
+                    for view, measures in self.run_views(options["requests"]):
+                        results.append({"size": size, "view": view, **measures})
+                        self.write_result(results[-1])
+
+        payload = {
+            "commit": commit,
+            "date": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "requests": options["requests"],
+            "cache": options["cache"],
+            "results": results,
+        }
+
+        output = settings.BASE_DIR / (
+            options["output"] or Path("benchmarks") / f"{commit}.json"
+        )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(payload, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if previous:
+            self.compare(previous, payload, options["threshold"])
+
+    def current_commit(self):
+        """Returns the short hash of the checked out commit, or 'unknown'."""
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return "unknown"
+
+    @contextmanager
+    def benchmark_database(self, size, fresh):
+        """Switches the default connection to the benchmark database of a size."""
+        test_settings = connection.settings_dict.setdefault("TEST", {})
+        old_test_name = test_settings.get("NAME")
+        old_name = connection.settings_dict["NAME"]
+
+        if connection.vendor == "sqlite":
+            test_settings["NAME"] = settings.BASE_DIR / f"bench_{size}.sqlite3"
+        else:
+            test_settings["NAME"] = f"bench_{size}"
+
+        try:
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, keepdb=not fresh, serialize=False
+            )
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=True)
+            test_settings["NAME"] = old_test_name
+
+    def seed(self, size, workers):
+        """Tops the current database up to 'size' items."""
+        missing = size - Item.objects.count()
+
+        if missing > 0:
+            self.stdout.write(f"Seeding {missing} items for size {size}...")
+            options = {"workers": workers} if workers is not None else {}
+            call_command(
+                "seed_data",
+                users=ceil(missing / ITEMS_PER_USER),
+                items_per_user=ITEMS_PER_USER,
+                loans_per_item=1,
+                seed=size,
+                stdout=self.stdout,
+                **options,
+            )
+
+    def run_views(self, requests):
+        """Yields (view name, measures) for every benchmarked view."""
+        user, _ = User.objects.get_or_create(username="bench_user")
+        client = Client()
+        client.force_login(user)
+
+        item_id = Item.objects.order_by("-pk").values_list("pk", flat=True).first()
+        profile_id = (
+            Transaction.objects.order_by("-id")
+            .values_list("to_user_id", flat=True)
+            .first()
+        ) or user.pk
+
+        def get(url, data=None):
+            return lambda index: client.get(url, data)
+
+        yield "index", self.measure(get(reverse("items:index")), requests)
+        yield "search", self.measure(
+            get(reverse("items:search"), {"q": "parafuso"}), requests
+        )
+        yield "item", self.measure(
+            get(reverse("items:item", args=(item_id,))), requests
+        )
+        yield "transactions", self.measure(get(reverse("items:transactions")), requests)
+        yield "user_profile", self.measure(
+            get(reverse("items:user_profile", args=(profile_id,))), requests
+        )
+
+        # Loans and devolutions need a fresh item per request
+        items = list(
+            Item.objects.filter(is_available=True)
+            .exclude(owner=user)
+            .values_list("pk", flat=True)[: requests + WARMUP + 1]
+        )
+
+        if len(items) < requests + WARMUP + 1:
+            return
+
+        def transact(action):
+            return lambda index: client.post(
+                reverse("items:transaction", args=(items[index],)),
+                {"action": action, "quantity": 1},
+            )
+
+        yield "loan", self.measure(transact("loan"), requests)
+        yield "return", self.measure(transact("return"), requests)
+
+    def measure(self, request, requests):
+        """
+        Times a request function; returns its latency, query and memory measures.
+
+        The function receives a different index on every call (warm-up calls
+        first, then the timed ones and one last call traced for queries and
+        memory).
+        """
+        for index in range(WARMUP):
+            request(index)
+
+        latencies = []
+        errors = 0
+
+        for index in range(WARMUP, WARMUP + requests):
+            start = time.perf_counter()
+            response = request(index)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            request(WARMUP + requests)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(latencies, n=100)
+
+        return {
+            "p50_ms": round(percentiles[49], 2),
+            "p95_ms": round(percentiles[94], 2),
+            "mean_ms": round(statistics.mean(latencies), 2),
+            "queries": len(queries),
+            "peak_kb": round(peak / 1024, 1),
+            "errors": errors,
+        }
+
+    def write_result(self, result):
+        self.stdout.write(
+            f"{result['size']:>9} {result['view']:<14}"
+            f"p50 {result['p50_ms']:>8.1f}ms  p95 {result['p95_ms']:>8.1f}ms  "
+            f"{result['queries']:>3} queries  {result['peak_kb']:>9.1f}KB peak"
+            f"{'  ' + str(result['errors']) + ' errors' if result['errors'] else ''}"
+        )
+
+    def compare(self, previous, current, threshold):
+        """Prints the change of every measure present in both result sets."""
+        old = {(row["size"], row["view"]): row for row in previous["results"]}
+
+        self.stdout.write(f"\nCompared with {previous.get('commit', 'previous run')}:")
+
+        for row in current["results"]:
+            before = old.get((row["size"], row["view"]))
+
+            if before is None:
+                continue
+
+            changes = []
+            regression = False
+
+            for measure in ("p50_ms", "p95_ms", "peak_kb"):
+                change = (
+                    (row[measure] - before[measure]) / before[measure] * 100
+                    if before[measure]
+                    else 0
+                )
+                changes.append(f"{measure} {change:+.0f}%")
+                regression |= measure != "peak_kb" and change > threshold
+
+            queries = row["queries"] - before["queries"]
+            changes.append(f"queries {queries:+d}")
+            regression |= queries > 0
+
+            line = f"{row['size']:>9} {row['view']:<14}{'  '.join(changes)}"
+            self.stdout.write(self.style.ERROR(line) if regression else line)
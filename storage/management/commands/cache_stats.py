@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from storage.cache import cache_stats
+
+
+class Command(BaseCommand):
+    """
+    Management command that prints the hit and miss counters of the
+    versioned page cache, per view.
+
+    The counters live in the configured cache backend, so this only reports
+    the web processes' numbers when the backend is shared (not LocMemCache).
+
+    Usage:
+    ------
+    python manage.py cache_stats
+    """
+
+    help = "Shows the hit/miss counters of the cached storage views."
+
+    def handle(self, *args, **options):
+        for view_name, counters in cache_stats().items():
+            total = counters["hits"] + counters["misses"]
+            ratio = counters["hits"] / total if total else 0
+
+            self.stdout.write(
+                f"{view_name}: {counters['hits']} hits, "
+                f"{counters['misses']} misses ({ratio:.0%} hit ratio)"
+            )
@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from storage.api import create_token
+
+
+class Command(BaseCommand):
+    """
+    Management command that creates a token for the JSON API.
+
+    The raw token is printed once; only its digest is stored. Revoke a token
+    by deleting it in the admin.
+
+    Usage:
+    ------
+    python manage.py create_api_token <username> --name "Scanner 1"
+    """
+
+    help = "Creates a JSON API token for a user and prints it."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="The user the client acts as.")
+        parser.add_argument(
+            "--name",
+            default="api",
+            help="Label identifying the client (default: 'api').",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+
+        if user is None:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+
+        token, key = create_token(user, options["name"][:50])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Created token '{token.name}' for {user.username}:")
+        )
+        self.stdout.write(key)
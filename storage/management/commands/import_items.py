@@ -0,0 +1,169 @@
+import csv
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from storage import stats, summary
+from storage.cache import bump_items
+from storage.forms import ItemForm
+from storage.models import Item
+from storage.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Management command that imports Items from a CSV file.
+
+    The file is read row by row (never loaded whole) and every row is
+    validated by ItemForm, so imported items follow the same rules as the
+    ones created in the site (quantity range, storage location choices,
+    description length). Owners are resolved from the 'owner' column
+    (a username) through a username -> id map loaded once.
+
+    Valid rows are inserted with Item.objects.bulk_create in batches, each
+    batch in its own database transaction together with its search index
+    entries, the owners' 'items_owned' counters and the inventory summary.
+    Invalid rows are reported with their line number and skipped;
+    a batch that fails in the database is reported and the import goes on.
+
+    Expected columns: object, description, quantity, storage_location,
+    is_available ("true"/"false"), owner (optional with --owner).
+
+    Usage:
+    ------
+    python manage.py import_items items.csv --owner admin --batch-size 1000
+    """
+
+    help = "Imports items from a CSV file, validating rows with ItemForm."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The CSV file ('-' reads standard input).")
+        parser.add_argument(
+            "--owner",
+            help="Username owning the rows without an 'owner' value.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows inserted per bulk_create and transaction (default: 1000).",
+        )
+        parser.add_argument(
+            "--delimiter",
+            default=",",
+            help="Field delimiter of the file (default: ',').",
+        )
+
+    def handle(self, *args, **options):
+        owners = dict(User.objects.values_list("username", "pk"))
+
+        default_owner = options["owner"]
+        if default_owner and default_owner not in owners:
+            raise CommandError(f"User '{default_owner}' does not exist.")
+
+        if options["path"] == "-":
+            return self.import_file(sys.stdin, owners, default_owner, options)
+
+        try:
+            with open(options["path"], newline="", encoding="utf-8-sig") as file:
+                return self.import_file(file, owners, default_owner, options)
+        except OSError as error:
+            raise CommandError(f"Cannot read '{options['path']}': {error}")
+
+    def import_file(self, file, owners, default_owner, options):
+        reader = csv.DictReader(file, delimiter=options["delimiter"])
+        batch_size = max(options["batch_size"], 1)
+
+        self.imported = 0
+        self.errors = 0
+        self.owner_ids = set()
+
+        start = time.perf_counter()
+        batch = []
+
+        for row in reader:
+            item = self.build_item(reader.line_num, row, owners, default_owner)
+
+            if item is None:
+                continue
+
+            batch.append((reader.line_num, item))
+
+            if len(batch) >= batch_size:
+                self.insert(batch)
+                batch = []
+
+        if batch:
+            self.insert(batch)
+
+        elapsed = time.perf_counter() - start
+
+        # bulk_create sends no signals, so invalidate the cached pages once
+        if self.imported:
+            bump_items(user_ids=self.owner_ids)
+
+        rows = self.imported + self.errors
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {self.imported} of {rows} rows in {elapsed:.2f}s "
+                f"({rows / elapsed if elapsed else 0:.0f} rows/s), {self.errors} errors."
+            )
+        )
+
+    def build_item(self, line, row, owners, default_owner):
+        """Validates a row with ItemForm; returns the unsaved Item or None."""
+        username = (row.pop("owner", None) or "").strip() or default_owner
+
+        if not username:
+            return self.reject(line, "owner: This field is required.")
+
+        if username not in owners:
+            return self.reject(line, f"owner: User '{username}' does not exist.")
+
+        form = ItemForm(data=row)
+
+        if not form.is_valid():
+            return self.reject(
+                line,
+                "; ".join(
+                    f"{field}: {' '.join(messages)}"
+                    for field, messages in form.errors.items()
+                ),
+            )
+
+        item = form.save(commit=False)
+        item.owner_id = owners[username]
+        return item
+
+    def reject(self, line, message):
+        self.errors += 1
+        self.stderr.write(f"line {line}: {message}")
+
+    def insert(self, batch):
+        """Inserts a batch of (line, Item) pairs and their search index entries."""
+        items = [item for _, item in batch]
+
+        try:
+            with transaction.atomic():
+                Item.objects.bulk_create(items)
+                get_search_backend().index_items(items)
+
+                deltas = stats.new_deltas()
+                inventory = summary.new_deltas()
+                for item in items:
+                    deltas[item.owner_id]["items_owned"] += 1
+                    summary.count_item(inventory, summary.item_state(item))
+                stats.apply(deltas)
+                summary.apply(inventory, create=True)
+        except DatabaseError as error:
+            self.errors += len(batch)
+            self.stderr.write(
+                f"lines {batch[0][0]}-{batch[-1][0]}: batch not imported ({error})"
+            )
+            return
+
+        self.imported += len(items)
+        self.owner_ids.update(item.owner_id for item in items)
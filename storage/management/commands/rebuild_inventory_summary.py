@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from storage import summary
+
+
+class Command(BaseCommand):
+    """
+    Management command that reconciles the inventory summary.
+
+    Recomputes the summary rows from the item table (see storage.summary),
+    reports every row that had drifted and replaces the table, in one
+    database transaction. Needed after writes that bypass the Item signals
+    and the loan services (queryset updates, raw SQL). With --check nothing
+    is written: the command only reports the drift and fails if there is any.
+
+    Usage:
+    ------
+    python manage.py rebuild_inventory_summary
+    python manage.py rebuild_inventory_summary --check
+    """
+
+    help = "Rebuilds the inventory summary from the items, reporting its drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare the summary with the items; fail if it drifted.",
+        )
+
+    def handle(self, *args, **options):
+        differences = summary.drift() if options["check"] else summary.rebuild()
+
+        for dimension, key, stored, expected in differences:
+            self.stderr.write(
+                f"{dimension}={key}: {stored[0]} items / {stored[1]} units, "
+                f"expected {expected[0]} / {expected[1]}"
+            )
+
+        if options["check"] and differences:
+            raise CommandError(f"{len(differences)} summary rows do not match.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Corrected {len(differences)} summary rows."
+                if not options["check"]
+                else "The inventory summary is consistent."
+            )
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from storage import custody
+
+
+class Command(BaseCommand):
+    """
+    Management command that recreates the custody intervals (LoanInterval).
+
+    Rebuilds one interval per LOAN of the hot and archived transaction tables
+    (see storage.custody). Needed after loans written without the loan
+    services (the admin, raw SQL) and after bulk loads that skip it.
+
+    Usage:
+    ------
+    python manage.py rebuild_loan_intervals
+    """
+
+    help = "Recreates the custody intervals from the loan transactions."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = custody.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {written} loan intervals in "
+                f"{time.perf_counter() - start:.1f}s."
+            )
+        )
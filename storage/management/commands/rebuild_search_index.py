@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from storage.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Management command that rebuilds the item full-text search index.
+
+    Needed after data is written without model signals, such as
+    Item.objects.bulk_create() in the seed scripts, or when switching backends.
+
+    Usage:
+    ------
+    python manage.py rebuild_search_index
+    """
+
+    help = "Rebuilds the full-text search index of the items."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+
+        with transaction.atomic():
+            total = backend.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {total} items with {backend.__class__.__name__}."
+            )
+        )
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from storage import stats
+
+# Mismatches listed before the summary
+SHOWN_MISMATCHES = 20
+
+
+class Command(BaseCommand):
+    """
+    Management command that recomputes and verifies the per-user counters.
+
+    Rebuilds every UserStats row from the items and transactions (see
+    storage.stats), then verifies the stored rows against fresh counts. Needed
+    after writes that bypass the loan services and the Item signals (the
+    admin, raw SQL) and once after upgrading to create the rows of the
+    existing users. With --check nothing is written: the command only reports
+    the drift and fails if there is any.
+
+    Usage:
+    ------
+    python manage.py rebuild_user_stats
+    python manage.py rebuild_user_stats --check
+    """
+
+    help = "Recomputes the per-user counters from scratch and verifies them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only verify the stored counters; fail if they drifted.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            start = time.perf_counter()
+            written = stats.recompute()
+            self.stdout.write(
+                f"Recomputed the stats of {written} users in "
+                f"{time.perf_counter() - start:.1f}s."
+            )
+
+        mismatches = stats.verify()
+
+        for user_id, field, stored, expected in mismatches[:SHOWN_MISMATCHES]:
+            self.stderr.write(
+                f"user {user_id}: {field} is {stored}, expected {expected}"
+            )
+
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} counters do not match.")
+
+        self.stdout.write(self.style.SUCCESS("The user stats are consistent."))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from storage import jobs
+
+
+class Command(BaseCommand):
+    """
+    Management command that runs the background jobs queued by the site.
+
+    Polls the Job table and runs the due jobs in a pool of --workers threads
+    (or processes, with --processes, for CPU bound jobs), retrying the failed
+    ones with backoff (see storage.jobs). Runs until interrupted; with
+    --burst it returns once no job is running or due, which suits cron.
+    Keep it running next to the web server (systemd, supervisor).
+
+    Usage:
+    ------
+    python manage.py run_workers --workers 4
+    python manage.py run_workers --burst
+    """
+
+    help = "Runs the queued background jobs in a thread or process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Jobs run at the same time (default: 2).",
+        )
+        parser.add_argument(
+            "--processes",
+            action="store_true",
+            help="Run the jobs in processes instead of threads.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Return once no job is running or due.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between two polls of an idle queue (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("Use at least 1 worker.")
+
+        self.stdout.write(
+            f"Running jobs with {options['workers']} "
+            f"{'processes' if options['processes'] else 'threads'}."
+        )
+
+        try:
+            ran = jobs.run_workers(
+                options["workers"],
+                processes=options["processes"],
+                burst=options["burst"],
+                poll_interval=options["poll_interval"],
+                log=self.stdout.write,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Stopped after the running jobs.")
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} jobs."))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from storage import overdue
+
+
+class Command(BaseCommand):
+    """
+    Management command that records the loans past their due date.
+
+    Meant to run periodically (cron, a systemd timer). Walks the overdue
+    active loans through the partial due date index, in pages of --batch-size
+    loans, records the ones found for the first time as OverdueLoan rows and
+    marks resolved the records of the loans returned since the last scan
+    (see storage.overdue).
+
+    Usage:
+    ------
+    python manage.py scan_overdue
+    python manage.py scan_overdue --batch-size 1000
+    """
+
+    help = "Records the overdue loans and resolves the returned ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=overdue.BATCH_SIZE,
+            help=f"Loans read per page (default: {overdue.BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("Use a batch size of at least 1.")
+
+        start = time.perf_counter()
+        counts = overdue.scan(batch_size=options["batch_size"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{counts['overdue']} overdue loans ({counts['new']} new), "
+                f"{counts['resolved']} resolved, in "
+                f"{time.perf_counter() - start:.1f}s."
+            )
+        )
@@ -0,0 +1,258 @@
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from storage import custody, seed, stats, summary
+from storage.archive import ARCHIVE
+from storage.cache import ITEMS, bump
+from storage.forms import STORAGE_LOCATIONS
+from storage.models import (
+    Item,
+    LoanInterval,
+    OverdueLoan,
+    Transaction,
+    TransactionArchive,
+)
+from storage.services import latest_open_loan
+
+
+class Command(BaseCommand):
+    """
+    Management command that fills the database with fake users, items and
+    loan/devolution histories, for load tests and benchmarks.
+
+    The rows are generated by worker processes (storage.seed) and inserted by
+    this process in bounded batches with bulk_create, one database transaction
+    per batch, so memory use does not depend on the size of the data set and
+    the database sees a single writer (which also suits SQLite). At most a few
+    batches per worker are in flight at any time.
+
+    Every user gets the same password, hashed once. Items get histories of
+    returned loans and possibly one open loan; their quantity, availability
+    and 'current_loan' are kept consistent with the open loans. The search
+    index, the per-user counters, the inventory summary and the custody
+    intervals are rebuilt at the end.
+
+    Usage:
+    ------
+    python manage.py seed_data --users 100000 --items-per-user 20 --workers 8
+    """
+
+    help = "Generates fake users, items and loan histories for load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=150, help="Users to create (default: 150)."
+        )
+        parser.add_argument(
+            "--items-per-user",
+            type=int,
+            default=40,
+            help="Items owned by each new user (default: 40).",
+        )
+        parser.add_argument(
+            "--loans-per-item",
+            type=int,
+            default=2,
+            help="Average loan cycles in each item's history (default: 2).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows generated and inserted per batch (default: 5000).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help=(
+                "Generator processes; 0 generates in this process "
+                "(default: CPU count)."
+            ),
+        )
+        parser.add_argument(
+            "--password",
+            default="password123",
+            help="Password of every new user (default: 'password123').",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed (default: 0)."
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the items, transactions and non-superusers first.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        counts = (
+            options["users"],
+            options["items_per_user"],
+            options["loans_per_item"],
+            options["workers"],
+        )
+
+        if batch_size < 1 or min(counts) < 0:
+            raise CommandError("Sizes must be positive numbers.")
+
+        if options["clear"]:
+            self.clear()
+
+        self.workers = options["workers"]
+        self.seed = options["seed"]
+
+        user_ids = self.create_users(
+            options["users"], make_password(options["password"]), batch_size
+        )
+
+        if options["items_per_user"]:
+            self.create_items(
+                user_ids,
+                options["items_per_user"],
+                options["loans_per_item"],
+                batch_size,
+            )
+
+        call_command("rebuild_search_index", stdout=self.stdout)
+
+        start = time.perf_counter()
+        self.report("User stats", stats.recompute(), start)
+        summary.rebuild()
+        custody.rebuild()
+        bump(ITEMS, ARCHIVE)
+
+    def clear(self):
+        """Deletes the previous data, using plain DELETEs for the big tables."""
+        start = time.perf_counter()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            Item.objects.update(current_loan=None)
+            cursor.execute(f"DELETE FROM {LoanInterval._meta.db_table}")
+            cursor.execute(f"DELETE FROM {OverdueLoan._meta.db_table}")
+            cursor.execute(f"DELETE FROM {TransactionArchive._meta.db_table}")
+            cursor.execute(f"DELETE FROM {Transaction._meta.db_table}")
+            cursor.execute(f"DELETE FROM {Item._meta.db_table}")
+            User.objects.filter(is_superuser=False).delete()
+
+        self.stdout.write(f"Cleared the data in {time.perf_counter() - start:.1f}s.")
+
+    def generate(self, function, tasks, user_ids=()):
+        """
+        Runs a storage.seed generator over the tasks, yielding results in order.
+
+        Keeps at most two tasks per worker queued, so finished batches do not
+        pile up in memory while the database is busy.
+        """
+        if not self.workers:
+            seed.init_worker(user_ids)
+            yield from map(function, tasks)
+            return
+
+        with multiprocessing.Pool(
+            self.workers, initializer=seed.init_worker, initargs=(user_ids,)
+        ) as pool:
+            pending = deque()
+
+            for task in tasks:
+                pending.append(pool.apply_async(function, (task,)))
+
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().get()
+
+            while pending:
+                yield pending.popleft().get()
+
+    def report(self, label, rows, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{label}: {rows} rows in {elapsed:.1f}s "
+            f"({rows / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+
+    def create_users(self, total, password, batch_size):
+        """Creates the users in batches; returns the ids of the new users."""
+        first = (User.objects.aggregate(Max("pk"))["pk__max"] or 0) + 1
+        tasks = (
+            (index, self.seed, first + offset, min(batch_size, total - offset))
+            for index, offset in enumerate(range(0, total, batch_size))
+        )
+
+        user_ids = []
+        start = time.perf_counter()
+
+        for users in self.generate(seed.generate_users, tasks):
+            with transaction.atomic():
+                created = User.objects.bulk_create(
+                    User(
+                        username=username,
+                        first_name=first_name,
+                        last_name=last_name,
+                        email=email,
+                        password=password,
+                    )
+                    for username, first_name, last_name, email in users
+                )
+            user_ids.extend(user.pk for user in created)
+            reset_queries()
+
+        self.report("Users", len(user_ids), start)
+        return user_ids
+
+    def create_items(self, user_ids, items_per_user, loans_per_item, batch_size):
+        """Creates the items and their histories, one transaction per batch."""
+        owners_per_task = max(batch_size // items_per_user, 1)
+        borrower_ids = user_ids or list(User.objects.values_list("pk", flat=True))
+        now = timezone.now()
+
+        tasks = (
+            (
+                index,
+                self.seed,
+                user_ids[offset : offset + owners_per_task],
+                items_per_user,
+                loans_per_item,
+                now,
+                STORAGE_LOCATIONS,
+            )
+            for index, offset in enumerate(range(0, len(user_ids), owners_per_task))
+        )
+
+        items_count = transactions_count = 0
+        start = time.perf_counter()
+
+        for rows in self.generate(seed.generate_items, tasks, borrower_ids):
+            with transaction.atomic():
+                items = Item.objects.bulk_create(
+                    [Item(**fields) for fields, _ in rows], batch_size=batch_size
+                )
+                transactions = Transaction.objects.bulk_create(
+                    (
+                        Transaction(item=item, **fields)
+                        for item, (_, history) in zip(items, rows)
+                        for fields in history
+                    ),
+                    batch_size=batch_size,
+                )
+                Item.objects.filter(
+                    pk__gte=items[0].pk, pk__lte=items[-1].pk
+                ).update(current_loan=latest_open_loan())
+
+            items_count += len(items)
+            transactions_count += len(transactions)
+            # With DEBUG on, the logged bulk INSERTs would keep every batch alive
+            reset_queries()
+
+        self.report("Items", items_count, start)
+        self.report("Transactions", transactions_count, start)
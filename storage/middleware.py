@@ -0,0 +1,240 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from storage import profiling
+
+"""
+Middleware of the 'storage' application.
+
+QueryInstrumentationMiddleware measures the SQL issued by a sample of the
+requests and reports it through the 'Server-Timing' header and the
+'storage.sql' logger. ProfilingMiddleware runs single requests carrying a
+staff profiling token under cProfile and tracemalloc (see storage.profiling).
+"""
+
+logger = logging.getLogger("storage.sql")
+
+
+class QueryInstrumentation:
+    """
+    Collects the queries executed while one request is served.
+
+    Installed on every database connection through execute_wrapper, so it
+    sees the SQL actually sent (including the ORM's and third-party code's)
+    without enabling DEBUG's query log.
+
+    Attributes:
+    -----------
+    count : int
+        Number of queries executed.
+    duration : float
+        Total time spent in the database, in seconds.
+    statements : Counter
+        How many times each SQL text (without parameters) was executed.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self):
+        """Returns the (sql, times) pairs run more than once, most repeated first."""
+        return [
+            (sql, times) for sql, times in self.statements.most_common() if times > 1
+        ]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Opt-in middleware reporting the SQL cost of sampled requests.
+
+    A fraction STORAGE_SQL_SAMPLE_RATE (0 to 1) of the requests is served
+    with a QueryInstrumentation installed on every database connection. For
+    those requests the number of queries, the database time and the total
+    time are added to a 'Server-Timing' header (shown by the browsers'
+    developer tools) and logged as a JSON line by the 'storage.sql' logger.
+    Identical SQL executed several times in one request (the usual sign of an
+    N+1 pattern) is counted as repeated; when the repetitions reach
+    STORAGE_SQL_REPEATED_THRESHOLD the line is logged as a warning with the
+    most repeated statements.
+
+    With a sample rate of 0 (the default) the middleware removes itself from
+    the chain when the server starts, and requests that are not sampled only
+    pay for one random number.
+
+    Under ASGI the chain stays async: the instrumentation is installed on the
+    connections of the request's sync thread, where the sync views and the
+    async ORM run their queries. Queries run while a streaming response is
+    consumed are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "STORAGE_SQL_SAMPLE_RATE", 0)
+        self.repeated_threshold = getattr(
+            settings, "STORAGE_SQL_REPEATED_THRESHOLD", 5
+        )
+
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        instrumentation = QueryInstrumentation()
+        start = time.perf_counter()
+
+        with self.instrument(instrumentation):
+            response = self.get_response(request)
+
+        total = time.perf_counter() - start
+        self.report(request, response, instrumentation, total)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        instrumentation = QueryInstrumentation()
+        start = time.perf_counter()
+
+        # the connections are per thread: install it on the request's sync thread
+        stack = await sync_to_async(self.instrument)(instrumentation)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+
+        total = time.perf_counter() - start
+        self.report(request, response, instrumentation, total)
+        return response
+
+    def instrument(self, instrumentation):
+        """Installs the instrumentation on the connections of this thread."""
+        stack = ExitStack()
+
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(instrumentation))
+
+        return stack
+
+    def report(self, request, response, instrumentation, total):
+        repeated = instrumentation.repeated()
+        repeated_count = sum(times - 1 for _, times in repeated)
+
+        timings = [
+            f'db;desc="{instrumentation.count} queries";'
+            f"dur={instrumentation.duration * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ]
+        if repeated_count:
+            timings.append(f'repeated;desc="{repeated_count} repeated queries"')
+
+        response["Server-Timing"] = ", ".join(
+            filter(None, [response.get("Server-Timing"), *timings])
+        )
+
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": instrumentation.count,
+            "db_ms": round(instrumentation.duration * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "repeated": repeated_count,
+        }
+
+        if repeated_count >= self.repeated_threshold:
+            line["top_repeated"] = [
+                {"sql": sql[:300], "times": times} for sql, times in repeated[:3]
+            ]
+            logger.warning(json.dumps(line))
+        else:
+            logger.info(json.dumps(line))
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests that carry a valid staff profiling token.
+
+    The token (storage.profiling.make_token) is read from the '_profile' query
+    parameter or the 'X-Storage-Profile' header; it must belong to the logged
+    staff user, so this middleware goes after AuthenticationMiddleware. Those
+    requests are served by storage.profiling.profile_request, which saves the
+    cProfile stats and a tracemalloc report. Requests without a token only pay
+    for two lookups, and invalid tokens are ignored (the request is served
+    normally).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = self.token(request)
+
+        if token and profiling.check_token(token, request.user):
+            return profiling.profile_request(self.get_response, request)
+
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        """
+        Async path, used under ASGI so the async views keep running in the
+        event loop. The user is only loaded when a token is present.
+        """
+        token = self.token(request)
+
+        if token and profiling.check_token(token, await request.auser()):
+            return await profiling.aprofile_request(self.get_response, request)
+
+        return await self.get_response(request)
+
+    def token(self, request):
+        """Returns the profiling token sent with the request, if any."""
+        token = request.META.get(profiling.PROFILE_HEADER)
+
+        if not token and profiling.PROFILE_PARAM in request.META.get(
+            "QUERY_STRING", ""
+        ):
+            token = request.GET.get(profiling.PROFILE_PARAM)
+
+        return token
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    """Creates and fills the FTS5 item index (SQLite only)."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS storage_item_fts "
+        "USING fts5(object, description, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO storage_item_fts (rowid, object, description) "
+        "SELECT item_id, object, description FROM storage_item"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute("DROP TABLE IF EXISTS storage_item_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0025_item_current_loan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemSearchEntry',
+            fields=[
+                ('rowid', models.BigIntegerField(db_column='rowid', primary_key=True, serialize=False)),
+                ('object', models.CharField(max_length=20)),
+                ('description', models.CharField()),
+            ],
+            options={
+                'db_table': 'storage_item_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:44
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def close_returned_loans(apps, schema_editor):
+    """
+    Sets 'returned_date' on the DEVOLUTION records and on the LOAN records
+    that were already returned.
+
+    Loans used to be closed only by a separate DEVOLUTION record. Every LOAN
+    that is not an item's current loan is closed at the date of the first
+    DEVOLUTION of the same item that follows it (or at its own date).
+    """
+    Item = apps.get_model("storage", "Item")
+    Transaction = apps.get_model("storage", "Transaction")
+
+    next_devolution = (
+        Transaction.objects.filter(
+            item=OuterRef("item"), type="devolution", id__gt=OuterRef("id")
+        )
+        .order_by("id")
+        .values("loan_date")[:1]
+    )
+
+    Transaction.objects.filter(type="loan", returned_date__isnull=True).exclude(
+        id__in=Item.objects.filter(current_loan__isnull=False).values("current_loan")
+    ).update(returned_date=Coalesce(Subquery(next_devolution), F("loan_date")))
+
+    Transaction.objects.filter(type="devolution", returned_date__isnull=True).update(
+        returned_date=F("loan_date")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0026_itemsearchentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='quantity',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(close_returned_loans, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:24
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_summary(apps, schema_editor):
+    """Builds the summary rows of the existing items."""
+    Item = apps.get_model("storage", "Item")
+    InventorySummary = apps.get_model("storage", "InventorySummary")
+
+    rows = {
+        ("availability", "available"): (0, 0),
+        ("availability", "unavailable"): (0, 0),
+    }
+    for dimension, field in (
+        ("location", "storage_location"),
+        ("availability", "is_available"),
+        ("object", "object"),
+    ):
+        for key, items, quantity in (
+            Item.objects.order_by()
+            .values_list(field)
+            .annotate(items=Count("pk"), quantity=Sum("quantity"))
+        ):
+            if dimension == "availability":
+                key = "available" if key else "unavailable"
+            rows[(dimension, key)] = (items, quantity or 0)
+
+    InventorySummary.objects.bulk_create(
+        InventorySummary(dimension=dimension, key=key, items=items, quantity=quantity)
+        for (dimension, key), (items, quantity) in rows.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0030_userstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('location', 'Storage location'), ('availability', 'Availability'), ('object', 'Object')], max_length=12)),
+                ('key', models.CharField(max_length=100)),
+                ('items', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'inventory summary',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='unique_summary_dimension_key')],
+            },
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0031_inventorysummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='from_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_given', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='item',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_item', to='storage.item'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='to_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_received', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='TransactionArchive',
+            fields=[
+                ('was_available', models.BooleanField(default=True)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('type', models.CharField(choices=[('loan', 'Loan'), ('devolution', 'Devolution')], default='loan', max_length=10)),
+                ('loan_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('returned_date', models.DateTimeField(blank=True, null=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('from_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_given', to=settings.AUTH_USER_MODEL)),
+                ('item', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_item', to='storage.item')),
+                ('to_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='%(class)s_received', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-loan_date'],
+                'abstract': False,
+            },
+        ),
+    ]
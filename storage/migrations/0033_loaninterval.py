@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_intervals(apps, schema_editor):
+    """Builds the intervals of the existing loans, hot and archived."""
+    LoanInterval = apps.get_model("storage", "LoanInterval")
+
+    for model_name in ("Transaction", "TransactionArchive"):
+        loans = (
+            apps.get_model("storage", model_name)
+            .objects.filter(type="loan")
+            .values_list(
+                "id", "item_id", "to_user_id", "from_user_id", "quantity",
+                "loan_date", "returned_date",
+            )
+        )
+        LoanInterval.objects.bulk_create(
+            (
+                LoanInterval(
+                    loan_id=loan_id, item_id=item_id, holder_id=holder_id,
+                    lender_id=lender_id, quantity=quantity, start=start, end=end,
+                )
+                for loan_id, item_id, holder_id, lender_id, quantity, start, end
+                in loans.iterator()
+            ),
+            batch_size=1000,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0032_transactionarchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanInterval',
+            fields=[
+                ('loan_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('holder', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='held_intervals', to=settings.AUTH_USER_MODEL)),
+                ('item', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loan_intervals', to='storage.item')),
+                ('lender', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lent_intervals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['item', 'start', 'end'], name='loaninterval_item_time'), models.Index(fields=['holder', 'start', 'end'], name='loaninterval_holder_time')],
+            },
+        ),
+        migrations.RunPython(fill_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F
+
+
+def fill_due_dates(apps, schema_editor):
+    """Gives the existing loans the default loan period (14 days)."""
+    for model_name in ("Transaction", "TransactionArchive"):
+        apps.get_model("storage", model_name).objects.filter(type="loan").update(
+            due_date=ExpressionWrapper(
+                F("loan_date") + timedelta(days=14),
+                output_field=models.DateTimeField(),
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0033_loaninterval'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueLoan',
+            fields=[
+                ('loan_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('due_date', models.DateTimeField()),
+                ('detected_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resolved_date', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['due_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='due_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionarchive',
+            name='due_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('returned_date__isnull', True), ('type', 'loan')), fields=['due_date', 'id'], name='transaction_open_due'),
+        ),
+        migrations.AddField(
+            model_name='overdueloan',
+            name='borrower',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='overdue_loans', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='overdueloan',
+            name='item',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='overdue_loans', to='storage.item'),
+        ),
+        migrations.AddIndex(
+            model_name='overdueloan',
+            index=models.Index(condition=models.Q(('resolved_date__isnull', True)), fields=['loan_id'], name='overdueloan_unresolved'),
+        ),
+        migrations.RunPython(fill_due_dates, migrations.RunPython.noop),
+    ]
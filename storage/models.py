@@ -1,10 +1,45 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Create your models here.
 
 
+class ItemQuerySet(models.QuerySet):
+    """
+    Custom QuerySet for the Item model.
+
+    Groups the read path of the item tables (listing and search).
+    """
+
+    def for_listing(self, user):
+        """
+        Loads the items with what the item tables render for a viewer.
+
+        Joins the owner and annotates 'user_has_loan': whether 'user' holds an
+        open loan of the item. Several users may hold units of the same item,
+        while 'current_loan' only points to the latest loan.
+
+        Parameters
+        ----------
+        user : User
+            The user viewing the table.
+
+        Returns
+        -------
+        ItemQuerySet
+            The queryset with 'owner' joined and 'user_has_loan' annotated.
+        """
+        return self.select_related("owner").annotate(
+            user_has_loan=Exists(
+                Transaction.objects.open_loans().filter(
+                    item=OuterRef("pk"), to_user=user.pk
+                )
+            )
+        )
+
+
 class Item(models.Model):
     """
     Represents a tangible item or asset within the storage system.
@@ -22,19 +57,27 @@ class Item(models.Model):
     description : CharField
         Detailed text describing the item.
     quantity : IntegerField
-        The count of this item currently available (defaults to 1).
+        The count of this item currently available (defaults to 1). Loans
+        decrement it and devolutions increment it on the database side.
     storage_location : CharField
         The designated physical location where the item is stored.
     is_available : BooleanField
         Indicates whether the item is currently available for borrowing (True/False).
+        The loan path derives it from the remaining quantity.
     created_date : DateTimeField
         The date and time when the item record was created (defaults to current time).
+    updated_at : DateTimeField
+        The date and time of the last change to the item, including loans and
+        devolutions. Keys the per-row fragment cache of the item tables; indexed
+        for the availability feed (storage.events).
     owner : ForeignKey
         Link to the User model, identifying the user who owns the item.
         If the linked user is deleted, the field is set to NULL.
     current_loan : ForeignKey
-        Link to the current active Transaction record. This allows 1-step
+        Link to the most recent active LOAN Transaction record. This allows 1-step
         access to the current borrower without expensive database lookups.
+        When several units are lent to different users, the other active loans
+        are the LOAN records of the item without 'returned_date'.
     """
 
     item_id = models.BigAutoField(primary_key=True)
@@ -44,6 +87,7 @@ class Item(models.Model):
     storage_location = models.CharField()
     is_available = models.BooleanField()
     created_date = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     owner = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
 
     current_loan = models.ForeignKey(
@@ -54,6 +98,8 @@ class Item(models.Model):
         related_name="item_currently_assigned",
     )
 
+    objects = ItemQuerySet.as_manager()
+
     def __str__(self) -> str:
         """
         String representation of the Item object.
@@ -66,19 +112,62 @@ class Item(models.Model):
         return f"{self.description}"
 
 
-class Transaction(models.Model):
+class TransactionQuerySet(models.QuerySet):
     """
-    Records the history of item loans and devolutions (returns) within the system.
+    Custom QuerySet for the Transaction model.
 
-    Tracks the item involved, the user lending/returning the item, the user
-    receiving/borrowing the item, and the timing of the transfer. This model
-    serves as the historical log, while its instances may be referenced by
-    the Item model's 'current_loan' field to indicate an active status.
+    Groups the read paths used by the transaction listings so every view
+    loads a page of transactions with a constant number of queries.
+    """
+
+    def for_listing(self):
+        """
+        Eagerly loads the relations rendered by the transaction tables.
+
+        Uses 'select_related' to JOIN the item and both users in the same
+        query, avoiding one extra query per row and relation (N+1).
+
+        Returns
+        -------
+        TransactionQuerySet
+            The queryset with 'item', 'from_user' and 'to_user' joined.
+        """
+        return self.select_related("item", "from_user", "to_user")
+
+    def involving(self, user_id):
+        """
+        Filters the transactions where the user is the lender or the borrower.
+
+        Parameters
+        ----------
+        user_id : int
+            The primary key of the User.
+
+        Returns
+        -------
+        TransactionQuerySet
+            The transactions given or received by the user.
+        """
+        return self.filter(Q(from_user=user_id) | Q(to_user=user_id))
+
+    def open_loans(self):
+        """
+        Filters the LOAN transactions that were not returned yet.
+
+        Returns
+        -------
+        TransactionQuerySet
+            The active loans (LOAN records without 'returned_date').
+        """
+        return self.filter(type=BaseTransaction.LOAN, returned_date__isnull=True)
+
+
+class BaseTransaction(models.Model):
+    """
+    Fields and behaviour shared by the hot Transaction table and its archive.
 
     Attributes:
     -----------
-    id : BigAutoField
-        The primary key for the transaction record.
     LOAN : str
         Constant representing an item being lent out.
     DEVOLUTION : str
@@ -92,52 +181,62 @@ class Transaction(models.Model):
         The User receiving the transfer (borrower during LOAN, owner during DEVOLUTION).
     was_available : BooleanField
         Records the availability status of the item *before* this transaction occurred.
+    quantity : PositiveIntegerField
+        The number of units lent (LOAN) or given back (DEVOLUTION). Defaults to 1.
     type : CharField
         The nature of the transaction ('loan' or 'devolution').
     loan_date : DateTimeField
         Timestamp of when the transaction record was created.
     returned_date : DateTimeField
-        Timestamp of when the item was returned (specifically for DEVOLUTION records).
+        Timestamp of when the item was returned. Set on the DEVOLUTION record and on
+        the LOAN it closes; a LOAN without it is still active.
+    due_date : DateTimeField
+        When a LOAN must be returned (STORAGE_LOAN_DAYS after the loan by default).
+        Null on DEVOLUTIONs.
     """
 
-    id = models.BigAutoField(primary_key=True)
     LOAN = "loan"
     DEVOLUTION = "devolution"
     item = models.ForeignKey(
         Item,
         on_delete=models.SET_NULL,
         null=True,
-        related_name="transaction_item",
+        related_name="%(class)s_item",
     )
     from_user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
-        related_name="transaction_given",
+        related_name="%(class)s_given",
     )
     to_user = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
-        related_name="transaction_received",
+        related_name="%(class)s_received",
     )
     was_available = models.BooleanField(default=True)
+    quantity = models.PositiveIntegerField(default=1)
 
     transaction_types = [(LOAN, "Loan"), (DEVOLUTION, "Devolution")]
     type = models.CharField(max_length=10, choices=transaction_types, default=LOAN)
 
     loan_date = models.DateTimeField(default=timezone.now)
     returned_date = models.DateTimeField(null=True, blank=True)
+    due_date = models.DateTimeField(null=True, blank=True)
+
+    objects = TransactionQuerySet.as_manager()
 
     class Meta:
         """
-        Meta options for the Transaction model.
+        Meta options for the transaction models.
 
-        Defines the default ordering for querysets of this model.
+        Defines the default ordering for querysets of these models.
         """
 
+        abstract = True
         ordering = ["-loan_date"]
 
     def __str__(self):
@@ -150,3 +249,527 @@ class Transaction(models.Model):
             A formatted string including the transaction ID and the item description.
         """
         return f"Transaction #{self.id} | {self.item if self.item else "NO Item"}"
+
+
+class Transaction(BaseTransaction):
+    """
+    Records the history of item loans and devolutions (returns) within the system.
+
+    Tracks the item involved, the user lending/returning the item, the user
+    receiving/borrowing the item, and the timing of the transfer. This model
+    serves as the historical log, while its instances may be referenced by
+    the Item model's 'current_loan' field to indicate an active status.
+    Closed loan cycles older than STORAGE_ARCHIVE_AFTER_DAYS are moved to
+    TransactionArchive by 'manage.py archive_transactions'.
+
+    The fields are described in BaseTransaction.
+
+    Attributes:
+    -----------
+    id : BigAutoField
+        The primary key for the transaction record.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+
+    class Meta(BaseTransaction.Meta):
+        """
+        Meta options for the Transaction model.
+
+        The partial index holds only the active loans, ordered by due date, so
+        the overdue lookups (see storage.overdue) read the overdue loans
+        instead of scanning every open loan or the whole log.
+        """
+
+        indexes = [
+            models.Index(
+                fields=["due_date", "id"],
+                condition=models.Q(type="loan", returned_date__isnull=True),
+                name="transaction_open_due",
+            )
+        ]
+
+
+class TransactionArchive(BaseTransaction):
+    """
+    Cold storage of the closed loan cycles moved out of Transaction.
+
+    Rows keep the id they had in Transaction, so the two tables share one id
+    space and a listing can continue from one into the other. Only returned
+    LOANs and DEVOLUTIONs are archived; active loans always stay in the hot
+    table. The listings read it only past the last page of hot rows (see
+    storage.archive).
+
+    The fields are described in BaseTransaction.
+
+    Attributes:
+    -----------
+    id : BigIntegerField
+        The id the transaction had in the Transaction table.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+
+    class Meta(BaseTransaction.Meta):
+        """
+        Meta options for the TransactionArchive model.
+        """
+
+
+class ItemSearchEntry(models.Model):
+    """
+    Full-text search index entry for an Item.
+
+    Unmanaged model mapped onto the SQLite FTS5 virtual table created by the
+    migrations ('storage_item_fts'). Each row mirrors the searchable text of
+    one Item and shares its primary key through the FTS 'rowid' column. The
+    rows are maintained by the search backend (see storage.search) on Item
+    save/delete and can be rebuilt with 'manage.py rebuild_search_index'.
+
+    Attributes:
+    -----------
+    rowid : BigIntegerField
+        The FTS rowid, equal to the item_id of the indexed Item.
+    object : CharField
+        Indexed copy of Item.object.
+    description : CharField
+        Indexed copy of Item.description.
+    """
+
+    rowid = models.BigIntegerField(primary_key=True, db_column="rowid")
+    object = models.CharField(max_length=20)
+    description = models.CharField()
+
+    class Meta:
+        """
+        Meta options for the ItemSearchEntry model.
+
+        The table is a virtual table, so Django must not create or alter it.
+        """
+
+        managed = False
+        db_table = "storage_item_fts"
+
+    def __str__(self):
+        """
+        String representation of the ItemSearchEntry object.
+
+        Returns
+        -------
+        str
+            The indexed item id and name.
+        """
+        return f"Search entry #{self.rowid} | {self.object}"
+
+
+class ApiToken(models.Model):
+    """
+    Authentication token of a machine client of the JSON API.
+
+    Clients send the raw key in the 'Authorization: Token <key>' header. Only
+    the SHA-256 digest of the key is stored, so a leaked database does not
+    leak usable tokens. Tokens are created with 'manage.py create_api_token'
+    (which prints the raw key once) and revoked by deleting them.
+
+    Attributes:
+    -----------
+    key : CharField
+        Hex SHA-256 digest of the raw token (unique, indexed).
+    name : CharField
+        Label identifying the client (e.g. the terminal or dashboard).
+    user : ForeignKey
+        The User the client acts as. Deleting the user deletes its tokens.
+    created_date : DateTimeField
+        The date and time when the token was created.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=50)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="api_tokens")
+    created_date = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        """
+        String representation of the ApiToken object.
+
+        Returns
+        -------
+        str
+            The token name and the username of its user.
+        """
+        return f"{self.name} ({self.user})"
+
+
+class UserStats(models.Model):
+    """
+    Per-user counters, maintained incrementally by the write paths.
+
+    Lets the profile pages and dashboards read a user's counts as one row
+    instead of counting their items and transactions. The loan and devolution
+    services (storage.services) and the Item signals update the row in the
+    same database transaction as the change they count (see storage.stats);
+    rows are created on first use and 'manage.py rebuild_user_stats'
+    recomputes and verifies them from scratch.
+
+    Attributes:
+    -----------
+    user : OneToOneField
+        The User the counters belong to (also the primary key). Deleting the
+        user deletes the row.
+    items_owned : IntegerField
+        Number of Items owned by the user.
+    active_loans_out : IntegerField
+        Number of open LOAN transactions lent by the user.
+    active_loans_in : IntegerField
+        Number of open LOAN transactions borrowed by the user.
+    transactions_total : IntegerField
+        Number of transactions (loans and devolutions) the user took part in,
+        as lender or borrower.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    items_owned = models.IntegerField(default=0)
+    active_loans_out = models.IntegerField(default=0)
+    active_loans_in = models.IntegerField(default=0)
+    transactions_total = models.IntegerField(default=0)
+
+    class Meta:
+        """
+        Meta options for the UserStats model.
+        """
+
+        verbose_name_plural = "user stats"
+
+    def __str__(self):
+        """
+        String representation of the UserStats object.
+
+        Returns
+        -------
+        str
+            The id of the user the counters belong to.
+        """
+        return f"Stats of user #{self.user_id}"
+
+
+class InventorySummary(models.Model):
+    """
+    Materialized totals of the items, grouped by one dimension.
+
+    Each row holds the number of items and the sum of their quantities for one
+    value of a dimension: a storage location, an availability state or an
+    object type. The Item signals and the loan services keep the rows up to
+    date in the transaction of each change (see storage.summary), so the
+    inventory dashboard reads a few rows instead of grouping the item table.
+    'manage.py rebuild_inventory_summary' reconciles them.
+
+    Attributes:
+    -----------
+    LOCATION, AVAILABILITY, OBJECT : str
+        The dimensions.
+    dimension : CharField
+        The dimension grouped by this row.
+    key : CharField
+        The value of the dimension (a location, "available"/"unavailable" or
+        an object name).
+    items : IntegerField
+        Number of items with that value.
+    quantity : IntegerField
+        Sum of the quantities in stock of those items.
+    """
+
+    LOCATION = "location"
+    AVAILABILITY = "availability"
+    OBJECT = "object"
+
+    dimensions = [
+        (LOCATION, "Storage location"),
+        (AVAILABILITY, "Availability"),
+        (OBJECT, "Object"),
+    ]
+    dimension = models.CharField(max_length=12, choices=dimensions)
+    key = models.CharField(max_length=100)
+    items = models.IntegerField(default=0)
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        """
+        Meta options for the InventorySummary model.
+
+        Each value of a dimension has a single row.
+        """
+
+        verbose_name_plural = "inventory summary"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dimension", "key"], name="unique_summary_dimension_key"
+            )
+        ]
+
+    def __str__(self):
+        """
+        String representation of the InventorySummary object.
+
+        Returns
+        -------
+        str
+            The dimension, the value and its totals.
+        """
+        return f"{self.dimension}={self.key}: {self.items} items, {self.quantity} units"
+
+
+class LoanInterval(models.Model):
+    """
+    Custody interval of a loan: who held how many units of an item, and when.
+
+    Pairs each LOAN with the DEVOLUTION that closes it as a half-open interval
+    [start, end), so custody questions ("who held item X at T", "which items
+    did user U hold during that week") are index range lookups instead of a
+    replay of the transaction log. The loan services open and close the
+    intervals in the same database transaction as the loan (see
+    storage.custody) and 'manage.py rebuild_loan_intervals' recreates them
+    from the LOANs of both transaction tables. The rows do not reference the
+    transactions, so archiving them (see storage.archive) keeps their history.
+
+    Attributes:
+    -----------
+    loan_id : BigIntegerField
+        The id of the LOAN transaction (also the primary key).
+    item : ForeignKey
+        The Item lent.
+    holder : ForeignKey
+        The User who borrowed the units.
+    lender : ForeignKey
+        The User who lent them (the owner at the time).
+    quantity : PositiveIntegerField
+        The number of units held.
+    start : DateTimeField
+        When the loan was made (the LOAN's 'loan_date').
+    end : DateTimeField
+        When the units were given back (the LOAN's 'returned_date'). Excluded
+        from the interval; null while the loan is active.
+    """
+
+    loan_id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(
+        Item, on_delete=models.SET_NULL, null=True, related_name="loan_intervals"
+    )
+    holder = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="held_intervals",
+    )
+    lender = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="lent_intervals",
+    )
+    quantity = models.PositiveIntegerField(default=1)
+    start = models.DateTimeField()
+    end = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        Meta options for the LoanInterval model.
+
+        The custody lookups filter one item or one holder and a time range,
+        so each is served by a composite (owner of the interval, start, end)
+        index; 'end' is in the index to filter the intervals that started
+        before the range without reading the rows.
+        """
+
+        ordering = ["start"]
+        indexes = [
+            models.Index(
+                fields=["item", "start", "end"], name="loaninterval_item_time"
+            ),
+            models.Index(
+                fields=["holder", "start", "end"], name="loaninterval_holder_time"
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the LoanInterval object.
+
+        Returns
+        -------
+        str
+            The loan id, the item and the interval.
+        """
+        return f"Loan #{self.loan_id} | item #{self.item_id} [{self.start}, {self.end})"
+
+
+class OverdueLoan(models.Model):
+    """
+    Record of an active loan found past its due date.
+
+    Written by 'manage.py scan_overdue' (see storage.overdue), which runs
+    periodically: each overdue loan is recorded once, when first found, and
+    marked resolved when a later scan finds it returned. The rows keep the
+    loan id without a foreign key, so the history survives the archiving of
+    the transaction.
+
+    Attributes:
+    -----------
+    loan_id : BigIntegerField
+        The id of the LOAN transaction (also the primary key).
+    item : ForeignKey
+        The Item lent.
+    borrower : ForeignKey
+        The User holding the units.
+    due_date : DateTimeField
+        When the loan had to be returned.
+    detected_date : DateTimeField
+        When the scanner first found it overdue.
+    resolved_date : DateTimeField
+        When the scanner found it returned; null while it is still overdue.
+    """
+
+    loan_id = models.BigIntegerField(primary_key=True)
+    item = models.ForeignKey(
+        Item, on_delete=models.SET_NULL, null=True, related_name="overdue_loans"
+    )
+    borrower = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="overdue_loans"
+    )
+    due_date = models.DateTimeField()
+    detected_date = models.DateTimeField(default=timezone.now)
+    resolved_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        Meta options for the OverdueLoan model.
+
+        The partial index lets the scanner find the unresolved records without
+        reading the resolved history.
+        """
+
+        ordering = ["due_date"]
+        indexes = [
+            models.Index(
+                fields=["loan_id"],
+                condition=models.Q(resolved_date__isnull=True),
+                name="overdueloan_unresolved",
+            )
+        ]
+
+    def __str__(self):
+        """
+        String representation of the OverdueLoan object.
+
+        Returns
+        -------
+        str
+            The loan id and its due date.
+        """
+        return f"Overdue loan #{self.loan_id} | due {self.due_date}"
+
+
+class Job(models.Model):
+    """
+    A slow operation queued by a request and run by 'manage.py run_workers'.
+
+    The web request only inserts the row and returns; a worker claims it with
+    a conditional UPDATE, runs the registered function named by 'name' with
+    'params' (see storage.jobs) and stores its progress, result or error.
+    Failed runs are retried 'max_attempts' times, waiting longer after each
+    failure.
+
+    Attributes:
+    -----------
+    QUEUED, RUNNING, DONE, FAILED : str
+        The states of a job.
+    name : CharField
+        The registered job function.
+    params : JSONField
+        The keyword arguments of the function.
+    user : ForeignKey
+        The User who queued the job.
+    status : CharField
+        The current state.
+    attempts : PositiveIntegerField
+        The runs started so far.
+    max_attempts : PositiveIntegerField
+        The runs allowed before the job fails for good.
+    progress : PositiveIntegerField
+        The completion reported by the job, from 0 to 100.
+    message : CharField
+        The last progress message.
+    result : JSONField
+        The value returned by a finished job.
+    error : TextField
+        The traceback of the last failure.
+    run_after : DateTimeField
+        The job is not claimed before this time (retry backoff).
+    created_date, started_date, finished_date : DateTimeField
+        When the job was queued, last claimed and finished.
+    heartbeat : DateTimeField
+        Updated by the running job; a stale one means its worker died.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    statuses = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+    name = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs"
+    )
+    status = models.CharField(max_length=10, choices=statuses, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    progress = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_date = models.DateTimeField(default=timezone.now)
+    started_date = models.DateTimeField(null=True, blank=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """
+        Meta options for the Job model.
+
+        The workers poll the queued jobs by 'run_after' through a partial
+        index, which stays small however many finished jobs are kept.
+        """
+
+        ordering = ["-id"]
+        indexes = [
+            models.Index(
+                fields=["run_after", "id"],
+                condition=models.Q(status="queued"),
+                name="job_queued",
+            ),
+            models.Index(
+                fields=["heartbeat"],
+                condition=models.Q(status="running"),
+                name="job_running",
+            ),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the Job object.
+
+        Returns
+        -------
+        str
+            The job id, name and status.
+        """
+        return f"Job #{self.pk} | {self.name} ({self.status})"
@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from storage.models import OverdueLoan, Transaction
+
+"""
+Due dates and overdue loans.
+
+Every LOAN gets a 'due_date' (STORAGE_LOAN_DAYS after the loan unless the
+caller gives one). The active loans are indexed by due date with a partial
+index (Transaction.Meta), so overdue_loans() reads only the loans past their
+due date, whatever the size of the log or the number of open loans.
+
+'manage.py scan_overdue' runs scan() periodically: it walks the overdue loans
+in pages of (due_date, id) keyset order, records the new ones as OverdueLoan
+rows and marks resolved the records of loans returned since, so its cost
+follows the overdue set.
+"""
+
+BATCH_SIZE = 500
+
+
+def default_due_date(loan_date):
+    """Returns the due date of a loan made at 'loan_date'."""
+    return loan_date + timedelta(days=getattr(settings, "STORAGE_LOAN_DAYS", 14))
+
+
+def overdue_loans(now=None):
+    """
+    Returns the active loans past their due date, served by the partial index.
+
+    Parameters:
+    -----------
+    now : datetime, optional
+        The reference instant (defaults to the current time).
+
+    Returns:
+    --------
+    TransactionQuerySet:
+        The overdue LOANs, most overdue first.
+    """
+    return (
+        Transaction.objects.open_loans()
+        .filter(due_date__lt=now or timezone.now())
+        .order_by("due_date", "id")
+    )
+
+
+def _pages(now, batch_size):
+    """Yields the overdue loans in keyset pages of (due_date, id)."""
+    loans = overdue_loans(now).only("id", "item_id", "to_user_id", "due_date")
+    position = Q()
+
+    while True:
+        page = list(loans.filter(position)[:batch_size])
+
+        if page:
+            yield page
+
+        if len(page) < batch_size:
+            return
+
+        last = page[-1]
+        position = Q(due_date__gt=last.due_date) | Q(
+            due_date=last.due_date, id__gt=last.pk
+        )
+
+
+def scan(now=None, batch_size=BATCH_SIZE):
+    """
+    Records the overdue loans and resolves the records of the returned ones.
+
+    Each page is recorded in its own database transaction, with one read of
+    the records already present and one bulk_create of the new ones.
+
+    Parameters:
+    -----------
+    now : datetime, optional
+        The reference instant (defaults to the current time).
+    batch_size : int, optional
+        The loans read per page.
+
+    Returns:
+    --------
+    dict:
+        The number of loans found 'overdue', of 'new' records and of records
+        'resolved'.
+    """
+    now = now or timezone.now()
+    counts = {"overdue": 0, "new": 0, "resolved": 0}
+
+    for page in _pages(now, batch_size):
+        with transaction.atomic():
+            recorded = set(
+                OverdueLoan.objects.filter(
+                    loan_id__in=[loan.pk for loan in page]
+                ).values_list("loan_id", flat=True)
+            )
+            new = [
+                OverdueLoan(
+                    loan_id=loan.pk,
+                    item_id=loan.item_id,
+                    borrower_id=loan.to_user_id,
+                    due_date=loan.due_date,
+                    detected_date=now,
+                )
+                for loan in page
+                if loan.pk not in recorded
+            ]
+            OverdueLoan.objects.bulk_create(new, ignore_conflicts=True)
+
+        counts["overdue"] += len(page)
+        counts["new"] += len(new)
+
+    counts["resolved"] = (
+        OverdueLoan.objects.filter(resolved_date__isnull=True)
+        .exclude(
+            Exists(
+                Transaction.objects.open_loans().filter(
+                    pk=OuterRef("loan_id"), due_date__lt=now
+                )
+            )
+        )
+        .update(resolved_date=now)
+    )
+
+    return counts
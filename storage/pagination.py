@@ -0,0 +1,643 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from storage.archive import aarchived_count, aarchived_max, archived_count, archived_max
+
+"""
+Pagination helpers for the 'storage' application.
+
+Provides a keyset (cursor) paginator as an alternative to Django's offset
+based Paginator. Keyset pages filter on the ordering key instead of using
+OFFSET and never run COUNT(*), so a deep page costs the same as the first one.
+
+The mode used by the views is selected through the STORAGE_PAGINATION setting
+("offset" or "keyset").
+
+Listings of the transaction history wrap their hot and archived querysets in
+a ChainedListing (see storage.archive), which both modes read without
+touching the archive while the page's rows all sort before the archived ones.
+"""
+
+NEXT = "n"
+PREVIOUS = "p"
+
+
+def encode_cursor(direction, value):
+    """
+    Encodes a keyset position into an opaque, URL-safe cursor.
+
+    Parameters:
+    -----------
+    direction : str
+        NEXT to fetch rows after the value, PREVIOUS to fetch rows before it.
+    value : int
+        The ordering key of the boundary row.
+
+    Returns:
+    --------
+    str
+        The encoded cursor.
+    """
+    return urlsafe_base64_encode(f"{direction}:{value}".encode())
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Parameters:
+    -----------
+    cursor : str
+        The cursor received from the query string.
+
+    Returns:
+    --------
+    tuple or None
+        A (direction, value) tuple, or None if the cursor is missing or malformed.
+    """
+    if not cursor:
+        return None
+
+    try:
+        direction, value = force_str(urlsafe_base64_decode(cursor)).split(":", 1)
+        value = int(value)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+    if direction not in (NEXT, PREVIOUS):
+        return None
+
+    return direction, value
+
+
+class KeysetPage:
+    """
+    A single page of results produced by KeysetPaginator.
+
+    Mimics the parts of django.core.paginator.Page used by the templates
+    (iteration, length, has_next/has_previous, has_other_pages) and exposes
+    opaque cursors instead of page numbers.
+
+    Attributes:
+    -----------
+    object_list : list
+        The objects in this page, in display order.
+    paginator : KeysetPaginator
+        The paginator that produced this page.
+    next_cursor : str or None
+        Cursor pointing to the following page, if any.
+    previous_cursor : str or None
+        Cursor pointing to the preceding page, if any.
+    is_keyset : bool
+        Always True. Lets templates tell keyset pages from offset pages.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<KeysetPage of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by seeking on a unique, descending ordering key.
+
+    Each page is fetched with "WHERE key < boundary ORDER BY key DESC LIMIT n+1",
+    which is served straight from the primary key index. The extra row tells
+    whether another page exists, so no COUNT(*) is needed.
+
+    Attributes:
+    -----------
+    queryset : QuerySet
+        The unordered (or arbitrarily ordered) queryset to paginate. A
+        values() queryset must include the key.
+    per_page : int
+        Maximum number of objects per page.
+    key : str
+        Name of the unique field the pages are ordered by (descending).
+    """
+
+    def __init__(self, queryset, per_page, key="pk"):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.key = key
+
+    def _key_value(self, obj):
+        if isinstance(obj, dict):
+            return obj[self.key]
+
+        return getattr(obj, "pk" if self.key == "pk" else self.key)
+
+    def _seek(self, position):
+        """
+        Builds the seek query for a decoded cursor position.
+
+        Returns the queryset limited to one row more than a page, and whether
+        it walks backwards (ascending key) from the cursor.
+        """
+        queryset = self.queryset
+        limit = self.per_page + 1
+
+        if position is None:
+            return queryset.order_by(f"-{self.key}")[:limit], False
+
+        direction, value = position
+
+        if direction == NEXT:
+            rows = queryset.filter(**{f"{self.key}__lt": value})
+            return rows.order_by(f"-{self.key}")[:limit], False
+
+        rows = queryset.filter(**{f"{self.key}__gt": value})
+        return rows.order_by(self.key)[:limit], True
+
+    def _split(self, rows, backwards):
+        """
+        Trims the extra row of a seek query and puts the rows in display order.
+
+        Returns the rows plus whether rows exist beyond the page in the
+        direction of travel.
+        """
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        if backwards:
+            rows.reverse()
+
+        return rows, more
+
+    def _fetch(self, position):
+        queryset, backwards = self._seek(position)
+        return self._split(list(queryset), backwards)
+
+    async def _afetch(self, position):
+        queryset, backwards = self._seek(position)
+        return self._split([obj async for obj in queryset], backwards)
+
+    def _build_page(self, rows, position, more):
+        if not rows:
+            return KeysetPage([], self)
+
+        first_key = self._key_value(rows[0])
+        last_key = self._key_value(rows[-1])
+
+        if position is None:
+            has_next, has_previous = more, False
+        elif position[0] == NEXT:
+            has_next, has_previous = more, True
+        else:
+            has_next, has_previous = True, more
+
+        next_cursor = encode_cursor(NEXT, last_key) if has_next else None
+        previous_cursor = encode_cursor(PREVIOUS, first_key) if has_previous else None
+
+        return KeysetPage(
+            rows, self, next_cursor=next_cursor, previous_cursor=previous_cursor
+        )
+
+    def get_page(self, cursor=None):
+        """
+        Returns the page identified by the cursor.
+
+        A missing or malformed cursor returns the first page. A backward
+        cursor that runs off the start of the data also falls back to the
+        first page, mirroring Paginator.get_page.
+
+        Parameters:
+        -----------
+        cursor : str, optional
+            The opaque cursor taken from the query string.
+
+        Returns:
+        --------
+        KeysetPage
+            The requested page.
+        """
+        position = decode_cursor(cursor)
+        rows, more = self._fetch(position)
+
+        if not rows and position is not None and position[0] == PREVIOUS:
+            position = None
+            rows, more = self._fetch(position)
+
+        return self._build_page(rows, position, more)
+
+    async def aget_page(self, cursor=None):
+        """
+        Asynchronous version of get_page, using the async ORM iteration.
+        """
+        position = decode_cursor(cursor)
+        rows, more = await self._afetch(position)
+
+        if not rows and position is not None and position[0] == PREVIOUS:
+            position = None
+            rows, more = await self._afetch(position)
+
+        return self._build_page(rows, position, more)
+
+
+class ChainedSlice:
+    """
+    A lazy slice of a ChainedListing, as stored in Page.object_list.
+
+    The rows are loaded on the first iteration, synchronously or with async
+    iteration ('async for'), so the async views keep all their queries out of
+    the event loop.
+    """
+
+    def __init__(self, listing, start, stop):
+        self.listing = listing
+        self.start = start
+        self.stop = stop
+        self._rows = None
+
+    def _load(self):
+        if self._rows is None:
+            self._rows = self.listing.rows(self.start, self.stop)
+
+        return self._rows
+
+    def __len__(self):
+        return len(self._load())
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __getitem__(self, index):
+        return self._load()[index]
+
+    async def __aiter__(self):
+        if self._rows is None:
+            self._rows = await self.listing.arows(self.start, self.stop)
+
+        for row in self._rows:
+            yield row
+
+
+class ChainedListing:
+    """
+    The hot rows of a listing merged with its archived rows.
+
+    Works as the object list of Django's Paginator: count() adds the cached
+    count of the archive (see storage.archive.archived_count) to the count of
+    the hot rows, and a slice reads the hot queryset alone while its rows sort
+    before the archive's greatest key (cached, see
+    storage.archive.archived_max). Past that point the two tables interleave,
+    since an open loan stays hot however old it is, so the rest of the
+    listing is the merge of both by the ordering key.
+
+    Attributes:
+    -----------
+    hot : QuerySet
+        The Transaction queryset, ordered by a descending key.
+    archived : QuerySet
+        The same filters on TransactionArchive, in the same order.
+    """
+
+    ordered = True
+
+    def __init__(self, hot, archived):
+        self.hot = hot
+        self.archived = archived
+
+    @property
+    def key(self):
+        """The field of the listing's (descending) ordering."""
+        return self.hot.query.order_by[0].removeprefix("-")
+
+    def _key_value(self, obj):
+        return obj[self.key] if isinstance(obj, dict) else getattr(obj, self.key)
+
+    def count(self):
+        return self.hot.count() + archived_count(self.archived)
+
+    async def acount(self):
+        return await self.hot.acount() + await aarchived_count(self.archived)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError("ChainedListing only supports plain slices.")
+
+        return ChainedSlice(self, index.start or 0, index.stop)
+
+    def _before_archive(self, rows, start, stop, boundary):
+        """Tells whether the hot rows of a slice all sort before the archive."""
+        return boundary is None or (
+            len(rows) == stop - start and self._key_value(rows[-1]) > boundary
+        )
+
+    def _interleaved(self, boundary):
+        """
+        Splits the hot queryset into the rows sorting before the archive's
+        greatest key and the rest.
+        """
+        return (
+            self.hot.filter(**{f"{self.key}__gt": boundary}),
+            self.hot.filter(**{f"{self.key}__lte": boundary}),
+        )
+
+    def _merge(self, hot_tail, archived, archived_start, start, stop):
+        """
+        Returns the rows from start to stop of the merge of the hot rows that
+        do not sort before the archive with the archived rows.
+
+        'hot_tail' holds those hot rows (at least the first 'stop'), and
+        'archived' the archived rows from 'archived_start' on. The hot rows
+        sorting before archived[0] then all sit before 'start', and the merged
+        list begins after them and the skipped archived rows.
+        """
+        skipped = 0
+
+        if archived_start:
+            first = self._key_value(archived[0])
+            kept = [row for row in hot_tail if self._key_value(row) < first]
+            skipped = archived_start + len(hot_tail) - len(kept)
+            hot_tail = kept
+
+        # a stable sort: on equal keys the hot row comes first
+        merged = sorted([*hot_tail, *archived], key=self._key_value, reverse=True)
+
+        return merged[start - skipped : stop - skipped]
+
+    def rows(self, start, stop):
+        """Returns the rows from start to stop of the chained listing."""
+        if stop <= start:
+            return []
+
+        rows = list(self.hot[start:stop])
+        boundary = archived_max(self.archived, self.key)
+
+        if self._before_archive(rows, start, stop, boundary):
+            return rows
+
+        before, tail = self._interleaved(boundary)
+        head = before.count()
+        rows = rows[: max(head - start, 0)]
+        start, stop = max(start - head, 0), stop - head
+
+        # the hot rows past the archive's greatest key are the few loans still
+        # open since before it, so only the archive is read with an offset
+        hot_tail = list(tail[:stop])
+        archived_start = max(start - len(hot_tail), 0)
+        archived = list(self.archived[archived_start:stop])
+
+        if archived_start and not archived:
+            archived_start, archived = 0, list(self.archived[:stop])
+
+        return rows + self._merge(hot_tail, archived, archived_start, start, stop)
+
+    async def arows(self, start, stop):
+        """Asynchronous version of rows."""
+        if stop <= start:
+            return []
+
+        rows = [obj async for obj in self.hot[start:stop]]
+        boundary = await aarchived_max(self.archived, self.key)
+
+        if self._before_archive(rows, start, stop, boundary):
+            return rows
+
+        before, tail = self._interleaved(boundary)
+        head = await before.acount()
+        rows = rows[: max(head - start, 0)]
+        start, stop = max(start - head, 0), stop - head
+
+        hot_tail = [obj async for obj in tail[:stop]]
+        archived_start = max(start - len(hot_tail), 0)
+        archived = [obj async for obj in self.archived[archived_start:stop]]
+
+        if archived_start and not archived:
+            archived_start = 0
+            archived = [obj async for obj in self.archived[:stop]]
+
+        return rows + self._merge(hot_tail, archived, archived_start, start, stop)
+
+
+class ChainedKeysetPaginator(KeysetPaginator):
+    """
+    KeysetPaginator over a ChainedListing.
+
+    The hot and archived tables share one key space, so a page is the merge of
+    the same seek on both. The archive is only read when its greatest key
+    (cached, see storage.archive.archived_max) can fall inside the page, which
+    is never the case for the recent pages.
+    """
+
+    def __init__(self, listing, per_page, key="pk"):
+        super().__init__(listing.hot, per_page, key=key)
+        self.archived = KeysetPaginator(listing.archived, per_page, key=key)
+
+    def _needs_archive(self, archived_max, position, rows):
+        if archived_max is None:
+            return False
+
+        if position is not None and position[0] == PREVIOUS:
+            return archived_max > position[1]
+
+        return (
+            len(rows) <= self.per_page
+            or archived_max > self._key_value(rows[-1])
+        )
+
+    def _merge(self, rows, archived_rows, backwards):
+        rows = sorted(
+            [*rows, *archived_rows], key=self._key_value, reverse=not backwards
+        )
+        return self._split(rows[: self.per_page + 1], backwards)
+
+    def _fetch(self, position):
+        queryset, backwards = self._seek(position)
+        rows = list(queryset)
+
+        if not self._needs_archive(
+            archived_max(self.archived.queryset, self.key), position, rows
+        ):
+            return self._split(rows, backwards)
+
+        archived, _ = self.archived._seek(position)
+        return self._merge(rows, list(archived), backwards)
+
+    async def _afetch(self, position):
+        queryset, backwards = self._seek(position)
+        rows = [obj async for obj in queryset]
+
+        if not self._needs_archive(
+            await aarchived_max(self.archived.queryset, self.key), position, rows
+        ):
+            return self._split(rows, backwards)
+
+        archived, _ = self.archived._seek(position)
+        return self._merge(rows, [obj async for obj in archived], backwards)
+
+
+def keyset_paginator(queryset, per_page, key="pk"):
+    """Returns the keyset paginator of a queryset or of a ChainedListing."""
+    if isinstance(queryset, ChainedListing):
+        return ChainedKeysetPaginator(queryset, per_page, key=key)
+
+    return KeysetPaginator(queryset, per_page, key=key)
+
+
+def paginate(request, queryset, per_page, key="pk"):
+    """
+    Paginates a queryset according to the STORAGE_PAGINATION setting.
+
+    In "offset" mode (the default) the classic Paginator is used and the page
+    is read from the "page" query parameter. In "keyset" mode a KeysetPaginator
+    ordered by the descending key is used and the page is read from the
+    "cursor" query parameter.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Used to read the page number or cursor.
+    queryset : QuerySet or ChainedListing
+        The queryset to paginate, already ordered by '-key' for offset mode.
+    per_page : int
+        Number of objects per page.
+    key : str, optional
+        The unique field used as keyset (defaults to the primary key).
+
+    Returns:
+    --------
+    Page or KeysetPage
+        The page to be exposed to the templates as 'page_obj'.
+    """
+    if getattr(settings, "STORAGE_PAGINATION", "offset") == "keyset":
+        return keyset_paginator(queryset, per_page, key=key).get_page(
+            request.GET.get("cursor")
+        )
+
+    paginator = Paginator(queryset, per_page)
+    return paginator.get_page(request.GET.get("page"))
+
+
+async def apaginate(request, queryset, per_page, key="pk"):
+    """
+    Asynchronous version of paginate, for the async views.
+
+    In "offset" mode the total is read with acount() and the page's slice is
+    loaded with async iteration, so no synchronous query runs in the event
+    loop.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Used to read the page number or cursor.
+    queryset : QuerySet or ChainedListing
+        The queryset to paginate, already ordered by '-key' for offset mode.
+    per_page : int
+        Number of objects per page.
+    key : str, optional
+        The unique field used as keyset (defaults to the primary key).
+
+    Returns:
+    --------
+    Page or KeysetPage
+        The page to be exposed to the templates as 'page_obj'.
+    """
+    if getattr(settings, "STORAGE_PAGINATION", "offset") == "keyset":
+        return await keyset_paginator(queryset, per_page, key=key).aget_page(
+            request.GET.get("cursor")
+        )
+
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+
+    page = paginator.get_page(request.GET.get("page"))
+    page.object_list = [obj async for obj in page.object_list]
+    return page
+
+
+def _counter_holds(page):
+    """
+    Tells whether a page holds the rows promised by its paginator's count,
+    i.e. whether a maintained counter agrees with the rows it counts.
+    """
+    paginator = page.paginator
+    bottom = (page.number - 1) * paginator.per_page
+    top = min(bottom + paginator.per_page, paginator.count)
+    return len(page.object_list) == max(top - bottom, 0)
+
+
+def counted_page(queryset, per_page, number, count=None):
+    """
+    Returns an offset page whose total comes from a maintained counter (such
+    as a UserStats field) instead of a COUNT(*).
+
+    A counter can drift from its rows, e.g. after a queryset update or delete
+    that bypasses it. When the page does not hold the rows the counter
+    promises, the real count is read and the page is taken again, so a
+    counter ahead of the rows never leaves empty pages at the end.
+
+    Parameters:
+    -----------
+    queryset : QuerySet or ChainedListing
+        The queryset to paginate, already ordered.
+    per_page : int
+        Number of objects per page.
+    number : str or int
+        The requested page number, as given to Paginator.get_page.
+    count : int, optional
+        The counter giving the total. None reads the real count.
+
+    Returns:
+    --------
+    Page
+        The page, with its rows loaded.
+    """
+    paginator = Paginator(queryset, per_page)
+    if count is not None:
+        paginator.count = count
+
+    page = paginator.get_page(number)
+    page.object_list = list(page.object_list)
+
+    if count is not None and not _counter_holds(page):
+        return counted_page(queryset, per_page, number)
+
+    return page
+
+
+async def acounted_page(queryset, per_page, number, count=None):
+    """
+    Asynchronous version of counted_page, for the async views.
+
+    The real count, when needed, is read with acount() and the rows are
+    loaded with async iteration.
+    """
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount() if count is None else count
+
+    page = paginator.get_page(number)
+    page.object_list = [obj async for obj in page.object_list]
+
+    if count is not None and not _counter_holds(page):
+        return await acounted_page(queryset, per_page, number)
+
+    return page
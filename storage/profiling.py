@@ -0,0 +1,262 @@
+import cProfile
+import io
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.utils.text import slugify
+
+"""
+On-demand profiling of single live requests.
+
+A staff member gets a signed token (from the 'profiles' admin page, valid for
+STORAGE_PROFILE_TOKEN_MAX_AGE seconds and bound to their user) and sends it
+with a request, either as the '_profile' query parameter or as the
+'X-Storage-Profile' header. ProfilingMiddleware then serves that one request
+under cProfile and tracemalloc and saves, in STORAGE_PROFILE_DIR:
+
+- '<name>.prof': the cProfile stats (pstats, snakeviz, ...);
+- '<name>.txt': a report with the request, its duration and memory peak, the
+  functions with the highest cumulative time and the top allocations.
+
+Requests without a token are not affected.
+"""
+
+PROFILE_PARAM = "_profile"
+PROFILE_HEADER = "HTTP_X_STORAGE_PROFILE"
+TOKEN_SALT = "storage.profiling"
+
+# Lines of the report sections
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+
+NAME_RE = re.compile(r"^[\w-]+$")
+
+# cProfile cannot run two profilers at once (Python >= 3.12): one request at a time
+_lock = threading.Lock()
+
+
+def profile_dir():
+    """Returns the directory where the profiles are saved."""
+    return Path(
+        getattr(settings, "STORAGE_PROFILE_DIR", settings.BASE_DIR / "profiles")
+    )
+
+
+def make_token(user):
+    """Returns a signed profiling token for a staff user."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def check_token(token, user):
+    """
+    Checks a profiling token against the requesting user.
+
+    Parameters:
+    -----------
+    token : str
+        The token sent with the request.
+    user : User
+        The authenticated user of the request.
+
+    Returns:
+    --------
+    bool:
+        True if the token is valid, not expired, was made for this user and
+        the user is still staff.
+    """
+    if not user.is_staff:
+        return False
+
+    try:
+        user_id = signing.TimestampSigner(salt=TOKEN_SALT).unsign(
+            token,
+            max_age=getattr(settings, "STORAGE_PROFILE_TOKEN_MAX_AGE", 3600),
+        )
+    except signing.BadSignature:
+        return False
+
+    return user_id == str(user.pk)
+
+
+@contextmanager
+def _measure():
+    """
+    Runs the block under cProfile and tracemalloc; yields the dictionary of
+    keyword arguments of save_profile(), filled when the block exits.
+    """
+    measures = {}
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+
+    profiler.enable()
+    try:
+        yield measures
+    finally:
+        profiler.disable()
+        measures.update(
+            profiler=profiler,
+            duration=time.perf_counter() - start,
+            snapshot=tracemalloc.take_snapshot(),
+            peak=tracemalloc.get_traced_memory()[1],
+        )
+        if not tracing:
+            tracemalloc.stop()
+
+
+def profile_request(get_response, request):
+    """
+    Serves a request under cProfile and tracemalloc and saves the results.
+
+    Parameters:
+    -----------
+    get_response : callable
+        The next step of the middleware chain.
+    request : HttpRequest
+        The HttpRequest object.
+
+    Returns:
+    --------
+    HttpResponse:
+        The response, with the profile name in 'X-Storage-Profile'. If another
+        request is being profiled, the response is served without profiling.
+    """
+    if not _lock.acquire(blocking=False):
+        return get_response(request)
+
+    try:
+        with _measure() as measures:
+            response = get_response(request)
+
+        name = save_profile(request, response, **measures)
+    finally:
+        _lock.release()
+
+    response["X-Storage-Profile"] = name
+    return response
+
+
+async def aprofile_request(get_response, request):
+    """
+    Async version of profile_request(), for the ASGI middleware chain.
+
+    The profile covers the event loop thread while the request is served:
+    the sync code the request runs in worker threads (sync_to_async, the ORM
+    of async views) is not profiled, and other requests served by the loop
+    meanwhile are.
+    """
+    if not _lock.acquire(blocking=False):
+        return await get_response(request)
+
+    try:
+        with _measure() as measures:
+            response = await get_response(request)
+
+        name = save_profile(request, response, **measures)
+    finally:
+        _lock.release()
+
+    response["X-Storage-Profile"] = name
+    return response
+
+
+def save_profile(request, response, profiler, snapshot, duration, peak):
+    """Writes the '.prof' and '.txt' files of a request; returns their name."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    now = datetime.now()
+    name = f"{now:%Y%m%d-%H%M%S-%f}-{slugify(request.path)[:60] or 'root'}"
+
+    profiler.dump_stats(directory / f"{name}.prof")
+
+    functions = io.StringIO()
+    pstats.Stats(profiler, stream=functions).sort_stats("cumulative").print_stats(
+        TOP_FUNCTIONS
+    )
+
+    snapshot = snapshot.filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        )
+    )
+    allocations = "\n".join(
+        str(statistic)
+        for statistic in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+    )
+
+    (directory / f"{name}.txt").write_text(
+        f"{request.method} {request.get_full_path()}\n"
+        f"User: {request.user.get_username()}\n"
+        f"Status: {response.status_code}\n"
+        f"Date: {now:%Y-%m-%d %H:%M:%S}\n"
+        f"Duration: {duration * 1000:.1f} ms\n"
+        f"Memory peak: {peak / 1024:.1f} KiB\n\n"
+        f"Top {TOP_FUNCTIONS} functions (cumulative time)\n{functions.getvalue()}\n"
+        f"Top {TOP_ALLOCATIONS} allocations (live at the end of the request)\n"
+        f"{allocations}\n"
+    )
+
+    prune_profiles(directory)
+    return name
+
+
+def prune_profiles(directory):
+    """Deletes the oldest profiles beyond STORAGE_PROFILE_KEEP."""
+    keep = getattr(settings, "STORAGE_PROFILE_KEEP", 50)
+
+    for old in list_profiles()[keep:]:
+        for suffix in (".prof", ".txt"):
+            (directory / f"{old['name']}{suffix}").unlink(missing_ok=True)
+
+
+def list_profiles():
+    """
+    Lists the saved profiles, most recent first.
+
+    Returns:
+    --------
+    list:
+        One dict per profile with its 'name', 'date' and the size of the
+        '.prof' file ('size').
+    """
+    directory = profile_dir()
+
+    if not directory.is_dir():
+        return []
+
+    profiles = []
+    for path in directory.glob("*.prof"):
+        stat = path.stat()
+        profiles.append(
+            {
+                "name": path.stem,
+                "date": datetime.fromtimestamp(stat.st_mtime),
+                "size": stat.st_size,
+            }
+        )
+
+    return sorted(profiles, key=lambda profile: profile["name"], reverse=True)
+
+
+def profile_file(name, suffix):
+    """Returns the path of a saved profile file, or None if it does not exist."""
+    if not NAME_RE.match(name) or suffix not in (".prof", ".txt"):
+        return None
+
+    path = profile_dir() / f"{name}{suffix}"
+    return path if path.is_file() else None
@@ -0,0 +1,311 @@
+import re
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from storage.models import Item, ItemSearchEntry
+
+"""
+Full-text search for the 'storage' application.
+
+Search is delegated to a backend class chosen by the STORAGE_SEARCH_BACKEND
+setting (a dotted path). When the setting is empty, SQLiteFTS5Backend is used
+on SQLite and DatabaseSearchBackend everywhere else, so other databases can
+plug their own engine by subclassing BaseSearchBackend.
+
+Backends return the ids of the matching items, best match first. The ids are
+paginated in memory and only the current page is loaded from the Item table.
+"""
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Largest primary key the database can store (signed 64-bit integer)
+MAX_ITEM_ID = 2**63 - 1
+
+
+class BaseSearchBackend:
+    """
+    Interface implemented by every item search backend.
+
+    Methods
+    -------
+    search(query)
+        Returns a queryset of matching item ids, ranked best first.
+    index_item(item)
+        Adds or refreshes the index entry for a saved Item.
+    index_items(items)
+        Adds the index entries of many new Items (e.g. after bulk_create).
+    remove_item(item_id)
+        Removes the index entry of a deleted Item.
+    rebuild()
+        Recreates the whole index from the Item table.
+    """
+
+    def search(self, query):
+        raise NotImplementedError
+
+    def index_item(self, item):
+        pass
+
+    def index_items(self, items):
+        for item in items:
+            self.index_item(item)
+
+    def remove_item(self, item_id):
+        pass
+
+    def rebuild(self):
+        """
+        Recreates the whole index from the Item table.
+
+        Returns
+        -------
+        int
+            The number of indexed items.
+        """
+        return Item.objects.count()
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Portable backend with no index of its own.
+
+    Matches every search term against Item.object and Item.description with
+    case-insensitive containment and orders the results by '-item_id'. Used
+    on databases without a dedicated full-text engine.
+    """
+
+    def search(self, query):
+        terms = TOKEN_PATTERN.findall(query)
+
+        if not terms:
+            return Item.objects.none().values_list("pk", flat=True)
+
+        condition = Q()
+        for term in terms:
+            condition &= Q(object__icontains=term) | Q(description__icontains=term)
+
+        return (
+            Item.objects.filter(condition)
+            .order_by("-item_id")
+            .values_list("pk", flat=True)
+        )
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    """
+    Backend using the SQLite FTS5 virtual table 'storage_item_fts'.
+
+    Every search term is matched as a prefix against both indexed columns and
+    results are ordered by FTS5's bm25 'rank'. The index is kept in the same
+    database transaction as the Item write that triggers it.
+    """
+
+    def build_match_expression(self, query):
+        """
+        Turns free user input into a safe FTS5 query.
+
+        Each word becomes a quoted prefix term ("word"*), so FTS5 operators and
+        punctuation typed by the user are never interpreted.
+
+        Parameters
+        ----------
+        query : str
+            The raw search string.
+
+        Returns
+        -------
+        str
+            The MATCH expression, or an empty string if there is no word to match.
+        """
+        return " ".join(f'"{term}"*' for term in TOKEN_PATTERN.findall(query))
+
+    def search(self, query):
+        expression = self.build_match_expression(query)
+
+        if not expression:
+            return ItemSearchEntry.objects.none().values_list("rowid", flat=True)
+
+        return (
+            ItemSearchEntry.objects.filter(
+                RawSQL(
+                    f'"{ItemSearchEntry._meta.db_table}" MATCH %s',
+                    [expression],
+                    output_field=models.BooleanField(),
+                )
+            )
+            .order_by(RawSQL("rank", []))
+            .values_list("rowid", flat=True)
+        )
+
+    def index_item(self, item):
+        ItemSearchEntry(
+            rowid=item.pk, object=item.object, description=item.description
+        ).save()
+
+    def index_items(self, items):
+        ItemSearchEntry.objects.bulk_create(
+            ItemSearchEntry(
+                rowid=item.pk, object=item.object, description=item.description
+            )
+            for item in items
+        )
+
+    def remove_item(self, item_id):
+        ItemSearchEntry.objects.filter(rowid=item_id).delete()
+
+    def rebuild(self):
+        table = ItemSearchEntry._meta.db_table
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, object, description) "
+                f"SELECT item_id, object, description FROM {Item._meta.db_table}"
+            )
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+
+        return ItemSearchEntry.objects.count()
+
+
+_backends = {}
+
+
+def exact_item_id(query):
+    """
+    Returns the item_id a numeric query may name, or None.
+
+    Only ASCII/Unicode decimal digits count ("²".isdigit() is true but int()
+    rejects it), and values beyond the 64-bit range of the primary key are
+    ignored instead of overflowing the database parameter.
+    """
+    if not query.isdecimal():
+        return None
+
+    item_id = int(query)
+    return item_id if 0 < item_id <= MAX_ITEM_ID else None
+
+
+def get_search_backend():
+    """
+    Returns the configured search backend instance.
+
+    Reads STORAGE_SEARCH_BACKEND; when it is empty the backend is chosen from
+    the database vendor. Instances are cached per dotted path.
+
+    Returns
+    -------
+    BaseSearchBackend
+        The backend used by the views, signals and management command.
+    """
+    path = getattr(settings, "STORAGE_SEARCH_BACKEND", None)
+
+    if not path:
+        if connection.vendor == "sqlite":
+            path = "storage.search.SQLiteFTS5Backend"
+        else:
+            path = "storage.search.DatabaseSearchBackend"
+
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+
+    return _backends[path]
+
+
+def search_item_ids(query):
+    """
+    Returns the ranked ids of the items matching a search string.
+
+    A purely numeric query is also looked up as an exact item_id, and that
+    item (when it exists) is placed first. The result is capped at
+    STORAGE_SEARCH_MAX_RESULTS ids so the cost of a search does not grow
+    with the size of the inventory.
+
+    Parameters
+    ----------
+    query : str
+        The raw search string typed by the user.
+
+    Returns
+    -------
+    list
+        Item ids ordered from best to worst match.
+    """
+    limit = getattr(settings, "STORAGE_SEARCH_MAX_RESULTS", 1000)
+    exact_id = exact_item_id(query)
+
+    if exact_id is not None and not Item.objects.filter(pk=exact_id).exists():
+        exact_id = None
+
+    ranked_ids = get_search_backend().search(query)[:limit]
+    item_ids = [item_id for item_id in ranked_ids if item_id != exact_id]
+
+    if exact_id is not None:
+        item_ids.insert(0, exact_id)
+
+    return item_ids[:limit]
+
+
+def search_filter(query, field="pk"):
+    """
+    Builds a filter matching the items found by a search string.
+
+    Unlike search_item_ids, the ids are not ranked, capped or loaded into
+    memory: the backend's query runs as a subquery, so the filter can be
+    applied to any number of rows (e.g. the exports). The numeric exact
+    item_id match of the search view is kept.
+
+    Parameters
+    ----------
+    query : str
+        The raw search string typed by the user.
+    field : str, optional
+        The path from the filtered model to the Item primary key (defaults
+        to "pk", for Item querysets).
+
+    Returns
+    -------
+    Q
+        The filter to apply to the queryset.
+    """
+    condition = Q(**{f"{field}__in": get_search_backend().search(query)})
+
+    if (item_id := exact_item_id(query)) is not None:
+        condition |= Q(**{field: item_id})
+
+    return condition
+
+
+async def asearch_item_ids(query):
+    """
+    Asynchronous version of search_item_ids, for the async views.
+
+    Parameters
+    ----------
+    query : str
+        The raw search string typed by the user.
+
+    Returns
+    -------
+    list
+        Item ids ordered from best to worst match.
+    """
+    limit = getattr(settings, "STORAGE_SEARCH_MAX_RESULTS", 1000)
+    exact_id = exact_item_id(query)
+
+    if exact_id is not None and not await Item.objects.filter(pk=exact_id).aexists():
+        exact_id = None
+
+    item_ids = [
+        item_id
+        async for item_id in get_search_backend().search(query)[:limit]
+        if item_id != exact_id
+    ]
+
+    if exact_id is not None:
+        item_ids.insert(0, exact_id)
+
+    return item_ids[:limit]
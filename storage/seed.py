@@ -0,0 +1,199 @@
+"""
+Row generators of the 'seed_data' management command.
+
+The functions here only produce plain Python values (no ORM access), so they
+can run in worker processes started with any multiprocessing method while the
+command inserts their output. Every task carries its own index and the global
+seed, so the data generated for a given seed does not depend on the number of
+workers or on the order in which tasks finish.
+"""
+
+import random
+from datetime import timedelta
+
+import faker
+
+from utils.list_items import objects
+
+
+LOAN = "loan"
+DEVOLUTION = "devolution"
+
+# Chance that the last loan of an item's history is still open
+OPEN_LOAN_RATIO = 0.3
+
+# Loan period of the generated loans (STORAGE_LOAN_DAYS of the loan services)
+LOAN_DAYS = 14
+
+_fake = None
+_user_ids = ()
+
+
+def init_worker(user_ids=()):
+    """
+    Initializes a generator process.
+
+    Parameters
+    ----------
+    user_ids : sequence, optional
+        Primary keys of the users that can borrow items.
+    """
+    global _fake, _user_ids
+
+    _fake = faker.Faker("pt-br")
+    _user_ids = user_ids
+
+
+def _task_random(seed, index):
+    """Returns a Random (and seeds Faker) for one task, independent of the worker."""
+    task_seed = seed * 1_000_003 + index
+    _fake.seed_instance(task_seed)
+    return random.Random(task_seed)
+
+
+def generate_users(task):
+    """
+    Generates the fields of a batch of users.
+
+    Parameters
+    ----------
+    task : tuple
+        (index, seed, first, count): the task number, the global seed, the
+        sequence number of the first user and the number of users.
+
+    Returns
+    -------
+    list
+        One (username, first_name, last_name, email) tuple per user. The
+        sequence number is appended to the username, so usernames are unique
+        across workers.
+    """
+    index, seed, first, count = task
+    _task_random(seed, index)
+
+    users = []
+    for number in range(first, first + count):
+        username = f"{_fake.user_name()}{number}"[:150]
+        users.append(
+            (
+                username,
+                _fake.first_name(),
+                _fake.last_name(),
+                f"{username}@{_fake.free_email_domain()}",
+            )
+        )
+
+    return users
+
+
+def generate_items(task):
+    """
+    Generates a batch of items with their loan and devolution histories.
+
+    Each item gets on average 'loans_per_item' loan cycles by random
+    borrowers, moving forward in time from its creation date. Every cycle but
+    possibly the last is returned (a LOAN with 'returned_date' plus its
+    DEVOLUTION); the last one stays open with OPEN_LOAN_RATIO probability,
+    and its units are taken from the item's quantity.
+
+    Parameters
+    ----------
+    task : tuple
+        (index, seed, owner_ids, items_per_user, loans_per_item, now,
+        locations): the task number, the global seed, the owners of this
+        batch, the items generated per owner, the average number of loans per
+        item, the current time and the storage location choices.
+
+    Returns
+    -------
+    list
+        One (item, transactions) pair per item. 'item' is a dict of Item
+        fields and 'transactions' a list of dicts of Transaction fields
+        without 'item'.
+    """
+    index, seed, owner_ids, items_per_user, loans_per_item, now, locations = task
+    rng = _task_random(seed, index)
+
+    rows = []
+    for owner_id in owner_ids:
+        for _ in range(items_per_user):
+            quantity = rng.randint(1, 10)
+            created_date = now - timedelta(seconds=rng.randint(0, 365 * 86400))
+
+            item = {
+                "object": rng.choice(objects)[:20],
+                "description": _fake.text(max_nb_chars=70),
+                "quantity": quantity,
+                "storage_location": rng.choice(locations),
+                "is_available": True,
+                "created_date": created_date,
+                "owner_id": owner_id,
+            }
+            rows.append((item, _history(rng, item, now, loans_per_item)))
+
+    return rows
+
+
+def _history(rng, item, now, loans_per_item):
+    """Generates the transactions of one item and updates its final state."""
+    transactions = []
+    owner_id = item["owner_id"]
+    moment = item["created_date"]
+    cycles = rng.randint(0, 2 * loans_per_item) if _user_ids else 0
+
+    for cycle in range(cycles):
+        borrower_id = rng.choice(_user_ids)
+        if borrower_id == owner_id:
+            continue
+
+        loan_date = moment + timedelta(seconds=rng.randint(3600, 20 * 86400))
+        if loan_date >= now:
+            break
+
+        returned_date = loan_date + timedelta(seconds=rng.randint(3600, 10 * 86400))
+        units = rng.randint(1, item["quantity"])
+        stays_open = cycle == cycles - 1 and rng.random() < OPEN_LOAN_RATIO
+
+        if stays_open or returned_date >= now:
+            transactions.append(
+                _transaction(LOAN, owner_id, borrower_id, units, True, loan_date, None)
+            )
+            item["quantity"] -= units
+            item["is_available"] = item["quantity"] > 0
+            break
+
+        transactions.append(
+            _transaction(
+                LOAN, owner_id, borrower_id, units, True, loan_date, returned_date
+            )
+        )
+        transactions.append(
+            _transaction(
+                DEVOLUTION,
+                borrower_id,
+                owner_id,
+                units,
+                units < item["quantity"],
+                returned_date,
+                returned_date,
+            )
+        )
+        moment = returned_date
+
+    return transactions
+
+
+def _transaction(
+    type, from_user_id, to_user_id, quantity, was_available, loan_date, returned_date
+):
+    """Builds the fields of one generated Transaction."""
+    return {
+        "type": type,
+        "from_user_id": from_user_id,
+        "to_user_id": to_user_id,
+        "quantity": quantity,
+        "was_available": was_available,
+        "loan_date": loan_date,
+        "returned_date": returned_date,
+        "due_date": loan_date + timedelta(days=LOAN_DAYS) if type == LOAN else None,
+    }
@@ -0,0 +1,517 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.utils import timezone
+
+from storage import custody, stats, summary
+from storage.overdue import default_due_date
+from storage.cache import bump_items
+from storage.models import Item, Transaction
+
+"""
+Loan and devolution services for the 'storage' application.
+
+Each state change of an Item runs inside a database transaction and starts
+with a conditional UPDATE that only matches the row in the expected state.
+The database applies it to one writer at a time, so when several users race
+for the same item exactly one UPDATE matches and the others fail immediately
+with a LoanError instead of waiting on a lock held in Python.
+
+Stock is counted on the database side: a loan of N units runs
+"quantity = quantity - N" guarded by "quantity >= N" and a devolution runs
+"quantity = quantity + N", so concurrent borrowers of the same consumable
+never overwrite each other's counts. 'is_available' is derived from the
+remaining quantity in the same statement.
+
+Queryset updates skip auto_now, so every path sets 'updated_at' explicitly to
+refresh the cached table rows of the items it changes, and every path updates
+the per-user counters (storage.stats), the inventory summary
+(storage.summary) and the custody intervals (storage.custody) in the same
+database transaction.
+"""
+
+
+class LoanError(Exception):
+    """Base class for the errors raised by the loan services."""
+
+
+class ItemUnavailable(LoanError):
+    """Raised when an item has not enough units available to be borrowed."""
+
+
+class NotBorrower(LoanError):
+    """Raised when a user tries to return an item they do not hold."""
+
+
+class BatchConflict(LoanError):
+    """Raised when concurrent requests kept changing the items of a bulk batch."""
+
+
+BulkResult = namedtuple("BulkResult", ["item_id", "ok", "message"])
+BulkResult.__doc__ = """Outcome of one item in a bulk loan or devolution."""
+
+BULK_RETRIES = 3
+
+
+def latest_open_loan(item_ref="pk"):
+    """
+    Builds a subquery selecting the id of an item's most recent active loan.
+
+    Parameters
+    ----------
+    item_ref : str, optional
+        The outer field holding the item's primary key (defaults to "pk").
+
+    Returns
+    -------
+    Subquery
+        The id of the newest LOAN of the item without 'returned_date', or NULL.
+    """
+    return Subquery(
+        Transaction.objects.open_loans()
+        .filter(item=OuterRef(item_ref))
+        .order_by("-id")
+        .values("id")[:1]
+    )
+
+
+def lend_item(item_id, user, quantity=1, due_date=None):
+    """
+    Lends units of an available Item to a user.
+
+    Decrements the stock with a conditional UPDATE (only when the item is
+    available and has at least 'quantity' units left), then records the LOAN
+    transaction and links it as the item's 'current_loan', all in the same
+    database transaction. The item stays available while units remain.
+    The loan is due STORAGE_LOAN_DAYS later unless 'due_date' is given.
+
+    Parameters
+    ----------
+    item_id : int
+        The primary key of the Item to borrow.
+    user : User
+        The borrower.
+    quantity : int, optional
+        The number of units to borrow (defaults to 1).
+    due_date : datetime, optional
+        When the units must be returned (defaults to STORAGE_LOAN_DAYS after
+        the loan).
+
+    Returns
+    -------
+    Transaction
+        The LOAN transaction created.
+
+    Raises
+    ------
+    LoanError
+        If the quantity is not a positive number.
+    ItemUnavailable
+        If the item does not exist or has not enough units available.
+    """
+    if quantity < 1:
+        raise LoanError("The quantity must be at least 1.")
+
+    with transaction.atomic():
+        claimed = Item.objects.filter(
+            pk=item_id, is_available=True, quantity__gte=quantity
+        ).update(
+            quantity=F("quantity") - quantity,
+            is_available=Case(
+                When(quantity__gt=quantity, then=Value(True)), default=Value(False)
+            ),
+        )
+
+        if not claimed:
+            raise ItemUnavailable("This item has not enough units available.")
+
+        state = Item.objects.filter(pk=item_id).values(
+            "owner_id", *summary.STATE_FIELDS
+        )[0]
+        owner_id = state["owner_id"]
+        now = timezone.now()
+
+        loan = Transaction.objects.create(
+            item_id=item_id,
+            from_user_id=owner_id,
+            to_user=user,
+            was_available=True,
+            quantity=quantity,
+            type=Transaction.LOAN,
+            loan_date=now,
+            due_date=due_date or default_due_date(now),
+        )
+
+        Item.objects.filter(pk=item_id).update(current_loan=loan, updated_at=now)
+        custody.open_intervals([loan])
+
+        deltas = stats.new_deltas()
+        stats.count_transaction(deltas, owner_id, user.pk, opens_loan=True)
+        stats.apply(deltas)
+
+        # the claim only matched an available item with 'quantity' more units
+        before = {
+            **state,
+            "quantity": state["quantity"] + quantity,
+            "is_available": True,
+        }
+        inventory = summary.new_deltas()
+        summary.count_change(inventory, before, state)
+        summary.apply(inventory)
+
+    return loan
+
+
+def return_item(item_id, user):
+    """
+    Returns the units a user borrowed from an Item to its owner.
+
+    Finds the user's most recent active loan of the item, then closes it with
+    a conditional UPDATE that only matches while it is still open, so a
+    repeated or concurrent devolution of the same loan fails instead of
+    giving the units back twice. The units are added back to the stock, the
+    item becomes available and 'current_loan' moves to the newest loan still
+    active (if any).
+
+    Parameters
+    ----------
+    item_id : int
+        The primary key of the Item to return.
+    user : User
+        The user returning the item. Must hold an active loan of it.
+
+    Returns
+    -------
+    Transaction
+        The DEVOLUTION transaction created.
+
+    Raises
+    ------
+    NotBorrower
+        If the item does not exist or the user holds no active loan of it.
+    """
+    loan = (
+        Transaction.objects.open_loans()
+        .filter(item_id=item_id, to_user=user)
+        .only("id", "quantity", "from_user_id", "to_user_id")
+        .order_by("-id")
+        .first()
+    )
+
+    if loan is None:
+        raise NotBorrower("You are not allowed to return this item.")
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        closed = (
+            Transaction.objects.open_loans()
+            .filter(pk=loan.pk)
+            .update(returned_date=now)
+        )
+
+        if not closed:
+            raise NotBorrower("You are not allowed to return this item.")
+
+        custody.close_intervals([loan.pk], now)
+
+        state = (
+            Item.objects.select_for_update()
+            .filter(pk=item_id)
+            .values("owner_id", *summary.STATE_FIELDS)[0]
+        )
+        owner_id, was_available = state["owner_id"], state["is_available"]
+
+        Item.objects.filter(pk=item_id).update(
+            quantity=F("quantity") + loan.quantity,
+            is_available=True,
+            current_loan=latest_open_loan(),
+            updated_at=now,
+        )
+
+        devolution = Transaction.objects.create(
+            item_id=item_id,
+            from_user=user,
+            to_user_id=owner_id,
+            was_available=was_available,
+            quantity=loan.quantity,
+            type=Transaction.DEVOLUTION,
+            loan_date=now,
+            returned_date=now,
+        )
+
+        deltas = stats.new_deltas()
+        stats.close_loan(deltas, loan)
+        stats.count_transaction(deltas, user.pk, owner_id)
+        stats.apply(deltas)
+
+        after = {
+            **state,
+            "quantity": state["quantity"] + loan.quantity,
+            "is_available": True,
+        }
+        inventory = summary.new_deltas()
+        summary.count_change(inventory, state, after)
+        summary.apply(inventory)
+
+    return devolution
+
+
+def run_batch(batch, item_ids, user):
+    """
+    Runs a bulk batch, retrying it when it loses a race.
+
+    A batch validates its items with plain reads and then claims them with
+    conditional UPDATEs. If another request changed one of the items in
+    between, the claim matches fewer rows than expected, the batch raises
+    BatchConflict and its transaction is rolled back. The next attempt
+    reads the new state, so the item that was taken is reported as failed.
+
+    Parameters
+    ----------
+    batch : callable
+        The batch implementation, called with (item_ids, user).
+    item_ids : list
+        The primary keys of the Items.
+    user : User
+        The user performing the batch.
+
+    Returns
+    -------
+    list
+        The BulkResult list returned by the batch.
+
+    Raises
+    ------
+    BatchConflict
+        If every attempt lost a race.
+    """
+    for _ in range(BULK_RETRIES - 1):
+        try:
+            return batch(item_ids, user)
+        except BatchConflict:
+            continue
+
+    return batch(item_ids, user)
+
+
+def lend_items(item_ids, user):
+    """
+    Lends one unit of each of many Items to a user in a single batch.
+
+    Validates all the items with one query, then, in one database
+    transaction, claims them with one conditional UPDATE, writes every LOAN
+    record with one bulk_create (due STORAGE_LOAN_DAYS later) and links the
+    loans as 'current_loan' with one bulk_update. Items that cannot be lent
+    are reported and skipped; they do not abort the rest of the batch.
+
+    Parameters
+    ----------
+    item_ids : list
+        The primary keys of the Items to borrow (without duplicates).
+    user : User
+        The borrower.
+
+    Returns
+    -------
+    list
+        One BulkResult per requested item id, in the requested order.
+    """
+    return run_batch(_lend_items, item_ids, user)
+
+
+def _lend_items(item_ids, user):
+    results = {}
+    items = Item.objects.only(
+        "item_id", "owner_id", "quantity", "is_available"
+    ).in_bulk(item_ids)
+
+    lendable = []
+    for item_id in item_ids:
+        item = items.get(item_id)
+
+        if item is None:
+            results[item_id] = BulkResult(item_id, False, "Item not found.")
+        elif not item.is_available or item.quantity < 1:
+            results[item_id] = BulkResult(item_id, False, "Item not available.")
+        else:
+            lendable.append(item)
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        claimed = Item.objects.filter(
+            pk__in=[item.pk for item in lendable], is_available=True, quantity__gte=1
+        ).update(
+            quantity=F("quantity") - 1,
+            is_available=Case(
+                When(quantity__gt=1, then=Value(True)), default=Value(False)
+            ),
+            updated_at=now,
+        )
+
+        if claimed != len(lendable):
+            raise BatchConflict("The items changed meanwhile, please try again.")
+
+        loans = Transaction.objects.bulk_create(
+            Transaction(
+                item=item,
+                from_user_id=item.owner_id,
+                to_user=user,
+                was_available=True,
+                quantity=1,
+                type=Transaction.LOAN,
+                loan_date=now,
+                due_date=default_due_date(now),
+            )
+            for item in lendable
+        )
+
+        for loan in loans:
+            loan.item.current_loan = loan
+            results[loan.item_id] = BulkResult(loan.item_id, True, "Loan succeeded.")
+
+        Item.objects.bulk_update(lendable, ["current_loan"])
+        custody.open_intervals(loans)
+
+        deltas = stats.new_deltas()
+        for item in lendable:
+            stats.count_transaction(deltas, item.owner_id, user.pk, opens_loan=True)
+        stats.apply(deltas)
+
+        # each claimed item was available and lost one unit
+        inventory = summary.new_deltas()
+        for state in Item.objects.filter(
+            pk__in=[item.pk for item in lendable]
+        ).values(*summary.STATE_FIELDS):
+            before = {**state, "quantity": state["quantity"] + 1, "is_available": True}
+            summary.count_change(inventory, before, state)
+        summary.apply(inventory)
+
+        # bulk_create sends no signals, so invalidate the cached pages here
+        bump_items(
+            [item.pk for item in lendable],
+            [user.pk, *(item.owner_id for item in lendable)],
+        )
+
+    return [results[item_id] for item_id in item_ids]
+
+
+def return_items(item_ids, user):
+    """
+    Returns many borrowed Items to their owners in a single batch.
+
+    Validates the items and the user's open loans of them with one query
+    each, then, in one database transaction, closes every loan with one
+    conditional UPDATE, writes every DEVOLUTION record with one bulk_create
+    and gives the units back with one bulk_update. Items the user does not
+    hold are reported and skipped.
+
+    Parameters
+    ----------
+    item_ids : list
+        The primary keys of the Items to return (without duplicates).
+    user : User
+        The user returning the items.
+
+    Returns
+    -------
+    list
+        One BulkResult per requested item id, in the requested order.
+    """
+    return run_batch(_return_items, item_ids, user)
+
+
+def _return_items(item_ids, user):
+    results = {}
+    items = Item.objects.only("item_id", "owner_id", "is_available").in_bulk(item_ids)
+
+    loans = {}
+    for loan in (
+        Transaction.objects.open_loans()
+        .filter(item_id__in=items, to_user=user)
+        .only("id", "item_id", "quantity", "from_user_id", "to_user_id")
+        .order_by("item_id", "-id")
+    ):
+        loans.setdefault(loan.item_id, loan)
+
+    returned = []
+    for item_id in item_ids:
+        if item_id not in items:
+            results[item_id] = BulkResult(item_id, False, "Item not found.")
+        elif item_id not in loans:
+            results[item_id] = BulkResult(
+                item_id, False, "You are not allowed to return this item."
+            )
+        else:
+            returned.append(items[item_id])
+
+    now = timezone.now()
+
+    with transaction.atomic():
+        closed = (
+            Transaction.objects.open_loans()
+            .filter(pk__in=[loans[item.pk].pk for item in returned])
+            .update(returned_date=now)
+        )
+
+        if closed != len(returned):
+            raise BatchConflict("The items changed meanwhile, please try again.")
+
+        custody.close_intervals([loans[item.pk].pk for item in returned], now)
+
+        states = {
+            state["item_id"]: state
+            for state in Item.objects.select_for_update()
+            .filter(pk__in=[item.pk for item in returned])
+            .values("item_id", *summary.STATE_FIELDS)
+        }
+
+        Transaction.objects.bulk_create(
+            Transaction(
+                item=item,
+                from_user=user,
+                to_user_id=item.owner_id,
+                was_available=states[item.pk]["is_available"],
+                quantity=loans[item.pk].quantity,
+                type=Transaction.DEVOLUTION,
+                loan_date=now,
+                returned_date=now,
+            )
+            for item in returned
+        )
+
+        for item in returned:
+            item.quantity = F("quantity") + loans[item.pk].quantity
+            item.is_available = True
+            results[item.pk] = BulkResult(item.pk, True, "Devolution succeeded.")
+
+        Item.objects.bulk_update(returned, ["quantity", "is_available"])
+        Item.objects.filter(pk__in=[item.pk for item in returned]).update(
+            current_loan=latest_open_loan(), updated_at=now
+        )
+
+        deltas = stats.new_deltas()
+        for item in returned:
+            stats.close_loan(deltas, loans[item.pk])
+            stats.count_transaction(deltas, user.pk, item.owner_id)
+        stats.apply(deltas)
+
+        inventory = summary.new_deltas()
+        for item in returned:
+            state = states[item.pk]
+            after = {
+                **state,
+                "quantity": state["quantity"] + loans[item.pk].quantity,
+                "is_available": True,
+            }
+            summary.count_change(inventory, state, after)
+        summary.apply(inventory)
+
+        bump_items(
+            [item.pk for item in returned],
+            [user.pk, *(item.owner_id for item in returned)],
+        )
+
+    return [results[item_id] for item_id in item_ids]
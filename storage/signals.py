@@ -0,0 +1,164 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from storage import stats, summary
+from storage.auth import user_cache_key
+from storage.cache import bump, bump_items, user_scope
+from storage.models import Item, Transaction, UserStats
+from storage.search import get_search_backend
+
+"""
+Signal receivers for the 'storage' application.
+
+Connected when the app is ready (see StorageConfig.ready) and used to keep
+derived data, such as the full-text search index and the versions of the
+cached pages, the per-user counters and the inventory summary, in sync with
+model writes.
+"""
+
+
+@receiver(post_save, sender=Item, dispatch_uid="storage_index_item")
+def index_item(sender, instance, **kwargs):
+    """
+    Adds or refreshes the search index entry of a saved Item.
+    """
+    get_search_backend().index_item(instance)
+
+
+@receiver(post_delete, sender=Item, dispatch_uid="storage_unindex_item")
+def unindex_item(sender, instance, **kwargs):
+    """
+    Removes the search index entry of a deleted Item.
+    """
+    get_search_backend().remove_item(instance.pk)
+
+
+@receiver(post_save, sender=Item, dispatch_uid="storage_invalidate_item_save")
+@receiver(post_delete, sender=Item, dispatch_uid="storage_invalidate_item_delete")
+def invalidate_item_pages(sender, instance, **kwargs):
+    """
+    Invalidates the cached listing, item and owner pages of a changed Item.
+    """
+    bump_items([instance.pk], [instance.owner_id])
+
+
+@receiver(
+    post_save, sender=Transaction, dispatch_uid="storage_invalidate_transaction_save"
+)
+@receiver(
+    post_delete,
+    sender=Transaction,
+    dispatch_uid="storage_invalidate_transaction_delete",
+)
+def invalidate_transaction_pages(sender, instance, **kwargs):
+    """
+    Invalidates the cached pages of the item and users of a Transaction.
+    """
+    bump_items([instance.item_id], [instance.from_user_id, instance.to_user_id])
+
+
+@receiver(post_save, sender=User, dispatch_uid="storage_invalidate_user_save")
+def invalidate_user_pages(sender, instance, **kwargs):
+    """
+    Invalidates the cached profile pages of a changed User.
+    """
+    bump(user_scope(instance.pk))
+
+
+@receiver(post_save, sender=User, dispatch_uid="storage_uncache_user_save")
+@receiver(post_delete, sender=User, dispatch_uid="storage_uncache_user_delete")
+def uncache_user(sender, instance, **kwargs):
+    """
+    Removes a changed User from the CachedModelBackend cache, right away and
+    again on commit (a concurrent request may cache the old row meanwhile).
+    """
+    key = user_cache_key(instance.pk)
+
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(pre_save, sender=Item, dispatch_uid="storage_remember_item_state")
+def remember_item_state(sender, instance, **kwargs):
+    """
+    Stores the stored state of an Item about to be saved (None if it is new),
+    so the counters and the summary can move it to the new state.
+    """
+    instance._previous_state = (
+        Item.objects.filter(pk=instance.pk)
+        .values("owner_id", *summary.STATE_FIELDS)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Item, dispatch_uid="storage_stats_item_save")
+def count_item_owner(sender, instance, **kwargs):
+    """
+    Updates the 'items_owned' counters of a new Item or of a changed owner.
+    """
+    previous_owner_id = (getattr(instance, "_previous_state", None) or {}).get(
+        "owner_id"
+    )
+
+    if previous_owner_id != instance.owner_id:
+        deltas = stats.new_deltas()
+        deltas[previous_owner_id]["items_owned"] -= 1
+        deltas[instance.owner_id]["items_owned"] += 1
+        stats.apply(deltas)
+
+
+@receiver(post_delete, sender=Item, dispatch_uid="storage_stats_item_delete")
+def uncount_item_owner(sender, instance, **kwargs):
+    """
+    Updates the 'items_owned' counter of the owner of a deleted Item.
+    """
+    deltas = stats.new_deltas()
+    deltas[instance.owner_id]["items_owned"] -= 1
+    stats.apply(deltas)
+
+
+@receiver(post_save, sender=User, dispatch_uid="storage_stats_user_create")
+def create_user_stats(sender, instance, created, **kwargs):
+    """
+    Creates the (empty) counters row of a new User.
+    """
+    if created:
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=instance.pk)], ignore_conflicts=True
+        )
+
+
+@receiver(post_save, sender=Item, dispatch_uid="storage_summary_item_save")
+def summarize_item(sender, instance, **kwargs):
+    """
+    Moves a saved Item from its previous state to the new one in the summary.
+    """
+    deltas = summary.new_deltas()
+    previous_state = getattr(instance, "_previous_state", None)
+
+    if previous_state:
+        summary.count_item(deltas, previous_state, -1)
+    summary.count_item(deltas, summary.item_state(instance))
+
+    summary.apply(deltas, create=True)
+
+
+@receiver(pre_delete, sender=Item, dispatch_uid="storage_summary_item_delete")
+def unsummarize_item(sender, instance, **kwargs):
+    """
+    Removes an Item about to be deleted from the summary, using its stored
+    state (the instance may be older than the last loan).
+    """
+    state = (
+        Item.objects.filter(pk=instance.pk).values(*summary.STATE_FIELDS).first()
+    )
+
+    if state:
+        deltas = summary.new_deltas()
+        summary.count_item(deltas, state, -1)
+        summary.apply(deltas)
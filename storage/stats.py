@@ -0,0 +1,267 @@
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+
+from storage.models import Item, Transaction, TransactionArchive, UserStats
+
+"""
+Incremental maintenance of the per-user counters (UserStats).
+
+The write paths collect the changes of a write as deltas, a mapping of user id
+to a Counter of UserStats fields, and call apply() inside the database
+transaction of the write, so the counters commit or roll back with it:
+
+    deltas = new_deltas()
+    count_transaction(deltas, owner_id, user.pk, opens_loan=True)
+    apply(deltas)
+
+apply() adds the deltas with a relative "field = field + delta" UPDATE, which
+concurrent writers cannot lose. Rows are created with the users (see
+storage.signals); a user without a row yet (created before the counters
+existed or by bulk_create) gets it computed from scratch, after the write, so
+the write is already counted.
+
+Writes that bypass these paths (the admin, raw SQL, bulk loaders that do not
+call apply()) are repaired with 'manage.py rebuild_user_stats', built on
+recompute() and verify().
+"""
+
+FIELDS = ("items_owned", "active_loans_out", "active_loans_in", "transactions_total")
+
+BATCH_SIZE = 1000
+
+
+def new_deltas():
+    """Returns an empty deltas mapping (user id -> Counter of fields)."""
+    return defaultdict(Counter)
+
+
+def count_transaction(deltas, from_user_id, to_user_id, opens_loan=False):
+    """
+    Adds a new Transaction to the deltas.
+
+    Parameters:
+    -----------
+    deltas : defaultdict
+        The deltas being collected.
+    from_user_id : int or None
+        The lender (LOAN) or the user giving the item back (DEVOLUTION).
+    to_user_id : int or None
+        The borrower (LOAN) or the owner getting the item back (DEVOLUTION).
+    opens_loan : bool, optional
+        True for a LOAN, which is also an active loan of both users.
+    """
+    for user_id in {from_user_id, to_user_id}:
+        deltas[user_id]["transactions_total"] += 1
+
+    if opens_loan:
+        deltas[from_user_id]["active_loans_out"] += 1
+        deltas[to_user_id]["active_loans_in"] += 1
+
+
+def close_loan(deltas, loan):
+    """Adds the closing of an active LOAN (with its user ids loaded) to the deltas."""
+    deltas[loan.from_user_id]["active_loans_out"] -= 1
+    deltas[loan.to_user_id]["active_loans_in"] -= 1
+
+
+def apply(deltas):
+    """
+    Writes the deltas to the UserStats rows.
+
+    Must run inside the database transaction of the write being counted,
+    after the write. All the users are updated by one UPDATE (a CASE on the
+    user id per field), so bulk paths stay at a constant number of queries.
+    Deltas of deleted users (None) and zero deltas are skipped; users without
+    a row get it recomputed.
+
+    Parameters:
+    -----------
+    deltas : mapping
+        User id -> Counter of UserStats fields.
+    """
+    changes = {
+        user_id: {field: delta for field, delta in fields.items() if delta}
+        for user_id, fields in deltas.items()
+        if user_id is not None
+    }
+    changes = {user_id: fields for user_id, fields in changes.items() if fields}
+
+    if not changes:
+        return
+
+    updated = UserStats.objects.filter(pk__in=changes).update(
+        **{
+            field: F(field)
+            + Case(
+                *(
+                    When(pk=user_id, then=Value(fields[field]))
+                    for user_id, fields in changes.items()
+                    if field in fields
+                ),
+                default=Value(0),
+            )
+            for field in FIELDS
+            if any(field in fields for fields in changes.values())
+        }
+    )
+
+    if updated != len(changes):
+        existing = set(
+            UserStats.objects.filter(pk__in=changes).values_list("pk", flat=True)
+        )
+        recompute([user_id for user_id in changes if user_id not in existing])
+
+
+def compute(user_ids):
+    """
+    Counts the stats of some users from the items and transactions (hot and
+    archived).
+
+    Parameters:
+    -----------
+    user_ids : list
+        The primary keys of the Users.
+
+    Returns:
+    --------
+    dict:
+        User id -> dict of UserStats field values.
+    """
+    counts = {user_id: dict.fromkeys(FIELDS, 0) for user_id in user_ids}
+
+    def add(field, queryset, column):
+        rows = (
+            queryset.filter(**{f"{column}__in": user_ids})
+            .order_by()
+            .values_list(column)
+            .annotate(total=Count("pk"))
+        )
+        for user_id, total in rows:
+            counts[user_id][field] += total
+
+    add("items_owned", Item.objects, "owner_id")
+    add("active_loans_out", Transaction.objects.open_loans(), "from_user_id")
+    add("active_loans_in", Transaction.objects.open_loans(), "to_user_id")
+    # archived transactions still count (moving them changes no counter)
+    for model in (Transaction, TransactionArchive):
+        add("transactions_total", model.objects, "from_user_id")
+        # a user on both sides of a transaction is counted once
+        add(
+            "transactions_total",
+            model.objects.exclude(from_user_id=F("to_user_id")),
+            "to_user_id",
+        )
+
+    return counts
+
+
+def _batches(user_ids):
+    if user_ids is None:
+        user_ids = User.objects.order_by("pk").values_list("pk", flat=True).iterator()
+
+    batch = []
+    for user_id in user_ids:
+        batch.append(user_id)
+
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def recompute(user_ids=None):
+    """
+    Recomputes the stats of some users (all by default) from scratch.
+
+    Works in batches of BATCH_SIZE users: a few GROUP BY queries and one
+    upsert per batch, each batch in its own database transaction.
+
+    Parameters:
+    -----------
+    user_ids : iterable, optional
+        The primary keys of the Users (defaults to every user).
+
+    Returns:
+    --------
+    int:
+        The number of rows written.
+    """
+    written = 0
+
+    for batch in _batches(user_ids):
+        counts = compute(batch)
+
+        with transaction.atomic():
+            UserStats.objects.bulk_create(
+                [UserStats(user_id=user_id, **counts[user_id]) for user_id in batch],
+                update_conflicts=True,
+                unique_fields=["user"],
+                update_fields=FIELDS,
+            )
+
+        written += len(batch)
+
+    return written
+
+
+def verify(user_ids=None):
+    """
+    Compares the stored stats of some users (all by default) with fresh counts.
+
+    Counts changed by concurrent writes while it runs may show up as
+    mismatches, so run it on a quiet database or check twice.
+
+    Parameters:
+    -----------
+    user_ids : iterable, optional
+        The primary keys of the Users (defaults to every user).
+
+    Returns:
+    --------
+    list:
+        One (user_id, field, stored, expected) tuple per mismatch. A missing
+        row has None as stored value.
+    """
+    mismatches = []
+
+    for batch in _batches(user_ids):
+        counts = compute(batch)
+        stored = UserStats.objects.in_bulk(batch)
+
+        for user_id in batch:
+            row = stored.get(user_id)
+
+            for field in FIELDS:
+                value = getattr(row, field) if row else None
+
+                if value != counts[user_id][field]:
+                    mismatches.append((user_id, field, value, counts[user_id][field]))
+
+    return mismatches
+
+
+def get_stats(user_id):
+    """Returns the UserStats of a user, computing the row if it is missing."""
+    stats = UserStats.objects.filter(pk=user_id).first()
+
+    if stats is None and User.objects.filter(pk=user_id).exists():
+        recompute([user_id])
+        stats = UserStats.objects.filter(pk=user_id).first()
+
+    return stats
+
+
+async def aget_stats(user_id):
+    """Asynchronous version of get_stats, for the async views."""
+    stats = await UserStats.objects.filter(pk=user_id).afirst()
+
+    if stats is None:
+        stats = await sync_to_async(get_stats)(user_id)
+
+    return stats
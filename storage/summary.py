@@ -0,0 +1,244 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from storage.models import InventorySummary, Item
+
+"""
+Incremental maintenance of the inventory summary (InventorySummary).
+
+Every Item contributes one item and its quantity to three rows: its storage
+location, its availability and its object type. A write describes the item
+states it replaces and the ones it creates as deltas, a mapping of
+(dimension, key) to a Counter of 'items' and 'quantity', and calls apply()
+inside its database transaction:
+
+    deltas = new_deltas()
+    count_change(deltas, before, after)
+    apply(deltas)
+
+apply() adds the deltas with one relative UPDATE, so concurrent loans of
+items in the same location never overwrite each other's totals. Rows are only
+deleted by rebuild(), which recreates the rows of every existing item, so
+the loan paths always find theirs; writes that add items pass create=True.
+The item states are dicts of STATE_FIELDS read in the same transaction as
+the change (after the conditional UPDATE of the loan path, which locks the
+row).
+
+'manage.py rebuild_inventory_summary' recomputes the rows with rebuild().
+"""
+
+STATE_FIELDS = ("storage_location", "is_available", "object", "quantity")
+
+DIMENSION_FIELDS = {
+    InventorySummary.LOCATION: "storage_location",
+    InventorySummary.AVAILABILITY: "is_available",
+    InventorySummary.OBJECT: "object",
+}
+
+
+def availability_key(is_available):
+    """Returns the summary key of an availability state."""
+    return "available" if is_available else "unavailable"
+
+
+def item_state(item):
+    """Returns the state (dict of STATE_FIELDS) of an Item instance."""
+    return {field: getattr(item, field) for field in STATE_FIELDS}
+
+
+def new_deltas():
+    """Returns an empty deltas mapping ((dimension, key) -> Counter)."""
+    return defaultdict(Counter)
+
+
+def count_item(deltas, state, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) an item state to the deltas.
+
+    Parameters:
+    -----------
+    deltas : defaultdict
+        The deltas being collected.
+    state : dict
+        The values of STATE_FIELDS of the item.
+    sign : int, optional
+        1 for a state that appears, -1 for one that disappears.
+    """
+    for dimension, field in DIMENSION_FIELDS.items():
+        key = state[field]
+
+        if dimension == InventorySummary.AVAILABILITY:
+            key = availability_key(key)
+
+        deltas[(dimension, key)]["items"] += sign
+        deltas[(dimension, key)]["quantity"] += sign * state["quantity"]
+
+
+def count_change(deltas, before, after):
+    """Adds an item going from state 'before' to state 'after' to the deltas."""
+    count_item(deltas, before, -1)
+    count_item(deltas, after)
+
+
+def apply(deltas, create=False):
+    """
+    Writes the deltas to the summary rows.
+
+    Must run inside the database transaction of the write being counted. All
+    the rows are updated by one UPDATE (a CASE per field).
+
+    Parameters:
+    -----------
+    deltas : mapping
+        (dimension, key) -> Counter of 'items' and 'quantity'.
+    create : bool, optional
+        True when the write may introduce new keys (a new item, location or
+        object type): the missing rows are then inserted empty first,
+        ignoring conflicts with concurrent writers. The loan paths only move
+        existing items between the availability rows, which always exist.
+    """
+    changes = {
+        row: {field: delta for field, delta in fields.items() if delta}
+        for row, fields in deltas.items()
+    }
+    changes = {row: fields for row, fields in changes.items() if fields}
+
+    if not changes:
+        return
+
+    if create:
+        InventorySummary.objects.bulk_create(
+            [
+                InventorySummary(dimension=dimension, key=key)
+                for dimension, key in changes
+            ],
+            ignore_conflicts=True,
+        )
+
+    rows = Q()
+    for dimension, key in changes:
+        rows |= Q(dimension=dimension, key=key)
+
+    InventorySummary.objects.filter(rows).update(
+        **{
+            field: F(field)
+            + Case(
+                *(
+                    When(dimension=dimension, key=key, then=Value(fields[field]))
+                    for (dimension, key), fields in changes.items()
+                    if field in fields
+                ),
+                default=Value(0),
+            )
+            for field in ("items", "quantity")
+            if any(field in fields for fields in changes.values())
+        }
+    )
+
+
+def compute():
+    """
+    Groups the item table by every dimension.
+
+    Returns:
+    --------
+    dict:
+        (dimension, key) -> (items, quantity). Both availability rows are
+        always present.
+    """
+    totals = {
+        (InventorySummary.AVAILABILITY, availability_key(is_available)): (0, 0)
+        for is_available in (True, False)
+    }
+
+    for dimension, field in DIMENSION_FIELDS.items():
+        rows = (
+            Item.objects.order_by()
+            .values_list(field)
+            .annotate(items=Count("pk"), quantity=Sum("quantity"))
+        )
+        for key, items, quantity in rows:
+            if dimension == InventorySummary.AVAILABILITY:
+                key = availability_key(key)
+            totals[(dimension, key)] = (items, quantity or 0)
+
+    return totals
+
+
+def drift(totals=None):
+    """
+    Compares the stored summary with fresh totals.
+
+    Parameters:
+    -----------
+    totals : dict, optional
+        The result of compute() (computed when not given).
+
+    Returns:
+    --------
+    list:
+        One (dimension, key, stored, expected) tuple per row that differs,
+        where stored and expected are (items, quantity) pairs.
+    """
+    if totals is None:
+        totals = compute()
+
+    stored = {
+        (dimension, key): (items, quantity)
+        for dimension, key, items, quantity in InventorySummary.objects.values_list(
+            "dimension", "key", "items", "quantity"
+        )
+    }
+
+    differences = []
+    for row in sorted(stored.keys() | totals.keys()):
+        before, expected = stored.get(row, (0, 0)), totals.get(row, (0, 0))
+
+        if before != expected:
+            differences.append((*row, before, expected))
+
+    return differences
+
+
+def rebuild():
+    """
+    Replaces the summary rows with fresh totals, in one database transaction.
+
+    Returns:
+    --------
+    list:
+        The drift() found and corrected.
+    """
+    with transaction.atomic():
+        list(InventorySummary.objects.select_for_update().values_list("pk"))
+        totals = compute()
+        differences = drift(totals)
+
+        InventorySummary.objects.all().delete()
+        InventorySummary.objects.bulk_create(
+            InventorySummary(
+                dimension=dimension, key=key, items=items, quantity=quantity
+            )
+            for (dimension, key), (items, quantity) in totals.items()
+        )
+
+    return differences
+
+
+def dashboard():
+    """
+    Reads the summary for the dashboard.
+
+    Returns:
+    --------
+    dict:
+        Dimension -> list of non-empty rows (most items first).
+    """
+    groups = {dimension: [] for dimension, _ in InventorySummary.dimensions}
+
+    for row in InventorySummary.objects.exclude(items=0).order_by("-items", "key"):
+        groups[row.dimension].append(row)
+
+    return groups
@@ -1,3 +1,1867 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.http import http_date, urlsafe_base64_encode
+
+from storage import archive, custody, events, jobs, overdue, stats, summary
+from storage.api import create_token
+from storage.cache import cache_stats
+from storage.models import (
+    Item,
+    Job,
+    LoanInterval,
+    OverdueLoan,
+    Transaction,
+    TransactionArchive,
+)
+from storage.forms import BulkTransactionForm, ItemForm
+from storage.management.commands.bench_views import Command as BenchViewsCommand
+from storage.middleware import ProfilingMiddleware, QueryInstrumentationMiddleware
+from storage.pagination import (
+    NEXT,
+    PREVIOUS,
+    ChainedListing,
+    KeysetPaginator,
+    encode_cursor,
+)
+from storage.profiling import make_token
+from storage.search import search_filter, search_item_ids
+from storage.services import (
+    ItemUnavailable,
+    LoanError,
+    NotBorrower,
+    lend_item,
+    lend_items,
+    return_item,
+    return_items,
+)
+
+
+def create_item(owner, **kwargs):
+    """Creates an available Item owned by 'owner' for the tests."""
+    fields = {
+        "object": "Martelo",
+        "description": "Martelo de aço",
+        "quantity": 1,
+        "storage_location": "Storage 1",
+        "is_available": True,
+        "owner": owner,
+    }
+    fields.update(kwargs)
+    return Item.objects.create(**fields)
+
+
+class TransactionListingQueriesTest(TestCase):
+    """
+    Pins the number of queries issued by the transaction listings.
+
+    The count must not depend on how many rows the page renders, otherwise the
+    template is lazily loading item or user relations row by row (N+1).
+    """
+
+    # session, user, the highest id (the conditional GET validator), COUNT(*)
+    # and the page itself (the archive's count and greatest key are cached
+    # until the next archiving, see storage.archive)
+    TRANSACTIONS_QUERIES = 5
+    # same as above plus the profile's User lookup, with the user's stats row
+    # giving the paginator its total instead of the COUNT(*)
+    PROFILE_QUERIES = 5
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.client.force_login(self.borrower)
+
+    def create_transactions(self, total):
+        for _ in range(total):
+            Transaction.objects.create(
+                item=create_item(self.owner),
+                from_user=self.owner,
+                to_user=self.borrower,
+                type=Transaction.LOAN,
+            )
+        # written without the loan services, so refresh the counters
+        stats.recompute([self.owner.pk, self.borrower.pk])
+
+    def test_transactions_page_query_count_is_constant(self):
+        self.create_transactions(1)
+        # caches the archive's count
+        self.client.get(reverse("items:transactions"))
+
+        with self.assertNumQueries(self.TRANSACTIONS_QUERIES):
+            self.client.get(reverse("items:transactions"))
+
+        self.create_transactions(16)
+        with self.assertNumQueries(self.TRANSACTIONS_QUERIES):
+            response = self.client.get(reverse("items:transactions"))
+
+        self.assertEqual(len(response.context["page_obj"]), 17)
+
+    def test_user_profile_query_count_is_constant(self):
+        url = reverse("items:user_profile", args=(self.borrower.id,))
+
+        self.create_transactions(1)
+        # caches the archive's greatest key, through another URL than the
+        # measured one so that the page itself is not cached
+        self.client.get(url, {"page": 2})
+
+        with self.assertNumQueries(self.PROFILE_QUERIES):
+            self.client.get(url)
+
+        self.create_transactions(16)
+        with self.assertNumQueries(self.PROFILE_QUERIES):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.context["page_obj"]), 17)
+
+
+class AsyncViewsTest(TestCase):
+    """
+    Checks that the async views render the same data as the sync ones.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.item = create_item(self.owner)
+        lend_item(self.item.pk, self.borrower)
+
+    async def test_async_views_render(self):
+        await self.async_client.aforce_login(self.borrower)
+
+        response = await self.async_client.get(reverse("items:index_async"))
+        self.assertEqual(list(response.context["page_obj"]), [self.item])
+
+        response = await self.async_client.get(
+            reverse("items:item_async", args=(self.item.pk,))
+        )
+        self.assertEqual(response.context["user_loan"].to_user_id, self.borrower.pk)
+
+        response = await self.async_client.get(
+            reverse("items:search_async"), {"q": "martelo"}
+        )
+        self.assertEqual(list(response.context["page_obj"]), [self.item])
+
+        for url in (
+            reverse("items:transactions_async"),
+            reverse("items:user_profile_async", args=(self.borrower.pk,)),
+        ):
+            response = await self.async_client.get(url)
+            self.assertEqual(len(response.context["page_obj"]), 1)
+
+    async def test_async_views_require_login(self):
+        response = await self.async_client.get(reverse("items:index_async"))
+        self.assertRedirects(
+            response,
+            f"{reverse('items:login')}?next={reverse('items:index_async')}",
+            fetch_redirect_response=False,
+        )
+
+
+class KeysetPaginatorTest(TestCase):
+    """
+    Checks the cursors of the keyset pagination.
+    """
+
+    def setUp(self):
+        owner = User.objects.create_user("owner", password="password123")
+        self.ids = [create_item(owner).pk for _ in range(5)][::-1]
+        self.paginator = KeysetPaginator(Item.objects.all(), 2, key="item_id")
+
+    def item_ids(self, page_obj):
+        return [item.pk for item in page_obj]
+
+    def test_next_and_previous_cursors(self):
+        first = self.paginator.get_page()
+        self.assertEqual(self.item_ids(first), self.ids[:2])
+        self.assertIsNone(first.previous_cursor)
+
+        second = self.paginator.get_page(first.next_cursor)
+        self.assertEqual(self.item_ids(second), self.ids[2:4])
+
+        last = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(self.item_ids(last), self.ids[4:])
+        self.assertFalse(last.has_next())
+
+        back = self.paginator.get_page(last.previous_cursor)
+        self.assertEqual(self.item_ids(back), self.ids[2:4])
+        self.assertTrue(back.has_next())
+
+        back = self.paginator.get_page(back.previous_cursor)
+        self.assertEqual(self.item_ids(back), self.ids[:2])
+        self.assertFalse(back.has_previous())
+
+    async def test_async_page_matches(self):
+        first = await self.paginator.aget_page()
+        second = await self.paginator.aget_page(first.next_cursor)
+        self.assertEqual(self.item_ids(second), self.ids[2:4])
+
+    def test_malformed_cursors_return_the_first_page(self):
+        for cursor in (
+            "",
+            "not-base64!",
+            encode_cursor("x", 3),
+            urlsafe_base64_encode(b"n:abc"),
+            urlsafe_base64_encode(b"\xff\xfe"),
+            # a backward cursor running off the start
+            encode_cursor(PREVIOUS, self.ids[0]),
+        ):
+            page_obj = self.paginator.get_page(cursor)
+            self.assertEqual(self.item_ids(page_obj), self.ids[:2])
+            self.assertIsNone(page_obj.previous_cursor)
+
+    def test_tampered_cursor_seeks_from_its_value(self):
+        page_obj = self.paginator.get_page(encode_cursor(NEXT, self.ids[0] + 100))
+        self.assertEqual(self.item_ids(page_obj), self.ids[:2])
+
+        page_obj = self.paginator.get_page(encode_cursor(NEXT, self.ids[-1]))
+        self.assertEqual(self.item_ids(page_obj), [])
+        self.assertFalse(page_obj.has_other_pages())
+
+    def test_ties_on_other_columns_are_paged_once(self):
+        Item.objects.update(object="Martelo", updated_at=timezone.now())
+        paginator = KeysetPaginator(
+            Item.objects.order_by("updated_at").values("item_id", "object"),
+            2,
+            key="item_id",
+        )
+
+        ids, cursor = [], None
+        while True:
+            page_obj = paginator.get_page(cursor)
+            ids += [row["item_id"] for row in page_obj]
+            if not page_obj.has_next():
+                break
+            cursor = page_obj.next_cursor
+
+        self.assertEqual(ids, self.ids)
+
+    def test_empty_listing(self):
+        paginator = KeysetPaginator(Item.objects.none(), 2, key="item_id")
+
+        for cursor in (None, encode_cursor(NEXT, 10), encode_cursor(PREVIOUS, 10)):
+            page_obj = paginator.get_page(cursor)
+            self.assertEqual(len(page_obj), 0)
+            self.assertFalse(page_obj.has_other_pages())
+
+
+class ConditionalGetTest(TestCase):
+    """
+    Checks that unchanged item and listing pages answer conditional GETs with
+    304 Not Modified, from the validators alone.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.item = create_item(self.owner)
+        lend_item(self.item.pk, self.borrower)
+        self.client.force_login(self.borrower)
+
+    def test_unchanged_pages_are_not_modified(self):
+        urls = [
+            reverse("items:index"),
+            reverse("items:item", args=[self.item.pk]),
+            reverse("items:transactions"),
+        ]
+        etags = {}
+
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("private", response["Cache-Control"])
+            etags[url] = response["ETag"]
+
+            # session, user, validators: neither the page query nor the template
+            with self.assertNumQueries(3):
+                response = self.client.get(url, headers={"If-None-Match": etags[url]})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b"")
+
+        response = self.client.get(urls[1])
+        response = self.client.get(
+            urls[1], headers={"If-Modified-Since": response["Last-Modified"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        # the ETag is per user
+        client = self.client_class()
+        client.force_login(self.owner)
+        response = client.get(urls[0], headers={"If-None-Match": etags[urls[0]]})
+        self.assertEqual(response.status_code, 200)
+
+        # a devolution changes the three pages
+        return_item(self.item.pk, self.borrower)
+
+        for url in urls:
+            response = self.client.get(url, headers={"If-None-Match": etags[url]})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etags[url])
+
+    def test_deleted_item_changes_the_listing(self):
+        newest = create_item(self.owner, object="Serrote")
+        url = reverse("items:index")
+
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        # the highest 'updated_at' is still the newest item's
+        self.item.delete()
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["page_obj"]), [newest])
+
+        response = self.client.get(
+            url, headers={"If-Modified-Since": http_date(time.time())}
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class VersionedCacheTest(TestCase):
+    """
+    Checks that writes invalidate exactly the cached pages built from the
+    scopes they change, and that pages are cached per user.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.other = User.objects.create_user("other", password="password123")
+        self.item = create_item(self.owner)
+        self.other_item = create_item(self.other, object="Serrote")
+        self.client.force_login(self.borrower)
+
+        self.urls = {
+            "index": reverse("items:index"),
+            "item": reverse("items:item", args=(self.item.pk,)),
+            "other_item": reverse("items:item", args=(self.other_item.pk,)),
+            "owner": reverse("items:user_profile", args=(self.owner.pk,)),
+            "borrower": reverse("items:user_profile", args=(self.borrower.pk,)),
+            "other": reverse("items:user_profile", args=(self.other.pk,)),
+        }
+
+    def outcomes(self):
+        return {
+            name: self.client.get(url)["X-Cache"] for name, url in self.urls.items()
+        }
+
+    def assertMissed(self, *names):
+        self.assertEqual(
+            self.outcomes(),
+            {name: "MISS" if name in names else "HIT" for name in self.urls},
+        )
+
+    def test_writes_invalidate_the_affected_pages(self):
+        self.assertMissed(*self.urls)
+        self.assertMissed()
+
+        lend_item(self.item.pk, self.borrower)
+        self.assertMissed("index", "item", "owner", "borrower")
+
+        return_item(self.item.pk, self.borrower)
+        self.assertMissed("index", "item", "owner", "borrower")
+
+        self.other_item.description = "Serrote de poda"
+        self.other_item.save()
+        self.assertMissed("index", "other_item", "other")
+
+    def test_pages_are_cached_per_user(self):
+        url = self.urls["index"]
+        # the loan button of the other user's item
+        button = f'action="{reverse("items:transaction", args=(self.other_item.pk,))}"'
+
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertContains(response, button)
+
+        client = self.client_class()
+        client.force_login(self.other)
+        response = client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotContains(response, button)
+
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        self.assertEqual(client.get(url)["X-Cache"], "HIT")
+
+    def test_counters_move(self):
+        url = self.urls["index"]
+
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(cache_stats()["index"], {"hits": 2, "misses": 1})
+
+        stdout = io.StringIO()
+        call_command("cache_stats", stdout=stdout)
+        self.assertIn("index", stdout.getvalue())
+
+
+@override_settings(STORAGE_CACHE_TIMEOUT=0)
+class ItemRowFragmentTest(TestCase):
+    """
+    Checks that the cached item rows of the listing re-render when the item
+    changes and never carry another user's buttons.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.item = create_item(self.owner)
+        self.url = reverse("items:index")
+        self.button = (
+            f'action="{reverse("items:transaction", args=(self.item.pk,))}"'
+        )
+        self.client.force_login(self.borrower)
+
+    def fragment_key(self):
+        self.item.refresh_from_db()
+        return make_template_fragment_key(
+            "item_row",
+            [self.item.pk, self.item.updated_at.isoformat(), self.item.owner_id],
+        )
+
+    def test_changed_rows_re_render(self):
+        self.assertContains(self.client.get(self.url), "Martelo")
+        self.assertIsNotNone(cache.get(self.fragment_key()))
+
+        # a queryset update keeps 'updated_at', so the cached row is served
+        Item.objects.filter(pk=self.item.pk).update(object="Serrote")
+        self.assertContains(self.client.get(self.url), "Martelo")
+
+        self.item.object = "Alicate"
+        self.item.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, "Alicate")
+        self.assertNotContains(response, "Martelo")
+
+        lend_item(self.item.pk, self.borrower)
+        self.assertContains(self.client.get(self.url), "Unavailable")
+
+    def test_buttons_are_rendered_per_user(self):
+        self.assertContains(self.client.get(self.url), self.button)
+
+        # the owner reads the row cached by the borrower's request
+        client = self.client_class()
+        client.force_login(self.owner)
+        response = client.get(self.url)
+        self.assertNotContains(response, self.button)
+
+        lend_item(self.item.pk, self.borrower)
+        self.assertContains(self.client.get(self.url), 'value="return"')
+        self.assertIsNotNone(cache.get(self.fragment_key()))
+        self.assertNotContains(client.get(self.url), 'value="return"')
+
+    def test_every_borrower_sees_the_return_button(self):
+        item = create_item(self.owner, object="Parafuso", quantity=5)
+        other = User.objects.create_user("other", password="password123")
+        lend_item(item.pk, self.borrower, quantity=2)
+        # the latest loan becomes the item's 'current_loan'
+        lend_item(item.pk, other, quantity=1)
+
+        other_client = self.client_class()
+        other_client.force_login(other)
+        owner_client = self.client_class()
+        owner_client.force_login(self.owner)
+
+        for url in (
+            self.url,
+            reverse("items:search"),
+            reverse("items:index_async"),
+            reverse("items:search_async"),
+        ):
+            for client in (self.client, other_client):
+                response = client.get(url, {"q": "parafuso"})
+                self.assertContains(response, 'value="return"', count=1)
+
+            response = owner_client.get(url, {"q": "parafuso"})
+            self.assertNotContains(response, 'value="return"')
+
+
+class ItemEventsTest(TestCase):
+    """
+    Checks the server-sent events feed of the item availability.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.item = create_item(self.owner)
+
+    async def test_feed_pushes_availability_changes(self):
+        try:
+            await self.check_feed()
+        finally:
+            # ends the polling task started by the feed
+            broadcaster = events.get_broadcaster()
+            task = broadcaster.task
+            broadcaster.subscribers.clear()
+            broadcaster.wake()
+            await task
+
+    async def check_feed(self):
+        await self.async_client.aforce_login(self.borrower)
+
+        response = await self.async_client.get(reverse("items:index_async"))
+        self.assertContains(response, "new EventSource")
+
+        response = await self.async_client.get(reverse("items:item_events"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = aiter(response.streaming_content)
+        self.assertEqual(await anext(content), b"retry: 3000\n\n")
+
+        # a reconnecting browser first gets the changes it missed
+        response = await self.async_client.get(
+            reverse("items:item_events"), headers={"Last-Event-ID": "0"}
+        )
+        other = aiter(response.streaming_content)
+        await anext(other)
+        self.assertIn(f'"item_id": {self.item.pk}', (await anext(other)).decode())
+
+        # both connections get the change: the second one did not replace the first
+        await sync_to_async(lend_item)(self.item.pk, self.borrower)
+        events.wake()
+
+        for stream in (content, other):
+            message = (await asyncio.wait_for(anext(stream), 5)).decode()
+            self.assertIn("event: availability", message)
+            self.assertIn(
+                f'"item_id": {self.item.pk}, "is_available": false, "quantity": 0',
+                message,
+            )
+
+    def test_feed_is_not_served_under_wsgi(self):
+        self.client.force_login(self.borrower)
+
+        response = self.client.get(reverse("items:index"))
+        self.assertNotContains(response, "EventSource")
+
+        # 204 stops EventSource instead of pinning a worker thread
+        response = self.client.get(reverse("items:item_events"))
+        self.assertEqual(response.status_code, 204)
+
+
+class JsonApiTest(TestCase):
+    """
+    Checks the token authentication, sparse fieldsets, cursors and ETags of the
+    JSON API.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.items = [create_item(self.owner, object=f"Item {n}") for n in range(3)]
+        _, key = create_token(self.owner, "scanner")
+        self.headers = {"Authorization": f"Token {key}"}
+
+    def test_requires_a_valid_token(self):
+        response = self.client.get(reverse("items:api_items"))
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.get(
+            reverse("items:api_items"), headers={"Authorization": "Token wrong"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_listing_pages_with_sparse_fields(self):
+        url = reverse("items:api_items")
+
+        # token lookup + page, without touching the session
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                url, {"fields": "object", "limit": 2}, headers=self.headers
+            )
+
+        body = response.json()
+        self.assertEqual(
+            body["results"],
+            [
+                {"item_id": self.items[2].pk, "object": "Item 2"},
+                {"item_id": self.items[1].pk, "object": "Item 1"},
+            ],
+        )
+
+        response = self.client.get(body["next"], headers=self.headers)
+        self.assertEqual(
+            [item["item_id"] for item in response.json()["results"]], [self.items[0].pk]
+        )
+
+        response = self.client.get(url, {"fields": "password"}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_transactions_include_the_due_date(self):
+        borrower = User.objects.create_user("borrower", password="password123")
+        due_date = timezone.now() + timedelta(days=7)
+        loan = lend_item(self.items[0].pk, borrower, due_date=due_date)
+
+        for url in (
+            reverse("items:api_transactions"),
+            reverse("items:api_user_transactions", args=(borrower.pk,)),
+        ):
+            response = self.client.get(url, headers=self.headers)
+            [row] = response.json()["results"]
+            self.assertEqual(row["id"], loan.pk)
+            self.assertEqual(
+                datetime.fromisoformat(row["due_date"].replace("Z", "+00:00")),
+                due_date.replace(microsecond=due_date.microsecond // 1000 * 1000),
+            )
+
+            response = self.client.get(
+                url, {"fields": "due_date"}, headers=self.headers
+            )
+            self.assertEqual(set(response.json()["results"][0]), {"id", "due_date"})
+
+    def test_etag_returns_not_modified(self):
+        url = reverse("items:api_item", args=(self.items[0].pk,))
+        etag = self.client.get(url, headers=self.headers)["ETag"]
+
+        response = self.client.get(url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.items[0].quantity = 5
+        self.items[0].save()
+        response = self.client.get(url, headers={**self.headers, "If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class ExportTest(TestCase):
+    """
+    Checks the streamed CSV and NDJSON exports.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.hammer = create_item(self.owner)
+        self.drill = create_item(
+            self.owner, object="Furadeira", description="Furadeira"
+        )
+        lend_item(self.hammer.pk, self.borrower)
+        self.client.force_login(self.owner)
+
+    def test_items_csv(self):
+        response = self.client.get(reverse("items:export_items", args=("csv",)))
+        self.assertTrue(response.streaming)
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("item_id,object,"))
+        self.assertIn("borrower", lines[1])
+
+    def test_transactions_ndjson_with_search_filter(self):
+        response = self.client.get(
+            reverse("items:export_transactions", args=("ndjson",)), {"q": "martelo"}
+        )
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual([row["item_id"] for row in rows], [self.hammer.pk])
+        self.assertEqual(rows[0]["to_username"], "borrower")
+
+        response = self.client.get(reverse("items:export_items", args=("xml",)))
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTest(TestCase):
+    """
+    Checks the full-text search: prefix matching, index sync on save and
+    delete, the rebuild command and the numeric exact id match.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.hammer = create_item(self.owner)
+        self.saw = create_item(
+            self.owner, object="Serrote", description="Serrote de poda"
+        )
+
+    def test_terms_match_as_prefixes_of_both_columns(self):
+        self.assertEqual(search_item_ids("mart"), [self.hammer.pk])
+        self.assertEqual(search_item_ids("poda"), [self.saw.pk])
+        # every term must match
+        self.assertEqual(search_item_ids("serrote poda"), [self.saw.pk])
+        self.assertEqual(search_item_ids("serrote aço"), [])
+        # FTS5 syntax typed by the user is not interpreted
+        self.assertEqual(search_item_ids('martelo OR "serrote'), [])
+        self.assertEqual(search_item_ids("*"), [])
+
+    def test_index_follows_item_saves_and_deletes(self):
+        self.hammer.object = "Marreta"
+        self.hammer.description = "Marreta de borracha"
+        self.hammer.save()
+        self.assertEqual(search_item_ids("martelo"), [])
+        self.assertEqual(search_item_ids("borracha"), [self.hammer.pk])
+
+        self.saw.delete()
+        self.assertEqual(search_item_ids("serrote"), [])
+
+    def test_rebuild_indexes_items_written_without_signals(self):
+        item = Item.objects.bulk_create(
+            [
+                Item(
+                    object="Alicate",
+                    description="Alicate universal",
+                    storage_location="Storage 1",
+                    is_available=True,
+                    owner=self.owner,
+                )
+            ]
+        )[0]
+        self.assertEqual(search_item_ids("alicate"), [])
+
+        stdout = io.StringIO()
+        call_command("rebuild_search_index", stdout=stdout)
+        self.assertIn("Indexed 3 items", stdout.getvalue())
+        self.assertEqual(search_item_ids("alicate"), [item.pk])
+
+    def test_numeric_queries(self):
+        self.assertEqual(search_item_ids(str(self.saw.pk))[0], self.saw.pk)
+
+        # not decimal digits, or beyond the range of the primary key
+        self.client.force_login(self.owner)
+        for query in ("²", "9" * 30):
+            self.assertEqual(search_item_ids(query), [])
+            response = self.client.get(reverse("items:search"), {"q": query})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                Transaction.objects.filter(search_filter(query, "item_id")).count(), 0
+            )
+
+
+class ImportItemsCommandTest(TestCase):
+    """
+    Checks that import_items validates rows with ItemForm and skips the invalid ones.
+    """
+
+    def test_import_reports_invalid_rows(self):
+        owner = User.objects.create_user("owner", password="password123")
+        User.objects.create_user("other", password="password123")
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write(
+                "object,description,quantity,storage_location,is_available,owner\n"
+                "Martelo,Martelo de aço,2,Storage 1,true,\n"
+                "Serrote,Serrote,3,Warehouse,false,other\n"
+                "Alicate,Alicate,11,Storage 1,true,\n"
+                "Trena,Trena,1,Garage,true,\n"
+                "Chave,Chave,1,Storage 2,true,nobody\n"
+            )
+        self.addCleanup(os.remove, file.name)
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command(
+            "import_items",
+            file.name,
+            owner="owner",
+            batch_size=1,
+            stdout=stdout,
+            stderr=stderr,
+        )
+
+        items = Item.objects.order_by("item_id")
+        self.assertEqual(
+            list(items.values_list("object", "owner__username")),
+            [("Martelo", "owner"), ("Serrote", "other")],
+        )
+        self.assertFalse(Item.objects.get(object="Serrote").is_available)
+        self.assertIn("Imported 2 of 5 rows", stdout.getvalue())
+
+        errors = stderr.getvalue().splitlines()
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(errors[0].startswith("line 4: quantity:"))
+        self.assertTrue(errors[1].startswith("line 5: storage_location:"))
+        self.assertTrue(errors[2].startswith("line 6: owner:"))
+
+        self.assertEqual(
+            search_item_ids("martelo"), [Item.objects.get(object="Martelo").pk]
+        )
+        self.assertEqual(owner.item_set.count(), 1)
+
+
+class SeedDataCommandTest(TestCase):
+    """
+    Checks that seed_data keeps the stock and 'current_loan' consistent with the
+    histories.
+    """
+
+    def test_seeded_items_match_their_open_loans(self):
+        call_command(
+            "seed_data",
+            users=20,
+            items_per_user=5,
+            loans_per_item=3,
+            batch_size=30,
+            workers=0,
+            stdout=io.StringIO(),
+        )
+
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Item.objects.count(), 100)
+        self.assertTrue(
+            Transaction.objects.filter(type=Transaction.DEVOLUTION).exists()
+        )
+        self.assertTrue(Transaction.objects.open_loans().exists())
+        self.assertTrue(User.objects.first().check_password("password123"))
+
+        for item in Item.objects.all():
+            open_loans = Transaction.objects.open_loans().filter(item=item)
+            self.assertEqual(item.current_loan, open_loans.order_by("-id").first())
+            self.assertEqual(item.is_available, item.quantity > 0)
+            self.assertGreaterEqual(item.quantity, 0)
+
+    def test_clear_after_an_overdue_scan(self):
+        owner = User.objects.create_user("owner", password="password123")
+        borrower = User.objects.create_user("borrower", password="password123")
+        item = create_item(owner)
+        lend_item(item.pk, borrower, due_date=timezone.now() - timedelta(days=1))
+        overdue.scan()
+        self.assertTrue(OverdueLoan.objects.exists())
+
+        call_command(
+            "seed_data",
+            users=2,
+            items_per_user=1,
+            clear=True,
+            workers=0,
+            stdout=io.StringIO(),
+        )
+
+        # the raw DELETEs left no row pointing to a deleted item
+        connection.check_constraints()
+        self.assertFalse(OverdueLoan.objects.exists())
+        self.assertEqual(Item.objects.count(), 2)
+
+    def test_invalid_options(self):
+        for options in ({"loans_per_item": -1}, {"workers": -2}):
+            with self.subTest(options=options), self.assertRaises(CommandError):
+                call_command("seed_data", users=1, stdout=io.StringIO(), **options)
+
+        self.assertFalse(User.objects.exists())
+
+
+class BenchViewsCommandTest(TestCase):
+    """
+    Checks the options, measures and regression report of bench_views.
+    """
+
+    def test_invalid_options(self):
+        for options in ({"sizes": "10,abc"}, {"sizes": "10", "requests": 1}):
+            with self.assertRaises(CommandError):
+                call_command("bench_views", stdout=io.StringIO(), **options)
+
+    def test_measure(self):
+        user = User.objects.create_user("owner", password="password123")
+        create_item(user)
+        self.client.force_login(user)
+        command = BenchViewsCommand(stdout=io.StringIO())
+
+        measures = command.measure(
+            lambda index: self.client.get(reverse("items:index")), 3
+        )
+
+        self.assertEqual(measures["errors"], 0)
+        self.assertGreater(measures["queries"], 0)
+        self.assertLessEqual(measures["p50_ms"], measures["p95_ms"])
+
+    def test_compare_flags_regressions(self):
+        def result(view, p50_ms, queries):
+            return {
+                "size": 10,
+                "view": view,
+                "p50_ms": p50_ms,
+                "p95_ms": p50_ms,
+                "peak_kb": 100,
+                "queries": queries,
+            }
+
+        previous = {
+            "commit": "abc1234",
+            "results": [result("index", 10, 5), result("item", 10, 3)],
+        }
+        current = {
+            "results": [
+                result("index", 10.5, 5),
+                result("item", 10, 4),
+                result("search", 10, 4),
+            ]
+        }
+        stdout = io.StringIO()
+        BenchViewsCommand(stdout=stdout, force_color=True).compare(
+            previous, current, 20
+        )
+
+        lines = stdout.getvalue().splitlines()
+        self.assertIn("abc1234", lines[1])
+        # the 5% slowdown is within the threshold, the added query is not
+        self.assertNotIn("\x1b[", lines[2])
+        self.assertIn("p50_ms +5%", lines[2])
+        self.assertIn("\x1b[", lines[3])
+        self.assertIn("queries +1", lines[3])
+        # views missing from the previous run are not compared
+        self.assertEqual(len(lines), 4)
+
+
+@override_settings(STORAGE_SQL_SAMPLE_RATE=1, STORAGE_SQL_REPEATED_THRESHOLD=2)
+class QueryInstrumentationMiddlewareTest(TestCase):
+    """
+    Checks the Server-Timing header and the repeated SQL detection.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.client.force_login(self.owner)
+
+    def test_reports_queries_and_repeated_sql(self):
+        items = [create_item(self.owner) for _ in range(3)]
+
+        with self.assertLogs("storage.sql", "INFO") as logs:
+            response = self.client.get(reverse("items:index"))
+
+        self.assertIn('db;desc="', response["Server-Timing"])
+        self.assertEqual(json.loads(logs.records[0].getMessage())["repeated"], 0)
+
+        with self.assertLogs("storage.sql", "WARNING") as logs:
+            for item in items:
+                self.client.get(reverse("items:item", args=(item.pk,)))
+
+            # one query per item: the same SQL three times in one request
+            with override_settings(ROOT_URLCONF="storage.tests"):
+                self.client.get("/n-plus-one/")
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["repeated"], 2)
+        self.assertEqual(line["top_repeated"][0]["times"], 3)
+
+    async def test_reports_async_requests(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryInstrumentationMiddleware(view)))
+        await self.async_client.aforce_login(self.owner)
+
+        with self.assertLogs("storage.sql", "INFO") as logs:
+            response = await self.async_client.get(reverse("items:index_async"))
+
+        # the async ORM queries of the view are counted
+        self.assertIn('db;desc="', response["Server-Timing"])
+        self.assertGreater(json.loads(logs.records[0].getMessage())["queries"], 0)
+
+
+def n_plus_one(request):
+    for item in Item.objects.all():
+        Item.objects.filter(pk=item.pk).exists()
+    return HttpResponse()
+
+
+urlpatterns = [path("n-plus-one/", n_plus_one)]
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """
+    Checks that only staff tokens profile a request and that profiles are listed.
+    """
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(STORAGE_PROFILE_DIR=directory.name))
+        self.directory = directory.name
+
+        self.staff = User.objects.create_user(
+            "staff", password="password123", is_staff=True
+        )
+        self.other = User.objects.create_user("other", password="password123")
+
+    def test_profiles_requests_with_a_staff_token(self):
+        token = make_token(self.staff)
+
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("items:index"), {"_profile": token})
+        self.assertNotIn("X-Storage-Profile", response)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse("items:index"), {"_profile": token + "x"}
+        )
+        self.assertNotIn("X-Storage-Profile", response)
+
+        response = self.client.get(
+            reverse("items:index"), HTTP_X_STORAGE_PROFILE=token
+        )
+        name = response["X-Storage-Profile"]
+        self.assertEqual(
+            sorted(os.listdir(self.directory)), [f"{name}.prof", f"{name}.txt"]
+        )
+
+        response = self.client.get(reverse("items:profiles"))
+        self.assertContains(response, name)
+
+        response = self.client.get(
+            reverse("items:profile_download", args=(name, "txt"))
+        )
+        self.assertIn(b"Memory peak", b"".join(response.streaming_content))
+
+        self.client.force_login(self.other)
+        response = self.client.get(reverse("items:profiles"))
+        self.assertEqual(response.status_code, 302)
+
+    async def test_profiles_async_requests_in_the_event_loop(self):
+        async def view(request):
+            return HttpResponse()
+
+        # an async chain stays async: no sync_to_async thread per request
+        self.assertTrue(iscoroutinefunction(ProfilingMiddleware(view)))
+
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse("items:index_async"))
+        self.assertNotIn("X-Storage-Profile", response)
+
+        response = await self.async_client.get(
+            reverse("items:index_async"), {"_profile": make_token(self.staff)}
+        )
+        name = response["X-Storage-Profile"]
+        self.assertIn(f"{name}.prof", os.listdir(self.directory))
+
+
+@override_settings(
+    **settings.STORAGE_SESSION_PROFILES["signed_cookies"], STORAGE_CACHE_TIMEOUT=0
+)
+class SessionProfileTest(TestCase):
+    """
+    Checks that the signed cookie profile serves logged requests without the
+    session and user tables, and still sees password changes.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("user", password="password123")
+        self.client.force_login(self.user)
+
+    def test_logged_requests_skip_session_and_user_queries(self):
+        url = reverse("items:user_profile", args=(self.user.pk,))
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"], self.user)
+        tables = [query["sql"].split(" FROM ")[1].split()[0] for query in queries]
+        self.assertNotIn('"django_session"', tables)
+        # only the profile's own User lookup
+        self.assertEqual(tables.count('"auth_user"'), 1)
+
+        # a new password invalidates the cached user and the session hash
+        self.user.set_password("another-password")
+        self.user.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+
+class LoanServiceTest(TestCase):
+    """
+    Checks the state changes made by the loan and devolution services.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.item = create_item(self.owner)
+
+    def test_loan_and_devolution(self):
+        loan = lend_item(self.item.pk, self.borrower)
+        self.item.refresh_from_db()
+        self.assertFalse(self.item.is_available)
+        self.assertEqual(self.item.current_loan, loan)
+        self.assertEqual(loan.from_user, self.owner)
+
+        devolution = return_item(self.item.pk, self.borrower)
+        self.item.refresh_from_db()
+        self.assertTrue(self.item.is_available)
+        self.assertIsNone(self.item.current_loan)
+        self.assertEqual(devolution.type, Transaction.DEVOLUTION)
+        self.assertEqual(devolution.to_user, self.owner)
+
+    def test_only_the_borrower_can_return(self):
+        lend_item(self.item.pk, self.borrower)
+
+        with self.assertRaises(NotBorrower):
+            return_item(self.item.pk, self.owner)
+
+    def test_repeated_devolution_fails(self):
+        lend_item(self.item.pk, self.borrower)
+        return_item(self.item.pk, self.borrower)
+
+        with self.assertRaises(NotBorrower):
+            return_item(self.item.pk, self.borrower)
+
+        self.assertEqual(
+            Transaction.objects.filter(type=Transaction.DEVOLUTION).count(), 1
+        )
+
+    def test_partial_quantity_loans(self):
+        item = create_item(self.owner, object="Parafuso", quantity=5)
+        other = User.objects.create_user("other", password="password123")
+
+        first = lend_item(item.pk, self.borrower, quantity=3)
+        second = lend_item(item.pk, other, quantity=2)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 0)
+        self.assertFalse(item.is_available)
+        self.assertEqual(item.current_loan, second)
+
+        with self.assertRaises(ItemUnavailable):
+            lend_item(item.pk, self.borrower)
+
+        return_item(item.pk, other)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 2)
+        self.assertTrue(item.is_available)
+        self.assertEqual(item.current_loan, first)
+
+        with self.assertRaises(ItemUnavailable):
+            lend_item(item.pk, other, quantity=3)
+
+        devolution = return_item(item.pk, self.borrower)
+        item.refresh_from_db()
+        self.assertEqual(devolution.quantity, 3)
+        self.assertEqual(item.quantity, 5)
+        self.assertIsNone(item.current_loan)
+        self.assertFalse(Transaction.objects.open_loans().exists())
+
+    def test_fully_lent_item_can_be_edited(self):
+        lend_item(self.item.pk, self.borrower)
+        self.client.force_login(self.owner)
+
+        response = self.client.post(
+            reverse("items:update", args=(self.item.pk,)),
+            {
+                "object": "Martelo de borracha",
+                "quantity": 0,
+                "storage_location": "Warehouse",
+                "description": "",
+            },
+        )
+
+        self.assertRedirects(response, reverse("items:update", args=(self.item.pk,)))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.object, "Martelo de borracha")
+        self.assertEqual(self.item.quantity, 0)
+
+        form = ItemForm(
+            {"object": "Martelo", "quantity": 0, "storage_location": "Storage 1"}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("quantity", form.errors)
+
+        response = self.client.post(
+            reverse("items:update", args=(self.item.pk,)),
+            {
+                "object": "Martelo",
+                "quantity": 0,
+                "storage_location": "Warehouse",
+                "is_available": "on",
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response.context["form"],
+            "is_available",
+            "Item cannot be available if the quantity is zero.",
+        )
+        self.item.refresh_from_db()
+        self.assertFalse(self.item.is_available)
+
+    def test_bulk_loan_and_devolution(self):
+        unavailable = create_item(self.owner, is_available=False)
+        stock = create_item(self.owner, quantity=2)
+        item_ids = [self.item.pk, stock.pk, unavailable.pk, 999]
+
+        # validation read, savepoint, claim, bulk insert, bulk update, loan
+        # intervals, user stats update, items' new state, summary update, release
+        with self.assertNumQueries(10):
+            results = lend_items(item_ids, self.borrower)
+
+        self.assertEqual([result.ok for result in results], [True, True, False, False])
+        self.item.refresh_from_db()
+        stock.refresh_from_db()
+        self.assertFalse(self.item.is_available)
+        self.assertTrue(stock.is_available)
+        self.assertEqual(stock.quantity, 1)
+        self.assertEqual(stock.current_loan.to_user, self.borrower)
+
+        results = return_items(item_ids, self.borrower)
+
+        self.assertEqual([result.ok for result in results], [True, True, False, False])
+        self.item.refresh_from_db()
+        stock.refresh_from_db()
+        self.assertTrue(self.item.is_available)
+        self.assertEqual(stock.quantity, 2)
+        self.assertIsNone(stock.current_loan)
+        self.assertFalse(Transaction.objects.open_loans().exists())
+        self.assertEqual(
+            Transaction.objects.filter(type=Transaction.DEVOLUTION).count(), 2
+        )
+
+    def test_bulk_form_rejects_non_decimal_and_huge_ids(self):
+        form = BulkTransactionForm({"action": "loan", "item_ids": "3, 2 3 4"})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data["item_ids"], [3, 2, 4])
+
+        form = BulkTransactionForm({"action": "loan", "item_ids": f"1 ² {'9' * 30}"})
+        self.assertFalse(form.is_valid())
+        self.assertIn("²", str(form.errors))
+
+
+class UserStatsTest(TestCase):
+    """
+    Checks that the write paths keep the per-user counters exact.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+
+    def test_counters_follow_items_loans_and_devolutions(self):
+        items = [create_item(self.owner, quantity=3) for _ in range(4)]
+
+        lend_item(items[0].pk, self.borrower)
+        lend_item(items[0].pk, self.borrower)
+        return_item(items[0].pk, self.borrower)
+        lend_items([item.pk for item in items[1:]], self.borrower)
+        return_items([items[1].pk, items[2].pk], self.borrower)
+        items[3].delete()
+
+        owner = stats.get_stats(self.owner.pk)
+        self.assertEqual(owner.items_owned, 3)
+        self.assertEqual(owner.active_loans_out, 2)
+        self.assertEqual(owner.transactions_total, 8)
+        self.assertEqual(stats.get_stats(self.borrower.pk).active_loans_in, 2)
+        self.assertEqual(stats.verify(), [])
+
+        # writes that bypass the services drift until the rebuild
+        Transaction.objects.filter(type=Transaction.DEVOLUTION).delete()
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_user_stats", check=True, stderr=io.StringIO())
+
+        call_command("rebuild_user_stats", stdout=io.StringIO())
+        self.assertEqual(stats.get_stats(self.owner.pk).transactions_total, 5)
+
+    def test_profile_pages_follow_the_rows_when_the_counter_drifts(self):
+        cache.clear()
+        item = create_item(self.owner, quantity=20)
+        for _ in range(18):
+            lend_item(item.pk, self.borrower)
+
+        # two pages by the counter, one by the rows
+        Transaction.objects.filter(pk__in=Transaction.objects.values("pk")[:2]).delete()
+        self.assertEqual(stats.get_stats(self.borrower.pk).transactions_total, 18)
+
+        self.client.force_login(self.borrower)
+        for name in ("items:user_profile", "items:user_profile_async"):
+            url = reverse(name, args=(self.borrower.pk,))
+            with self.subTest(view=name):
+                page_obj = self.client.get(url, {"page": 2}).context["page_obj"]
+                self.assertEqual(page_obj.paginator.num_pages, 1)
+                self.assertEqual(page_obj.number, 1)
+                self.assertEqual(len(page_obj), 16)
+
+
+class InventorySummaryTest(TestCase):
+    """
+    Checks that the summary follows the items and backs the dashboard.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+
+    def test_summary_follows_item_changes_and_loans(self):
+        items = [create_item(self.owner, quantity=2) for _ in range(3)]
+        create_item(self.owner, object="Serrote", storage_location="Warehouse")
+
+        lend_item(items[0].pk, self.borrower, quantity=2)
+        lend_items([items[1].pk, items[2].pk], self.borrower)
+        return_items([items[1].pk], self.borrower)
+        items[2].refresh_from_db()
+        items[2].storage_location = "Warehouse"
+        items[2].save()
+        items[1].delete()
+
+        self.assertEqual(summary.drift(), [])
+
+        self.client.force_login(self.owner)
+        # session, user and the summary rows
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("items:dashboard"))
+
+        self.assertEqual(response.context["total_items"], 3)
+        self.assertEqual(response.context["total_quantity"], 2)
+        self.assertEqual(
+            [(row.key, row.items) for row in response.context["availability"]],
+            [("available", 2), ("unavailable", 1)],
+        )
+
+        # queryset updates bypass the signals until the summary is rebuilt
+        Item.objects.update(quantity=5)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_inventory_summary", check=True, stderr=io.StringIO())
+
+        call_command(
+            "rebuild_inventory_summary", stdout=io.StringIO(), stderr=io.StringIO()
+        )
+        self.assertEqual(summary.drift(), [])
+
+
+class TransactionArchiveTest(TestCase):
+    """
+    Checks the archiving of old loan cycles and the chained listings.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.client.force_login(self.borrower)
+
+        item = create_item(self.owner)
+        for _ in range(30):
+            lend_item(item.pk, self.borrower)
+            return_item(item.pk, self.borrower)
+        lend_item(item.pk, self.borrower)
+
+        # the first 20 cycles were closed long ago
+        old = Transaction.objects.order_by("id").values_list("id", flat=True)[39]
+        Transaction.objects.filter(id__lte=old).update(
+            returned_date=timezone.now() - timedelta(days=100)
+        )
+        call_command(
+            "archive_transactions", days=30, batch_size=7, stdout=io.StringIO()
+        )
+
+    def test_closed_cycles_move_and_counters_hold(self):
+        self.assertEqual(TransactionArchive.objects.count(), 40)
+        self.assertEqual(Transaction.objects.count(), 21)
+        self.assertEqual(Transaction.objects.open_loans().count(), 1)
+        self.assertEqual(stats.verify(), [])
+        self.assertEqual(stats.get_stats(self.borrower.pk).transactions_total, 61)
+
+    def test_listings_read_the_archive_past_the_hot_rows(self):
+        url = reverse("items:transactions")
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(any("transactionarchive" in q["sql"] for q in queries))
+        self.assertEqual(response.context["page_obj"].paginator.count, 61)
+
+        ids = []
+        for page in range(1, 5):
+            response = self.client.get(url, {"page": page})
+            ids += [transaction.id for transaction in response.context["page_obj"]]
+
+        hot = list(Transaction.objects.values_list("id", flat=True))
+        archived = list(TransactionArchive.objects.values_list("id", flat=True))
+        self.assertEqual(sorted(ids), sorted(hot + archived))
+
+        for name in ("items:user_profile", "items:user_profile_async"):
+            response = self.client.get(
+                reverse(name, args=(self.borrower.pk,)), {"page": 4}
+            )
+            self.assertEqual(len(response.context["page_obj"]), 10)
+
+        with override_settings(STORAGE_PAGINATION="keyset"):
+            keyset_ids, cursor = [], ""
+            while cursor is not None:
+                page_obj = self.client.get(url, {"cursor": cursor}).context["page_obj"]
+                keyset_ids += [transaction.id for transaction in page_obj]
+                cursor = page_obj.next_cursor
+
+        self.assertEqual(keyset_ids, sorted(ids, reverse=True))
+
+    def test_archive_cache_expires(self):
+        queryset = TransactionArchive.objects.involving(self.borrower.pk)
+        self.assertEqual(archive.archived_count(queryset), 40)
+        self.assertIsNotNone(archive.archived_max(queryset, "id"))
+
+        # a cleanup that bypasses 'archive_transactions' (no version bump)
+        TransactionArchive.objects.all().delete()
+        self.assertEqual(archive.archived_count(queryset), 40)
+
+        with override_settings(STORAGE_ARCHIVE_CACHE_TIMEOUT=0):
+            cache.clear()
+            self.assertEqual(archive.archived_count(queryset), 0)
+            self.assertIsNone(archive.archived_max(queryset, "id"))
+            self.assertIsNone(cache.get(archive._cache_key(queryset, "count")))
+
+    async def test_async_archive_cache(self):
+        queryset = TransactionArchive.objects.involving(self.borrower.pk)
+        self.assertEqual(await archive.aarchived_count(queryset), 40)
+        self.assertEqual(
+            await archive.aarchived_max(queryset, "id"),
+            await sync_to_async(archive.archived_max)(queryset, "id"),
+        )
+        self.assertEqual(
+            await cache.aget(
+                await sync_to_async(archive._cache_key)(queryset, "count")
+            ),
+            40,
+        )
+
+    def test_old_open_loan_sorts_among_archived_rows(self):
+        now = timezone.now()
+        for model in (Transaction, TransactionArchive):
+            for pk in model.objects.values_list("id", flat=True):
+                model.objects.filter(pk=pk).update(
+                    loan_date=now - timedelta(days=100 - pk)
+                )
+
+        # still open, so hot, but older than most of the archive
+        loan = lend_item(create_item(self.owner).pk, self.borrower)
+        Transaction.objects.filter(pk=loan.pk).update(
+            loan_date=now - timedelta(days=80)
+        )
+        cache.clear()
+
+        expected = [
+            pk
+            for _, pk in sorted(
+                [
+                    *Transaction.objects.values_list("loan_date", "id"),
+                    *TransactionArchive.objects.values_list("loan_date", "id"),
+                ],
+                reverse=True,
+            )
+        ]
+
+        for name in ("items:user_profile", "items:user_profile_async"):
+            ids = []
+            for page in range(1, 5):
+                response = self.client.get(
+                    reverse(name, args=(self.borrower.pk,)), {"page": page}
+                )
+                ids += [transaction.id for transaction in response.context["page_obj"]]
+
+            self.assertEqual(ids, expected)
+
+        listing = ChainedListing(
+            Transaction.objects.order_by("-loan_date"),
+            TransactionArchive.objects.order_by("-loan_date"),
+        )
+        for start, stop in ((0, 62), (20, 23), (21, 41), (40, 43), (42, 62)):
+            self.assertEqual(
+                [transaction.id for transaction in listing[start:stop]],
+                expected[start:stop],
+            )
+
+
+class CustodyTest(TestCase):
+    """
+    Checks the loan intervals and the custody lookups built on them.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.other = User.objects.create_user("other", password="password123")
+        self.item = create_item(self.owner)
+
+        self.times = [timezone.now()]
+        for user in (self.borrower, self.other):
+            lend_item(self.item.pk, user)
+            self.times.append(timezone.now())
+            return_items([self.item.pk], user)
+            self.times.append(timezone.now())
+        lend_items([self.item.pk], self.borrower)
+        self.times.append(timezone.now())
+
+    def holders(self, at, until=None, **lookup):
+        return [interval.holder_id for interval in custody.custody(at, until, **lookup)]
+
+    def test_point_and_range_lookups(self):
+        at = self.times
+        self.assertEqual(self.holders(at[0], item_id=self.item.pk), [])
+        self.assertEqual(self.holders(at[1], item_id=self.item.pk), [self.borrower.pk])
+        self.assertEqual(self.holders(at[2], item_id=self.item.pk), [])
+        self.assertEqual(self.holders(at[3], item_id=self.item.pk), [self.other.pk])
+        self.assertEqual(self.holders(at[5], item_id=self.item.pk), [self.borrower.pk])
+        self.assertEqual(
+            self.holders(at[0], at[4], user_id=self.borrower.pk), [self.borrower.pk]
+        )
+        self.assertEqual(len(self.holders(at[0], item_id=self.item.pk, until=at[5])), 3)
+
+        # the rebuild recreates the same intervals from the loans
+        before = list(LoanInterval.objects.values_list("loan_id", "start", "end"))
+        call_command("rebuild_loan_intervals", stdout=io.StringIO())
+        self.assertEqual(
+            list(LoanInterval.objects.values_list("loan_id", "start", "end")), before
+        )
+
+    def test_custody_page_and_api(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(
+            reverse("items:custody"),
+            {
+                "item": self.item.pk,
+                # the form reads local times
+                "at": timezone.localtime(self.times[3]).strftime(
+                    "%Y-%m-%d %H:%M:%S.%f"
+                ),
+            },
+        )
+        self.assertEqual(
+            [interval.holder for interval in response.context["intervals"]],
+            [self.other],
+        )
+
+        response = self.client.get(reverse("items:custody"), {"at": "2025-01-01 10:00"})
+        self.assertTrue(response.context["form"].non_field_errors())
+
+        _, key = create_token(self.owner, "audit")
+        response = self.client.get(
+            reverse("items:api_custody"),
+            {
+                "user": self.borrower.pk,
+                "at": self.times[0].isoformat(),
+                "until": self.times[5].isoformat(),
+            },
+            headers={"Authorization": f"Token {key}"},
+        )
+        self.assertEqual(
+            [row["holder_id"] for row in response.json()["results"]],
+            [self.borrower.pk, self.borrower.pk],
+        )
+
+        response = self.client.get(
+            reverse("items:api_custody"),
+            {"item": self.item.pk, "at": "yesterday"},
+            headers={"Authorization": f"Token {key}"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+        for value in ("²", "9" * 30):
+            response = self.client.get(
+                reverse("items:api_custody"),
+                {"item": value, "at": self.times[0].isoformat()},
+                headers={"Authorization": f"Token {key}"},
+            )
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.get(
+                reverse("items:custody"), {"item": value, "at": "2025-01-01 10:00"}
+            )
+            self.assertTrue(response.context["form"].errors)
+
+
+class OverdueTest(TestCase):
+    """
+    Checks the due dates, the overdue scanner and the overdue page.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="password123")
+        self.borrower = User.objects.create_user("borrower", password="password123")
+        self.items = [create_item(self.owner) for _ in range(3)]
+
+    def test_scanner_records_and_resolves_overdue_loans(self):
+        late = timezone.now() - timedelta(days=1)
+        lend_item(self.items[0].pk, self.borrower, due_date=late)
+        lend_item(self.items[1].pk, self.borrower, due_date=late)
+        on_time = lend_item(self.items[2].pk, self.borrower)
+        self.assertEqual(on_time.due_date, on_time.loan_date + timedelta(days=14))
+
+        # the lookup is served by the partial index of the active loans
+        with connection.cursor() as cursor:
+            sql, params = overdue.overdue_loans().query.sql_with_params()
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            self.assertIn("transaction_open_due", str(cursor.fetchall()))
+
+        out = io.StringIO()
+        call_command("scan_overdue", batch_size=1, stdout=out)
+        self.assertIn("2 overdue loans (2 new), 0 resolved", out.getvalue())
+
+        return_item(self.items[0].pk, self.borrower)
+        self.assertEqual(overdue.scan(), {"overdue": 1, "new": 0, "resolved": 1})
+        self.assertEqual(
+            list(
+                OverdueLoan.objects.filter(resolved_date__isnull=True).values_list(
+                    "item_id", flat=True
+                )
+            ),
+            [self.items[1].pk],
+        )
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("items:overdue"))
+        self.assertEqual(
+            [loan.item_id for loan in response.context["page_obj"]], [self.items[1].pk]
+        )
+
+
+class JobsTest(TestCase):
+    """
+    Checks the background jobs: queuing from the web, claiming, running,
+    retrying with backoff and the status pages. The jobs run in the test
+    thread instead of a worker pool.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.override = override_settings(STORAGE_JOB_DIR=self.directory.name)
+        self.override.enable()
+        self.user = User.objects.create_user("user", password="password123")
+        create_item(self.user)
+        create_item(self.user, object="Alicate")
+
+    def tearDown(self):
+        self.override.disable()
+        self.directory.cleanup()
+
+    def test_export_job_runs_in_the_background(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("items:jobs"),
+            {
+                "action": "export",
+                "export-resource": "items",
+                "export-export_format": "csv",
+                "export-search_value": "",
+            },
+        )
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse("items:job_detail", args=[job.pk]))
+        self.assertEqual(job.status, Job.QUEUED)
+
+        # a second claim finds nothing: the job is already running
+        self.assertEqual(jobs.claim(5), [job])
+        self.assertEqual(jobs.claim(5), [])
+
+        jobs.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress), (Job.DONE, 100))
+        self.assertEqual(job.result["rows"], 2)
+
+        response = self.client.get(reverse("items:job_download", args=[job.pk]))
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn("Alicate", content)
+
+        # staff only jobs
+        response = self.client.post(
+            reverse("items:jobs"),
+            {"action": "command", "command-command": "scan_overdue"},
+        )
+        self.assertEqual(response.status_code, 403)
+
+        other = User.objects.create_user("other", password="password123")
+        self.client.force_login(other)
+        response = self.client.get(reverse("items:job_detail", args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(STORAGE_JOB_RETRY_DELAY=10)
+    def test_failed_job_is_retried_with_backoff(self):
+        job = jobs.enqueue("command", max_attempts=2, command="flush")
+
+        job = jobs.claim(1)[0]
+        jobs.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("cannot run as a job", job.error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+
+        # not due yet
+        self.assertEqual(jobs.claim(1), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run_job(jobs.claim(1)[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished_date)
+
+    def test_job_without_heartbeat_is_requeued(self):
+        job = jobs.enqueue("command", command="scan_overdue")
+        jobs.claim(1)
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - timedelta(hours=2)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("No heartbeat", job.error)
+
+
+class ConcurrentLoanStressTest(TransactionTestCase):
+    """
+    Races several threads, each with its own database connection, for the
+    same set of items and checks that no item is ever loaned twice.
+
+    The measured throughput is printed when the STORAGE_STRESS_REPORT
+    environment variable is set, to follow the loan path's performance
+    without cluttering the regular test output.
+    """
+
+    THREADS = 8
+    ITEMS = 25
+
+    def setUp(self):
+        owner = User.objects.create_user("owner", password="password123")
+        self.borrowers = [
+            User.objects.create_user(f"borrower{index}", password="password123")
+            for index in range(self.THREADS)
+        ]
+        self.items = [create_item(owner) for _ in range(self.ITEMS)]
+
+    def race(self, action):
+        """
+        Runs 'action(item, borrower)' for every item on every thread at once.
+
+        Returns the list of (item_id, borrower_id) pairs that succeeded and
+        the number of attempts that raised a LoanError.
+        """
+        barrier = threading.Barrier(self.THREADS)
+        lock = threading.Lock()
+        wins, losses = [], []
+
+        def worker(borrower):
+            try:
+                barrier.wait()
+                for item in self.items:
+                    try:
+                        action(item, borrower)
+                    except LoanError:
+                        with lock:
+                            losses.append(item.pk)
+                    else:
+                        with lock:
+                            wins.append((item.pk, borrower.pk))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(borrower,))
+            for borrower in self.borrowers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return wins, losses
+
+    def test_each_item_is_loaned_exactly_once(self):
+        started = time.perf_counter()
+        wins, losses = self.race(lambda item, borrower: lend_item(item.pk, borrower))
+        elapsed = time.perf_counter() - started
+
+        attempts = self.THREADS * self.ITEMS
+        if os.environ.get("STORAGE_STRESS_REPORT"):
+            print(
+                f"\n{attempts} loan attempts in {elapsed:.3f}s: "
+                f"{len(wins) / elapsed:.0f} loans/s, "
+                f"{attempts / elapsed:.0f} attempts/s"
+            )
+
+        self.assertEqual(len(wins) + len(losses), attempts)
+        self.assertCountEqual(
+            [item_id for item_id, _ in wins], [item.pk for item in self.items]
+        )
+
+        winners = dict(wins)
+        for item in Item.objects.select_related("current_loan"):
+            self.assertFalse(item.is_available)
+            self.assertEqual(item.current_loan.to_user_id, winners[item.pk])
+            self.assertEqual(
+                Transaction.objects.filter(item=item, type=Transaction.LOAN).count(), 1
+            )
+
+        self.assertFalse(
+            Transaction.objects.filter(item_currently_assigned=None).exists()
+        )
+
+    def test_each_loan_is_returned_exactly_once(self):
+        borrower = self.borrowers[0]
+        for item in self.items:
+            lend_item(item.pk, borrower)
+
+        # every thread submits the devolutions as the same borrower
+        self.borrowers = [borrower] * self.THREADS
+        wins, losses = self.race(lambda item, user: return_item(item.pk, user))
+
+        self.assertEqual(len(wins), self.ITEMS)
+        self.assertEqual(len(losses), self.ITEMS * (self.THREADS - 1))
+        self.assertEqual(
+            Transaction.objects.filter(type=Transaction.DEVOLUTION).count(), self.ITEMS
+        )
+        self.assertFalse(Item.objects.filter(is_available=False).exists())
+
+    def test_concurrent_partial_loans_never_oversell(self):
+        stock = 10
+        Item.objects.update(quantity=stock)
+        summary.rebuild()
+
+        wins, losses = self.race(
+            lambda item, borrower: lend_item(item.pk, borrower, quantity=3)
+        )
+
+        # 3 units fit three times in a stock of 10, whatever the interleaving
+        self.assertEqual(len(wins), self.ITEMS * 3)
+
+        for item in Item.objects.all():
+            lent = sum(
+                Transaction.objects.open_loans()
+                .filter(item=item)
+                .values_list("quantity", flat=True)
+            )
+            self.assertEqual(lent, 9)
+            self.assertEqual(item.quantity, stock - lent)
+            self.assertTrue(item.is_available)
+
+        # the counter UPDATEs are relative, so no increment is lost either
+        self.assertEqual(stats.verify(), [])
+        self.assertEqual(summary.drift(), [])
+
+    def test_concurrent_bulk_loans_never_double_lend(self):
+        item_ids = [item.pk for item in self.items]
+        batches = []
+
+        def borrow_all(item, borrower):
+            # one bulk request per thread, triggered on its first item
+            if item.pk == item_ids[0]:
+                batches.append(lend_items(item_ids, borrower))
+
+        self.race(borrow_all)
+
+        lent = [result.item_id for batch in batches for result in batch if result.ok]
+        self.assertCountEqual(lent, item_ids)
+        self.assertEqual(
+            Transaction.objects.filter(type=Transaction.LOAN).count(), self.ITEMS
+        )
+        self.assertFalse(Item.objects.filter(current_loan=None).exists())
@@ -8,10 +8,18 @@ URL configuration for the 'storage' application, namespaced as 'items'.
 
 Defines the routing paths for all major application functionalities, 
 including:
-1. General views (index, search).
+1. General views (index, search, inventory dashboard).
 2. Item management (CRUD operations: create, detail, update, delete).
 3. User authentication (register, login, logout, update, profile viewing).
 4. Transaction handling (viewing history and processing loans/devolutions).
+   Streamed CSV/NDJSON exports of the items and transactions.
+   Point-in-time custody lookups over the loan intervals and the overdue loans.
+5. Native async versions of the read views, under the 'async/' prefix, and
+   the server-sent events feed of the item availability.
+6. The versioned JSON API (api/v1/), authenticated by API tokens.
+7. The staff page listing the saved request profiles.
+8. The background jobs (exports, imports, maintenance commands) and their
+   status pages.
 
 The urlpatterns list also includes configuration for serving media files in 
 development environments.
@@ -22,6 +30,13 @@ app_name = "items"
 urlpatterns = [
     path("", views.index, name="index"),
     path("search/", views.search, name="search"),
+    path("dashboard/", views.dashboard, name="dashboard"),
+    path("custody/", views.custody_view, name="custody"),
+    path("overdue/", views.overdue, name="overdue"),
+    # background jobs
+    path("jobs/", views.job_list, name="jobs"),
+    path("jobs/<int:job_id>/", views.job_detail, name="job_detail"),
+    path("jobs/<int:job_id>/download/", views.job_download, name="job_download"),
     # item (CRUD)
     path("items/<int:item_id>/detail/", views.item, name="item"),
     path("items/create/", views.create, name="create"),
@@ -36,11 +51,48 @@ urlpatterns = [
     path("user/profile/<int:user_id>/detail/", views.user_profile, name="user_profile"),
     # transactions
     path("transactions", views.Transactions, name="transactions"),
+    path("loan/bulk/", views.BulkTransaction, name="bulk_transaction"),
     path(
         "loan/<int:item_id>/",
         views.ItemTransaction,
         name="transaction",
     ),
+    # async (ASGI) versions of the read views
+    path("async/", views.index_async, name="index_async"),
+    path("async/search/", views.search_async, name="search_async"),
+    path("async/items/<int:item_id>/detail/", views.item_async, name="item_async"),
+    path("async/transactions", views.transactions_async, name="transactions_async"),
+    path(
+        "async/user/profile/<int:user_id>/detail/",
+        views.user_profile_async,
+        name="user_profile_async",
+    ),
+    # server-sent events (ASGI)
+    path("events/items/", views.item_events, name="item_events"),
+    # exports (streamed CSV / NDJSON)
+    path("export/items.<str:export_format>", views.export_items, name="export_items"),
+    path(
+        "export/transactions.<str:export_format>",
+        views.export_transactions,
+        name="export_transactions",
+    ),
+    # JSON API (token authentication)
+    path("api/v1/items/", views.api_items, name="api_items"),
+    path("api/v1/items/<int:item_id>/", views.api_item, name="api_item"),
+    path("api/v1/transactions/", views.api_transactions, name="api_transactions"),
+    path(
+        "api/v1/users/<int:user_id>/transactions/",
+        views.api_user_transactions,
+        name="api_user_transactions",
+    ),
+    path("api/v1/custody/", views.api_custody, name="api_custody"),
+    # request profiles (staff)
+    path("profiles/", views.profiles, name="profiles"),
+    path(
+        "profiles/<str:name>.<str:file_type>",
+        views.profile_download,
+        name="profile_download",
+    ),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
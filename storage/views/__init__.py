@@ -3,3 +3,12 @@ from .items_views import *
 from .user_form import *
 from .user_views import *
 from .transactions_views import *
+from .async_views import *
+from .api_views import *
+from .export_views import *
+from .profiling_views import *
+from .dashboard_views import *
+from .custody_views import *
+from .overdue_views import *
+from .jobs_views import *
+from .events_views import *
@@ -0,0 +1,181 @@
+from django.contrib.auth.models import User
+from storage.api import (
+    INTERVAL_FIELDS,
+    ITEM_FIELDS,
+    TRANSACTION_FIELDS,
+    ApiError,
+    api_view,
+    page_url,
+    parse_custody,
+    parse_fields,
+    parse_limit,
+)
+from storage.custody import custody
+from storage.models import Item, Transaction, TransactionArchive
+from storage.pagination import ChainedListing, keyset_paginator
+
+
+def keyset_listing(request, queryset, key):
+    """
+    Builds the body of a paginated API listing.
+
+    Pages always use keyset cursors on the descending key (never COUNT or
+    OFFSET), whatever the STORAGE_PAGINATION setting of the HTML views.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Reads the "cursor" and "limit" parameters.
+    queryset : QuerySet or ChainedListing
+        A values() queryset holding the selected fields, including the key
+        (or a ChainedListing of two, for the transaction history).
+    key : str
+        The unique field the pages are ordered by.
+
+    Returns:
+    --------
+    dict
+        The page rows ("results") and the URLs of the neighbouring pages
+        ("next" and "previous", or None).
+    """
+    page = keyset_paginator(queryset, parse_limit(request), key=key).get_page(
+        request.GET.get("cursor")
+    )
+
+    return {
+        "results": page.object_list,
+        "next": page_url(request, page.next_cursor),
+        "previous": page_url(request, page.previous_cursor),
+    }
+
+
+@api_view
+def api_items(request):
+    """
+    API view listing the items, newest first.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Accepts "fields", "limit" and "cursor".
+
+    Returns:
+    --------
+    dict:
+        The page of items, serialized by api_view (JSON with ETag).
+    """
+    fields = parse_fields(request, ITEM_FIELDS, "item_id")
+    return keyset_listing(request, Item.objects.values(*fields), "item_id")
+
+
+@api_view
+def api_item(request, item_id):
+    """
+    API view with the data of a single item.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Accepts "fields".
+    item_id : int
+        The primary key of the Item.
+
+    Returns:
+    --------
+    dict:
+        The item fields, serialized by api_view (JSON with ETag).
+        Answers 404 if the item does not exist.
+    """
+    fields = parse_fields(request, ITEM_FIELDS, "item_id")
+    item = Item.objects.filter(pk=item_id).values(*fields).first()
+
+    if item is None:
+        raise ApiError("Item not found.", status=404)
+
+    return item
+
+
+@api_view
+def api_transactions(request):
+    """
+    API view listing the transactions, newest first, archived ones included.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Accepts "fields", "limit" and "cursor".
+
+    Returns:
+    --------
+    dict:
+        The page of transactions, serialized by api_view (JSON with ETag).
+    """
+    fields = parse_fields(request, TRANSACTION_FIELDS, "id")
+    return keyset_listing(
+        request,
+        ChainedListing(
+            Transaction.objects.values(*fields),
+            TransactionArchive.objects.values(*fields),
+        ),
+        "id",
+    )
+
+
+@api_view
+def api_user_transactions(request, user_id):
+    """
+    API view listing the transactions given or received by a user, newest first,
+    archived ones included.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Accepts "fields", "limit" and "cursor".
+    user_id : int
+        The primary key of the User.
+
+    Returns:
+    --------
+    dict:
+        The page of transactions, serialized by api_view (JSON with ETag).
+        Answers 404 if the user does not exist.
+    """
+    fields = parse_fields(request, TRANSACTION_FIELDS, "id")
+
+    if not User.objects.filter(pk=user_id).exists():
+        raise ApiError("User not found.", status=404)
+
+    return keyset_listing(
+        request,
+        ChainedListing(
+            Transaction.objects.involving(user_id).values(*fields),
+            TransactionArchive.objects.involving(user_id).values(*fields),
+        ),
+        "id",
+    )
+
+
+@api_view
+def api_custody(request):
+    """
+    API view answering custody questions from the loan intervals.
+
+    'item' and/or 'user' (the holder) select the intervals; with 'at' alone
+    the listing holds the loans active at that instant, with 'at' and
+    'until' the loans active at some point of the range. Newest loans first.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Accepts "item", "user", "at", "until",
+        "fields", "limit" and "cursor".
+
+    Returns:
+    --------
+    dict:
+        The page of intervals, serialized by api_view (JSON with ETag).
+    """
+    fields = parse_fields(request, INTERVAL_FIELDS, "loan_id")
+    intervals = custody(**parse_custody(request)).values(*fields)
+
+    return keyset_listing(request, intervals, "loan_id")
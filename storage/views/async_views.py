@@ -0,0 +1,230 @@
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import Paginator
+from django.shortcuts import redirect, render, resolve_url
+from storage.models import Item, Transaction, TransactionArchive
+from storage.pagination import ChainedListing, acounted_page, apaginate
+from storage.search import asearch_item_ids
+from storage.stats import aget_stats
+
+"""
+Native async versions of the read-heavy views of the 'storage' application.
+
+Served under the 'async/' prefix, they render the same templates as their
+synchronous counterparts but read the database with Django's async ORM
+(aget/afirst/acount and async iteration), so under the ASGI entry point
+(project.asgi) a request waiting on the database does not hold a worker
+thread. Everything a template touches is loaded by the view (select_related
+and prefetched user), because lazy relations would run synchronous queries
+inside the event loop.
+"""
+
+
+def async_login_required(view_func):
+    """
+    Async counterpart of login_required for the views of this module.
+
+    Resolves the user with request.auser() and stores it in 'request.user',
+    so the templates (and the 'auth' context processor) read the loaded user
+    instead of lazily querying it from the event loop.
+
+    Parameters:
+    -----------
+    view_func : coroutine function
+        The async view to protect.
+
+    Returns:
+    --------
+    coroutine function
+        The wrapped view, redirecting anonymous users to 'items:login'.
+    """
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+
+        if not user.is_authenticated:
+            return redirect_to_login(
+                request.get_full_path(), resolve_url("items:login")
+            )
+
+        request.user = user
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+@async_login_required
+async def index_async(request):
+    """
+    Async version of the index view.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Used to retrieve the page number ("page") or
+        cursor ("cursor") from the query string.
+
+    Returns:
+    --------
+    HttpResponse:
+        Renders 'storage/index.html' with the paginated items (page_obj) and the site_title.
+    """
+    items = Item.objects.for_listing(request.user).order_by("-item_id")
+
+    page_obj = await apaginate(request, items, 17, key="item_id")
+
+    context = {"page_obj": page_obj, "site_title": "Items - "}
+    return render(request, "storage/index.html", context)
+
+
+@async_login_required
+async def item_async(request, item_id):
+    """
+    Async version of the item view.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object.
+    item_id : int
+        The primary key used to fetch in DB the object selected.
+
+    Returns:
+    --------
+    HttpResponse:
+        Renders 'storage/item.html' with the item, the user's active loan of it and the site_title.
+    """
+    item = (
+        await Item.objects.select_related("owner", "current_loan")
+        .filter(pk=item_id)
+        .afirst()
+    )
+
+    user_loan = (
+        await Transaction.objects.open_loans()
+        .filter(item_id=item_id, to_user=request.user)
+        .order_by("-id")
+        .afirst()
+    )
+
+    context = {
+        "item": item,
+        "user_loan": user_loan,
+        "site_title": "Item - ",
+    }
+
+    return render(request, "storage/item.html", context)
+
+
+@async_login_required
+async def search_async(request):
+    """
+    Async version of the search view.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Used to retrieve the search term ("q") and the page number ("page").
+
+    Returns:
+    --------
+    HttpResponse:
+        -Redirect to 'items:index_async' if the value is empty.
+        -Renders 'storage/index.html' with the paginated results ('page_obj'), site title and 'search_value'.
+    """
+    search_value = request.GET.get("q", "").strip()
+
+    if search_value == "":
+        return redirect("items:index_async")
+
+    item_ids = await asearch_item_ids(search_value)
+
+    paginator = Paginator(item_ids, 10)
+    page_obj = paginator.get_page(request.GET.get("page"))
+
+    items = await Item.objects.for_listing(request.user).ain_bulk(
+        page_obj.object_list
+    )
+    page_obj.object_list = [items[pk] for pk in page_obj.object_list if pk in items]
+
+    context = {
+        "page_obj": page_obj,
+        "site_title": "Search - ",
+        "search_value": search_value,
+    }
+
+    return render(request, "storage/index.html", context)
+
+
+@async_login_required
+async def transactions_async(request):
+    """
+    Async version of the Transactions view.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Used to retrieve the page number ("page") or cursor ("cursor").
+
+    Returns:
+    --------
+    HttpResponse:
+        -Renders 'storage/transactions.html' and loads the context and site_title (GET)
+    """
+    transaction = ChainedListing(
+        Transaction.objects.for_listing().order_by("-id"),
+        TransactionArchive.objects.for_listing().order_by("-id"),
+    )
+
+    page_obj = await apaginate(request, transaction, 17, key="id")
+
+    context = {"page_obj": page_obj, "site_title": "Transactions - "}
+
+    return render(request, "storage/transactions.html", context)
+
+
+@async_login_required
+async def user_profile_async(request, user_id):
+    """
+    Async version of the user_profile view.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object.
+    user_id : int
+        The primary key used to fetch in DB the object selected.
+
+    Returns:
+    --------
+    HttpResponse:
+        -Renders 'storage/user_profile.html' with the user data and the transactions (GET).
+    """
+    single_user = await User.objects.filter(pk=user_id).afirst()
+    stats = await aget_stats(user_id) if single_user else None
+
+    transaction = ChainedListing(
+        Transaction.objects.involving(user_id).for_listing().order_by("-loan_date"),
+        TransactionArchive.objects.involving(user_id)
+        .for_listing()
+        .order_by("-loan_date"),
+    )
+
+    page_obj = await acounted_page(
+        transaction,
+        17,
+        request.GET.get("page"),
+        stats.transactions_total if stats else None,
+    )
+
+    context = {
+        "single_user": single_user,
+        "stats": stats,
+        "page_obj": page_obj,
+        "site_title": "User Profile - ",
+    }
+
+    return render(request, "storage/user_profile.html", context)
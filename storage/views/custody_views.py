@@ -0,0 +1,56 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+from storage.custody import MAX_RESULTS, custody
+from storage.forms import CustodyForm
+
+
+@login_required(login_url="items:login")
+def custody_view(request):
+    """
+    View answering custody questions ("who held item X at T", "which items did
+    user U hold during that week").
+
+    Requires a logged user. Reads a CustodyForm from the query string and, when
+    valid, lists the loan intervals (storage.custody) of the item and/or user
+    active at the 'As of' instant, or at some point until 'Until'. The lookup
+    is an index range scan over LoanInterval, not a replay of the transaction
+    log. At most MAX_RESULTS intervals are shown.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The HttpRequest object. Reads "item", "user", "at" and "until".
+
+    Returns:
+    -------
+    HttpResponse:
+        -Renders 'storage/custody.html' with the empty form (GET without parameters).
+        -Renders 'storage/custody.html' with the form errors (invalid parameters).
+        -Renders 'storage/custody.html' with the intervals found (valid parameters).
+    """
+    form = CustodyForm(request.GET or None)
+    intervals = None
+    truncated = False
+
+    if form.is_valid():
+        user = form.cleaned_data["user"]
+        intervals = list(
+            custody(
+                form.cleaned_data["at"],
+                form.cleaned_data["until"],
+                item_id=form.cleaned_data["item"],
+                user_id=user.pk if user else None,
+            )[: MAX_RESULTS + 1]
+        )
+        truncated = len(intervals) > MAX_RESULTS
+        intervals = intervals[:MAX_RESULTS]
+
+    context = {
+        "form": form,
+        "intervals": intervals,
+        "truncated": truncated,
+        "max_results": MAX_RESULTS,
+        "site_title": "Custody - ",
+    }
+
+    return render(request, "storage/custody.html", context)
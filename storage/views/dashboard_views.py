@@ -0,0 +1,39 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+from storage import summary
+from storage.models import InventorySummary
+
+
+@login_required(login_url="items:login")
+def dashboard(request):
+    """
+    View to display the inventory dashboard.
+
+    Requires a logged user. Shows the number of items and the units in stock by
+    storage location, by availability and by object type. The totals are read
+    from the InventorySummary rows (one query, one row per location, state and
+    object type) instead of grouping the item table.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The HttpRequest object.
+
+    Returns:
+    -------
+    HttpResponse:
+        -Renders 'storage/dashboard.html' with the summary groups (GET).
+    """
+    groups = summary.dashboard()
+    availability = groups[InventorySummary.AVAILABILITY]
+
+    context = {
+        "locations": groups[InventorySummary.LOCATION],
+        "availability": availability,
+        "objects": groups[InventorySummary.OBJECT],
+        "total_items": sum(row.items for row in availability),
+        "total_quantity": sum(row.quantity for row in availability),
+        "site_title": "Dashboard - ",
+    }
+
+    return render(request, "storage/dashboard.html", context)
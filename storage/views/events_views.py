@@ -0,0 +1,42 @@
+from django.http import HttpResponse, StreamingHttpResponse
+from storage import events
+from storage.views.async_views import async_login_required
+
+
+@async_login_required
+async def item_events(request):
+    """
+    Server-sent events feed of the item availability changes.
+
+    Requires a logged user. The response stays open and streams an
+    'availability' event (item id, availability and quantity) whenever a
+    loan, devolution or edit changes an item (see storage.events); the
+    script of 'global/base.html' patches the availability marks of the page
+    in place. Only served through the ASGI entry point (project.asgi), where
+    an idle connection holds no worker thread: under WSGI the open stream
+    would pin a worker thread, so the view answers 204 No Content, which
+    stops EventSource.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. A reconnecting browser sends the
+        "Last-Event-ID" header and first gets the changes it missed.
+
+    Returns:
+    --------
+    StreamingHttpResponse:
+        The 'text/event-stream' response (ASGI), or an empty 204 response.
+    """
+    if not events.is_live(request):
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        events.stream(request.headers.get("Last-Event-ID")),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # keeps nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+
+    return response
@@ -0,0 +1,116 @@
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, StreamingHttpResponse
+from storage.export import (
+    FORMATS,
+    ITEM_COLUMNS,
+    TRANSACTION_COLUMNS,
+    export_rows,
+    stream_rows,
+)
+
+
+def export_response(request, name, export_format, columns, rows):
+    """
+    Builds the streaming download of an export.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object.
+    name : str
+        Base name of the downloaded file.
+    export_format : str
+        "csv" or "ndjson" (taken from the URL).
+    columns : tuple
+        The column names.
+    rows : iterable
+        Lazily produced row values.
+
+    Returns:
+    --------
+    StreamingHttpResponse:
+        The file download. Raises Http404 for an unknown format.
+    """
+    if export_format not in FORMATS:
+        raise Http404("Unknown export format.")
+
+    chunk_size = getattr(settings, "STORAGE_EXPORT_CHUNK_SIZE", 2000)
+
+    response = StreamingHttpResponse(
+        stream_rows(export_format, columns, rows, chunk_size),
+        content_type=FORMATS[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{name}-{date.today():%Y%m%d}.{export_format}"'
+    )
+    # Ask reverse proxies (nginx) to pass the chunks on instead of buffering the file
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@login_required(login_url="items:login")
+def export_items(request, export_format):
+    """
+    View streaming every Item as a CSV or NDJSON file.
+
+    Items are read in 'item_id' order with queryset.iterator(chunk_size=STORAGE_EXPORT_CHUNK_SIZE),
+    joining the owner and the current borrower ('current_loan__to_user') in the same query, and
+    written to the response chunk by chunk, so memory does not grow with the number of rows.
+    The optional "q" parameter filters the items like the search view.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Used to read the search term ("q").
+    export_format : str
+        "csv" or "ndjson".
+
+    Returns:
+    --------
+    StreamingHttpResponse:
+        The file download.
+    """
+    rows = export_rows(
+        "items",
+        request.GET.get("q", "").strip(),
+        getattr(settings, "STORAGE_EXPORT_CHUNK_SIZE", 2000),
+    )
+
+    return export_response(request, "items", export_format, ITEM_COLUMNS, rows)
+
+
+@login_required(login_url="items:login")
+def export_transactions(request, export_format):
+    """
+    View streaming every Transaction as a CSV or NDJSON file.
+
+    The archived transactions (TransactionArchive) come first, then the hot ones, each table
+    read in 'id' order through the listing read path (item, lender and
+    borrower joined in the same query) with queryset.iterator(chunk_size=STORAGE_EXPORT_CHUNK_SIZE)
+    and written to the response chunk by chunk. The optional "q" parameter keeps the
+    transactions of the items matching the search.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object. Used to read the search term ("q").
+    export_format : str
+        "csv" or "ndjson".
+
+    Returns:
+    --------
+    StreamingHttpResponse:
+        The file download.
+    """
+    rows = export_rows(
+        "transactions",
+        request.GET.get("q", "").strip(),
+        getattr(settings, "STORAGE_EXPORT_CHUNK_SIZE", 2000),
+    )
+
+    return export_response(
+        request, "transactions", export_format, TRANSACTION_COLUMNS, rows
+    )
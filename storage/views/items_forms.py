@@ -1,6 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 
 
 from storage.forms import ItemForm
@@ -37,7 +38,10 @@ def create(request):
         if form.is_valid():
             item = form.save(commit=False)
             item.owner = request.user
-            item.save()
+            # the owner's counters and the inventory summary are updated by
+            # post_save signals
+            with transaction.atomic():
+                item.save()
             return redirect("items:update", item_id=item.pk)
 
         return render(request, "storage/update.html", context)
@@ -84,7 +88,9 @@ def update(request, item_id):
         context = {"form": form, "form_action": form_action, "item": item}
 
         if form.is_valid():
-            item = form.save()
+            # the inventory summary is updated by a post_save signal
+            with transaction.atomic():
+                item = form.save()
             return redirect("items:update", item_id=item.pk)
 
         return render(request, "storage/update.html", context)
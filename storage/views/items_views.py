@@ -1,26 +1,72 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Prefetch
+from django.db.models import Max
+from storage.cache import (
+    ITEMS,
+    conditional_page,
+    get_versions,
+    item_scope,
+    versioned_cache,
+)
 from storage.models import Item, Transaction
+from storage.pagination import paginate
+from storage.search import search_item_ids
 from django.core.paginator import Paginator
 
 
+def listing_state(request):
+    """
+    Returns the conditional GET validators of the item listing: the listing
+    version and the last change of any item (an index-only MAX).
+
+    No Last-Modified is sent: deleting an item changes the listing without
+    moving the highest 'updated_at', so only the ETag (whose version is
+    bumped on delete) tells whether the page changed.
+    """
+    latest = Item.objects.aggregate(latest=Max("updated_at"))["latest"]
+
+    return [*get_versions([ITEMS]), latest], None
+
+
+def item_state(request, item_id):
+    """
+    Returns the conditional GET validators of an item page: the item's
+    version and modification time (a primary key lookup).
+    """
+    updated_at = (
+        Item.objects.filter(pk=item_id).values_list("updated_at", flat=True).first()
+    )
+
+    return [*get_versions([item_scope(item_id)]), updated_at], updated_at
+
+
 @login_required(login_url="items:login")
+@conditional_page(listing_state)
+@versioned_cache(lambda request: [ITEMS])
 def index(request):
     """
     View to display a paginated list of Item objects.
 
-    Fetches all Item objects ordered descendingly by '-item_id'. Utilizes
-    'select_related' to perform a SQL JOIN, eagerly loading the 'owner'
-    and the 'current_loan' (including the borrower 'to_user'). This
-    optimization prevents the N+1 query problem when checking item
-    availability and current holders in the template.
+    Fetches all Item objects ordered descendingly by '-item_id' through
+    Item.objects.for_listing(), which JOINs the 'owner' and annotates whether
+    the logged user holds an open loan of each item (its Return button), in
+    the same query. This prevents the N+1 query problem when rendering the
+    owners and buttons in the template.
+
+    Pagination follows the STORAGE_PAGINATION setting: page numbers in
+    "offset" mode, or '-item_id' keyset cursors in "keyset" mode.
+
+    Responses are cached per user and page under the version of the item
+    listing, which is bumped whenever an Item or Transaction changes (see
+    storage.cache). Conditional GETs are answered from listing_state() alone:
+    an unchanged listing returns 304 Not Modified without reading the page.
 
     Parameters:
     -----------
     request : HttpRequest
         The HttpRequest object. Used to retrieve the current page number
-        from the query string parameter ("page").
+        ("page") or, in keyset mode, the page cursor ("cursor") from the
+        query string.
 
     Returns:
     --------
@@ -28,24 +74,27 @@ def index(request):
         Renders 'storage/index.html' with a context containing the
         paginated items (page_obj) and the site_title.
     """
-    items = Item.objects.select_related("owner", "current_loan__to_user").order_by(
-        "-item_id"
-    )
+    items = Item.objects.for_listing(request.user).order_by("-item_id")
 
-    paginator = Paginator(items, 17)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, items, 17, key="item_id")
 
     context = {"page_obj": page_obj, "site_title": "Items - "}
     return render(request, "storage/index.html", context)
 
 
 @login_required(login_url="items:login")
+@conditional_page(item_state)
+@versioned_cache(lambda request, item_id: [item_scope(item_id)])
 def item(request, item_id):
     """
     View to display data about a single item.
 
-    Fetch Item objects by item_id and select the first object to assign to the context.
+    Fetch Item objects by item_id and select the first object to assign to the context,
+    along with the logged user's active loan of the item (if any) to offer its devolution.
+    Responses are cached per user under the item's version, which is bumped when the item
+    or one of its transactions changes (see storage.cache). Conditional GETs are answered
+    from the item's modification time (item_state()), returning 304 Not Modified when the
+    page did not change.
 
     Parameters:
     ----------
@@ -61,8 +110,16 @@ def item(request, item_id):
 
     item = Item.objects.filter(pk=item_id).first()
 
+    user_loan = (
+        Transaction.objects.open_loans()
+        .filter(item_id=item_id, to_user=request.user)
+        .order_by("-id")
+        .first()
+    )
+
     context = {
         "item": item,
+        "user_loan": user_loan,
         "site_title": "Item - ",
     }
 
@@ -74,8 +131,10 @@ def search(request):
     """
     View to manage the search feature.
 
-    Process the received data through GET. Evaluate if the value is not empty and filters by different standards.
-    Use Paginator to separate the objects into 10 elements per page and use request.get to select a page.
+    Process the received data through GET. Evaluate if the value is not empty and asks the configured
+    full-text search backend (see storage.search) for the ranked ids of the matching items; a numeric
+    value also matches the item_id exactly. Use Paginator to separate the ids into 10 elements per page
+    and use request.get to select a page, then load only the items of that page.
     Then attributes the pages to page_obj with the search_value and retrives the value with context
 
     Parameters:
@@ -93,16 +152,15 @@ def search(request):
     if search_value == "":
         return redirect("items:index")
 
-    items = (
-        Item.object.select_related("owner")
-        .filter(Q(item_id__icontains=search_value) | Q(object__icontains=search_value))
-        .order_by("-item_id")
-    )
+    item_ids = search_item_ids(search_value)
 
-    paginator = Paginator(items, 10)
+    paginator = Paginator(item_ids, 10)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
 
+    items = Item.objects.for_listing(request.user).in_bulk(page_obj.object_list)
+    page_obj.object_list = [items[pk] for pk in page_obj.object_list if pk in items]
+
     context = {
         "page_obj": page_obj,
         "site_title": "Search - ",
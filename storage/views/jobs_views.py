@@ -0,0 +1,174 @@
+import uuid
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404, redirect, render
+from storage.forms import ExportJobForm, ImportJobForm, MaintenanceJobForm
+from storage.jobs import enqueue, job_dir
+from storage.models import Job
+
+
+def user_jobs(user):
+    """Returns the jobs a user may see: their own, or all of them for staff."""
+    jobs = Job.objects.select_related("user")
+
+    if not user.is_staff:
+        jobs = jobs.filter(user=user)
+
+    return jobs
+
+
+@login_required(login_url="items:login")
+def job_list(request):
+    """
+    View listing the background jobs (storage.jobs) and queuing new ones.
+
+    Requires a logged user. Any user may queue an export; maintenance commands
+    and CSV imports need a staff user. Queuing only writes a Job row: the
+    request returns right away and 'manage.py run_workers' runs the job. Users
+    see their own jobs, staff sees all of them, 17 per page, newest first.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The HttpRequest object. On POST, "action" selects the form submitted
+        ("export", "command" or "import").
+
+    Returns:
+    -------
+    HttpResponse:
+        -Renders 'storage/jobs.html' with the forms and the jobs (GET, invalid POST).
+        -Redirects to the job status page once the job is queued (valid POST).
+    """
+    export_form = ExportJobForm(prefix="export")
+    command_form = MaintenanceJobForm(prefix="command")
+    import_form = ImportJobForm(prefix="import")
+
+    if request.method == "POST":
+        action = request.POST.get("action")
+
+        if action != "export" and not request.user.is_staff:
+            raise PermissionDenied("Only staff may queue this job.")
+
+        job = None
+
+        if action == "export":
+            export_form = ExportJobForm(request.POST, prefix="export")
+
+            if export_form.is_valid():
+                job = enqueue("export", user=request.user, **export_form.cleaned_data)
+
+        elif action == "command":
+            command_form = MaintenanceJobForm(request.POST, prefix="command")
+
+            if command_form.is_valid():
+                job = enqueue(
+                    "command",
+                    user=request.user,
+                    max_attempts=1,
+                    **command_form.cleaned_data,
+                )
+
+        elif action == "import":
+            import_form = ImportJobForm(request.POST, request.FILES, prefix="import")
+
+            if import_form.is_valid():
+                directory = job_dir()
+                directory.mkdir(parents=True, exist_ok=True)
+                name = f"upload-{uuid.uuid4().hex}.csv"
+
+                with open(directory / name, "wb") as file:
+                    for chunk in import_form.cleaned_data["file"].chunks():
+                        file.write(chunk)
+
+                # a retry would import the rows written before the failure again
+                job = enqueue(
+                    "import_items",
+                    user=request.user,
+                    max_attempts=1,
+                    path=name,
+                    owner=import_form.cleaned_data["owner"] or None,
+                )
+
+        if job is not None:
+            messages.success(request, f"Job #{job.pk} queued.")
+            return redirect("items:job_detail", job_id=job.pk)
+
+    page_obj = Paginator(user_jobs(request.user), 17).get_page(request.GET.get("page"))
+
+    context = {
+        "page_obj": page_obj,
+        "export_form": export_form,
+        "command_form": command_form,
+        "import_form": import_form,
+        "site_title": "Jobs - ",
+    }
+
+    return render(request, "storage/jobs.html", context)
+
+
+@login_required(login_url="items:login")
+def job_detail(request, job_id):
+    """
+    View showing the status, progress and result of a background job.
+
+    Requires a logged user owning the job (or a staff user). The page reloads
+    itself while the job is queued or running.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The HttpRequest object.
+    job_id : int
+        The ID of the Job.
+
+    Returns:
+    -------
+    HttpResponse:
+        -Renders 'storage/job.html' with the job.
+        -Raises Http404 if the job does not exist or belongs to another user.
+    """
+    job = get_object_or_404(user_jobs(request.user), pk=job_id)
+
+    context = {
+        "job": job,
+        "pending": job.status in (Job.QUEUED, Job.RUNNING),
+        "site_title": f"Job #{job.pk} - ",
+    }
+
+    return render(request, "storage/job.html", context)
+
+
+@login_required(login_url="items:login")
+def job_download(request, job_id):
+    """
+    Serves the file written by a finished export job.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The HttpRequest object.
+    job_id : int
+        The ID of the Job.
+
+    Returns:
+    -------
+    FileResponse:
+        The file. Raises Http404 if the job is not a finished export of the
+        user (or staff) or its file is gone.
+    """
+    job = get_object_or_404(user_jobs(request.user), pk=job_id, status=Job.DONE)
+    name = job.result.get("file") if isinstance(job.result, dict) else None
+
+    if not name:
+        raise Http404("The job wrote no file.")
+
+    path = job_dir() / name
+
+    if not path.is_file():
+        raise Http404("The job file was deleted.")
+
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
@@ -0,0 +1,36 @@
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.shortcuts import render
+from django.utils import timezone
+from storage.overdue import overdue_loans
+
+
+@login_required(login_url="items:login")
+def overdue(request):
+    """
+    View to display the active loans past their due date.
+
+    Requires a logged user. Reads the overdue loans through the partial index
+    of the active loans by due date (see storage.overdue), with the item and
+    both users joined in the same query, most overdue first, and paginates
+    them into 17 elements per page. The page and its COUNT only touch the
+    overdue loans, however long the transaction log is.
+
+    Parameters:
+    ----------
+    request : HttpRequest
+        The HttpRequest object. Used to retrieve the page number ("page").
+
+    Returns:
+    -------
+    HttpResponse:
+        -Renders 'storage/overdue.html' with the paginated loans (page_obj) (GET).
+    """
+    now = timezone.now()
+    loans = overdue_loans(now).for_listing()
+
+    page_obj = Paginator(loans, 17).get_page(request.GET.get("page"))
+
+    context = {"page_obj": page_obj, "now": now, "site_title": "Overdue - "}
+
+    return render(request, "storage/overdue.html", context)
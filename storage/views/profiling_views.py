@@ -0,0 +1,63 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from storage import profiling
+
+
+@staff_member_required
+def profiles(request):
+    """
+    Admin page listing the recent request profiles.
+
+    Requires a staff user. Shows a fresh profiling token for the user (see
+    storage.profiling) and the saved profiles, most recent first, with links
+    to their report and '.prof' file.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object.
+
+    Returns:
+    --------
+    HttpResponse:
+        Renders 'storage/admin/profiles.html'.
+    """
+    context = {
+        "title": "Request profiles",
+        "profiles": profiling.list_profiles(),
+        "token": profiling.make_token(request.user),
+        "param": profiling.PROFILE_PARAM,
+    }
+
+    return render(request, "storage/admin/profiles.html", context)
+
+
+@staff_member_required
+def profile_download(request, name, file_type):
+    """
+    Serves a saved profile file.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object.
+    name : str
+        The profile name.
+    file_type : str
+        "prof" (cProfile stats, downloaded) or "txt" (report, shown inline).
+
+    Returns:
+    --------
+    FileResponse:
+        The file. Raises Http404 if it does not exist.
+    """
+    path = profiling.profile_file(name, f".{file_type}")
+
+    if path is None:
+        raise Http404("Profile not found.")
+
+    if file_type == "txt":
+        return FileResponse(open(path, "rb"), content_type="text/plain; charset=utf-8")
+
+    return FileResponse(open(path, "rb"), as_attachment=True)
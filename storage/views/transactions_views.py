@@ -1,33 +1,64 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from storage.models import Item, Transaction
-from django.core.paginator import Paginator
+from django.db.models import Max
+from storage.archive import ARCHIVE
+from storage.cache import ITEMS, conditional_page, get_versions
+from storage.models import Item, Transaction, TransactionArchive
+from storage.pagination import ChainedListing, paginate
+from storage.forms import BulkTransactionForm
+from storage.services import (
+    LoanError,
+    NotBorrower,
+    lend_item,
+    lend_items,
+    return_item,
+    return_items,
+)
 from django.contrib import messages
 
 
+def transactions_state(request):
+    """
+    Returns the conditional GET validators of the transaction listing: the
+    highest transaction id (a primary key MAX) and the listing and archive
+    versions, bumped when transactions are deleted or archived.
+    """
+    last_id = Transaction.objects.aggregate(last=Max("id"))["last"]
+
+    return [*get_versions([ITEMS, ARCHIVE]), last_id], None
+
+
 @login_required(login_url="items:login")
+@conditional_page(transactions_state)
 def Transactions(request):
     """
     View to display transaction objects from the Transaction class.
 
-    Requires a logged user. Fetches all Transaction objects and orders them descendingly by '-id'. Use Paginator to separate the objects into 17 elements per page and use request.get to select a page.
+    Requires a logged user. Fetches all Transaction objects through the listing read path (item and users joined
+    in the same query) and orders them descendingly by '-id'. Paginates them into 17 elements per page,
+    by page number ("page") or, when STORAGE_PAGINATION is "keyset", by '-id' cursor ("cursor").
+    Archived transactions (TransactionArchive) follow the hot ones and are only read by the pages
+    past the hot rows (see storage.archive).
     Then attributes the pages to page_obj and retrives the value with context.
+    Conditional GETs are answered from transactions_state(): while no transaction is added, a client
+    sending the page's ETag gets 304 Not Modified without the listing queries.
 
     Parameters:
     -----------
     request : HttpRequest
-        The HttpRequest object. Used to retrieve the page number for the pagination parameter("page") from the query string.
+        The HttpRequest object. Used to retrieve the page number ("page") or cursor ("cursor") from the query string.
 
     Returns:
     --------
     HttpResponse:
         -Renders 'storage/transactions.html' and loads the context and site_title (GET)
     """
-    transaction = Transaction.objects.order_by("-id")
+    transaction = ChainedListing(
+        Transaction.objects.for_listing().order_by("-id"),
+        TransactionArchive.objects.for_listing().order_by("-id"),
+    )
 
-    paginator = Paginator(transaction, 17)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, transaction, 17, key="id")
 
     context = {"page_obj": page_obj, "site_title": "Transactions - "}
 
@@ -40,24 +71,24 @@ def ItemTransaction(request, item_id):
     View to handle Item Loans and Devolutions.
 
     Requires a logged-in user and only accepts POST requests. The action is
-    determined by the item's current availability, and the state is managed
-    by updating the 'current_loan' foreign key on the Item model.
+    read from the 'action' field ("loan" or "return"); when it is missing it
+    is determined by the item's current availability. Both actions are
+    delegated to the loan services (storage.services), which apply them
+    atomically: when several users race for the last units of an item exactly
+    one of them wins and the others get an error message right away.
 
     Flow:
     -----
-    1. LOAN (If item.is_available is True):
-        - Creates a LOAN transaction record.
-        - Sets item.is_available to False.
-        - Maps item.current_loan to the newly created transaction.
-        - Saves the item state.
-
-    2. DEVOLUTION (If item.is_available is False):
-        - Verifies if the 'current_loan' exists and if the logged-in user
-        matches the current borrower (to_user).
-        - Creates a DEVOLUTION transaction record.
-        - Sets item.is_available to True.
-        - Clears item.current_loan (sets to NULL).
-        - Saves the item state.
+    1. LOAN (action "loan", or item.is_available is True):
+        - lend_item() decrements the item's stock by the requested 'quantity'
+        (defaults to 1) with a conditional update, creates the LOAN
+        transaction record and maps item.current_loan to it. The item stays
+        available while units remain.
+
+    2. DEVOLUTION (action "return", or item.is_available is False):
+        - return_item() closes the logged-in user's active loan of the item,
+        gives its units back to the stock, updates item.current_loan and
+        creates the DEVOLUTION record.
 
     Parameters:
     -----------
@@ -71,6 +102,7 @@ def ItemTransaction(request, item_id):
     HttpResponse:
         - Redirects to 'items:index' if the request method is not POST.
         - Redirects to 'items:item' upon successful Loan or Devolution.
+        - Redirects to 'items:item' with an error message if the quantity is invalid or not available anymore.
         - Redirects to 'items:user_profile' with an error message if the user lacks permission to return the item.
     """
 
@@ -79,40 +111,85 @@ def ItemTransaction(request, item_id):
 
     item = get_object_or_404(Item, pk=item_id)
 
-    if item.is_available:
-        new_loan = Transaction.objects.create(
-            item=item,
-            from_user=item.owner,
-            to_user=request.user,
-            was_available=True,
-            type=Transaction.LOAN,
-        )
+    action = request.POST.get("action")
+    if action not in ("loan", "return"):
+        action = "loan" if item.is_available else "return"
 
-        item.is_available = False
-        item.current_loan = new_loan
-        item.save()
+    if action == "loan":
+        try:
+            quantity = int(request.POST.get("quantity", 1))
+            lend_item(item.pk, request.user, quantity=quantity)
+        except ValueError:
+            messages.error(request, "Invalid quantity.")
+            return redirect("items:item", item_id=item_id)
+        except LoanError as error:
+            messages.error(request, str(error))
+            return redirect("items:item", item_id=item_id)
 
         messages.success(request, "Loan succeeded!")
         return redirect("items:item", item_id=item_id)
 
-    else:
-        if item.current_loan and item.current_loan.to_user == request.user:
+    try:
+        return_item(item.pk, request.user)
+    except NotBorrower as error:
+        messages.error(request, str(error))
+        return redirect("items:user_profile", user_id=request.user.id)
 
-            Transaction.objects.create(
-                item=item,
-                from_user=request.user,
-                to_user=item.owner,
-                was_available=item.is_available,
-                type=Transaction.DEVOLUTION,
-            )
+    messages.success(request, "Devolution succeeded!")
+    return redirect("items:item", item_id=item_id)
 
-            item.is_available = True
-            item.current_loan = None
-            item.save()
 
-            messages.success(request, "Devolution succeeded!")
-            return redirect("items:item", item_id=item_id)
-        else:
-            messages.error(request, "You are not allowed to return this item.")
+@login_required(login_url="items:login")
+def BulkTransaction(request):
+    """
+    View to lend or return many items in a single request.
+
+    Requires a logged user. Renders a BulkTransactionForm where the user scans
+    or types a list of item IDs and chooses the action. On a valid POST the
+    whole list is processed by the bulk loan services (storage.services), which
+    validate the items with one query and write every Transaction with one
+    bulk_create inside a single database transaction, then the page is rendered
+    again with the result of each item.
+
+    Parameters:
+    -----------
+    request : HttpRequest
+        The HttpRequest object containing user and form data.
+
+    Returns:
+    --------
+    HttpResponse:
+        -Renders 'storage/bulk_transaction.html' with the empty form (GET).
+        -Renders 'storage/bulk_transaction.html' with the form errors (invalid POST).
+        -Renders 'storage/bulk_transaction.html' with the per-item results and a summary message (valid POST).
+        -Renders 'storage/bulk_transaction.html' with an error message if concurrent requests kept changing the items (valid POST).
+    """
+    form = BulkTransactionForm()
+    results = None
+
+    if request.method == "POST":
+        form = BulkTransactionForm(request.POST)
+
+        if form.is_valid():
+            item_ids = form.cleaned_data["item_ids"]
+            bulk_service = (
+                lend_items if form.cleaned_data["action"] == "loan" else return_items
+            )
 
-    return redirect("items:user_profile", user_id=request.user.id)
+            try:
+                results = bulk_service(item_ids, request.user)
+            except LoanError as error:
+                messages.error(request, str(error))
+            else:
+                succeeded = sum(result.ok for result in results)
+                messages.info(
+                    request, f"{succeeded} of {len(results)} items processed."
+                )
+
+    context = {
+        "form": form,
+        "results": results,
+        "site_title": "Bulk Transaction - ",
+    }
+
+    return render(request, "storage/bulk_transaction.html", context)
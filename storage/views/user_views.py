@@ -1,19 +1,29 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from storage.models import Transaction
-from django.core.paginator import Paginator
-from django.db.models import Q
+from storage.cache import user_scope, versioned_cache
+from storage.models import Transaction, TransactionArchive
+from storage.pagination import ChainedListing, counted_page
+from storage.stats import get_stats
 
 
 @login_required(login_url="items:login")
+@versioned_cache(lambda request, user_id: [user_scope(user_id)])
 def user_profile(request, user_id):
     """
     View to display user details.
 
     Requires a logged user. Fetches the User object securely by 'user_id'.
-    Retrieves all associated Transaction objects (where the user is involved as borrower or lender),
+    Retrieves all associated Transaction objects (where the user is involved as borrower or lender)
+    through the listing read path, which joins the item and both users in the same query,
     orders them descendingly by 'loan_date', and applies pagination (17 items per page).
+    The user's counters (items owned, active loans, transactions) are read from its
+    UserStats row, which also gives the paginator its total instead of a COUNT query
+    (the real count is read if the counter has drifted, see storage.pagination).
+    The user's archived transactions (TransactionArchive) follow the hot ones and are only
+    read by the pages past the hot rows (see storage.archive).
+    Responses are cached per viewer under the user's version, which is bumped when the user,
+    their items or their transactions change (see storage.cache).
 
     Parameters:
     ----------
@@ -28,17 +38,25 @@ def user_profile(request, user_id):
     """
 
     single_user = User.objects.filter(pk=user_id).first()
+    stats = get_stats(user_id) if single_user else None
 
-    transaction = Transaction.objects.filter(
-        Q(from_user=user_id) | Q(to_user=user_id)
-    ).order_by("-loan_date")
+    transaction = ChainedListing(
+        Transaction.objects.involving(user_id).for_listing().order_by("-loan_date"),
+        TransactionArchive.objects.involving(user_id)
+        .for_listing()
+        .order_by("-loan_date"),
+    )
 
-    paginator = Paginator(transaction, 17)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = counted_page(
+        transaction,
+        17,
+        request.GET.get("page"),
+        stats.transactions_total if stats else None,
+    )
 
     context = {
         "single_user": single_user,
+        "stats": stats,
         "page_obj": page_obj,
         "site_title": "User Profile - ",
     }